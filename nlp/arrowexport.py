@@ -0,0 +1,462 @@
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.sharedvocabulary import SharedVocabulary
+
+def _arrow():
+
+    # pyarrow is only needed for the Arrow conversions, not for the
+    # numpy ones, so it is imported on first use
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError( 'pyarrow must be installed to convert to and from Arrow' ) from None
+
+    return pyarrow
+
+class ArrowExport( object ):
+    """
+    A class used to hand vocabularies, token-ID corpora and frequency
+    matrices to dataframe and training tools as flat buffers instead of
+    pickles and Python lists.
+
+    A token-ID corpus ( a list of arrays of vocabulary indices, see
+    Cooccurrence.encode ) is laid out as a values array holding all
+    documents one after the other, and an offsets array where document
+    j is values[ offsets[ j ]:offsets[ j + 1 ] ].  A sparse matrix is
+    laid out as its scipy.sparse arrays, and a dense one as itself.
+    These are numpy arrays, so they expose the buffer protocol and can
+    be placed in shared memory or written to files.
+
+    The Arrow conversions wrap the same buffers without copying them:
+    the vocabulary is an Arrow string array, the corpus a list array
+    and a matrix a table with one row per document ( sparse, as list
+    columns of indices and counts ) or per word ( dense, as a fixed
+    size list column ).  save writes them to Arrow IPC files, which
+    load memory-maps.  pyarrow is only needed for the Arrow
+    conversions.
+
+    Methods
+    -------
+    corpusToArrays( idCorpus )
+        Static method that lays a token-ID corpus out as values and
+        offsets
+
+    corpusFromArrays( values, offsets )
+        Static method that splits values and offsets back into a
+        token-ID corpus of views
+
+    matrixToArrays( matrix )
+        Static method that returns the flat arrays of a matrix
+
+    matrixFromArrays( arrays )
+        Static method that rebuilds a matrix on its flat arrays
+
+    vocabularyToArrow( vocab )
+        Static method that turns a vocabulary into an Arrow string array
+
+    vocabularyFromArrow( array )
+        Static method that turns an Arrow string array into a
+        vocabulary list
+
+    corpusToArrow( idCorpus )
+        Static method that turns a token-ID corpus into an Arrow list
+        array
+
+    corpusFromArrow( array )
+        Static method that turns an Arrow list array into a token-ID
+        corpus of views
+
+    matrixToArrow( matrix )
+        Static method that turns a matrix into an Arrow table
+
+    matrixFromArrow( table )
+        Static method that rebuilds a matrix on an Arrow table
+
+    save( directory, vocab=None, idCorpus=None, matrix=None )
+        Static method that writes Arrow IPC files
+
+    load( directory )
+        Static method that memory-maps Arrow IPC files written by save
+    """
+
+    VOCABULARY = 'vocabulary.arrow'
+    CORPUS = 'corpus.arrow'
+    MATRIX = 'matrix.arrow'
+
+    @staticmethod
+    def corpusToArrays( idCorpus ):
+        """Lays a token-ID corpus out as values and offsets.  This
+        copies the documents once, into values.
+
+        Parameters
+        ----------
+        idCorpus : lst
+            A list of documents, each of which is an array of vocabulary
+            indices
+
+        Returns
+        -------
+        numpy.ndarray
+            the int32 indices of all documents, one after the other
+        numpy.ndarray
+            the D + 1 int64 offsets of the documents in values
+        """
+
+        offsets = np.zeros( len( idCorpus ) + 1, dtype=np.int64 )
+        np.cumsum( [ len( doc ) for doc in idCorpus ], out=offsets[ 1: ] )
+
+        values = np.empty( offsets[ -1 ], dtype=np.int32 )
+
+        for doc, start, stop in zip( idCorpus, offsets[ :-1 ], offsets[ 1: ] ):
+            values[ start:stop ] = doc
+
+        return values, offsets
+
+    @staticmethod
+    def corpusFromArrays( values, offsets ):
+        """Splits values and offsets back into a token-ID corpus, whose
+        documents are views of values.
+
+        Parameters
+        ----------
+        values : numpy.ndarray
+            The indices of all documents, one after the other
+        offsets : numpy.ndarray
+            The D + 1 offsets of the documents in values
+
+        Returns
+        -------
+        lst
+            a list of documents, each of which is a view of values
+        """
+
+        return [ values[ start:stop ] for start, stop in zip( offsets[ :-1 ].tolist(), offsets[ 1: ].tolist() ) ]
+
+    @staticmethod
+    def matrixToArrays( matrix ):
+        """Returns the flat arrays of a matrix, without copying them.
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray or scipy.sparse matrix
+            A frequency matrix
+
+        Returns
+        -------
+        dict
+            for a dense matrix, the matrix under 'dense'.  For a sparse
+            one, its 'data', 'indices' and 'indptr' arrays as a csc or
+            csr matrix (other formats are converted to csc first), its
+            'shape' and its 'format'
+        """
+
+        if not sp.issparse( matrix ):
+
+            return { 'format': 'dense', 'dense': np.asarray( matrix ) }
+
+        if matrix.format not in ( 'csc', 'csr' ):
+
+            matrix = sp.csc_matrix( matrix )
+
+        return { 'format': matrix.format, 'shape': matrix.shape, 'data': matrix.data, 'indices': matrix.indices, 'indptr': matrix.indptr }
+
+    @staticmethod
+    def matrixFromArrays( arrays ):
+        """Rebuilds a matrix on the flat arrays returned by
+        matrixToArrays, without copying them.
+
+        Parameters
+        ----------
+        arrays : dict
+            The arrays returned by matrixToArrays
+
+        Raises
+        ------
+        ValueError
+            If the format isn't dense, csc or csr
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse matrix
+            the matrix
+        """
+
+        if arrays[ 'format' ] == 'dense':
+
+            return arrays[ 'dense' ]
+
+        if arrays[ 'format' ] not in ( 'csc', 'csr' ):
+
+            raise ValueError( 'The format must be dense, csc or csr' )
+
+        matrixType = sp.csc_matrix if arrays[ 'format' ] == 'csc' else sp.csr_matrix
+
+        return matrixType( ( arrays[ 'data' ], arrays[ 'indices' ], arrays[ 'indptr' ] ), shape=tuple( arrays[ 'shape' ] ), copy=False )
+
+    @staticmethod
+    def vocabularyToArrow( vocab ):
+        """Turns a vocabulary into an Arrow string array.  The words of
+        a list are encoded into a single buffer once.  A
+        SharedVocabulary is wrapped in place, without copying; it
+        cannot be closed while the array is alive.
+
+        Parameters
+        ----------
+        vocab : lst or SharedVocabulary
+            A list of words
+
+        Returns
+        -------
+        pyarrow.LargeStringArray
+            the words, in vocabulary order
+        """
+
+        pa = _arrow()
+
+        if isinstance( vocab, SharedVocabulary ):
+
+            return pa.LargeStringArray.from_buffers( len( vocab ), pa.py_buffer( vocab._offsets ), pa.py_buffer( vocab._blob ) )
+
+        return pa.array( vocab, type=pa.large_string() )
+
+    @staticmethod
+    def vocabularyFromArrow( array ):
+        """Turns an Arrow string array into a vocabulary list.
+
+        Parameters
+        ----------
+        array : pyarrow.Array or pyarrow.ChunkedArray
+            An array of words
+
+        Returns
+        -------
+        lst
+            the list of words
+        """
+
+        return array.to_pylist()
+
+    @staticmethod
+    def corpusToArrow( idCorpus ):
+        """Turns a token-ID corpus into an Arrow list array.  The
+        documents are copied once, into the values of the array.
+
+        Parameters
+        ----------
+        idCorpus : lst or tuple
+            A list of documents, each of which is an array of vocabulary
+            indices, or the ( values, offsets ) returned by
+            corpusToArrays, which are wrapped without copying
+
+        Returns
+        -------
+        pyarrow.LargeListArray
+            the documents, as lists of int32 indices
+        """
+
+        pa = _arrow()
+
+        values, offsets = idCorpus if isinstance( idCorpus, tuple ) else ArrowExport.corpusToArrays( idCorpus )
+
+        return pa.LargeListArray.from_arrays( pa.array( np.asarray( offsets, dtype=np.int64 ) ), pa.array( values ) )
+
+    @staticmethod
+    def corpusFromArrow( array ):
+        """Turns an Arrow list array into a token-ID corpus, whose
+        documents are views of the array's buffers.
+
+        Parameters
+        ----------
+        array : pyarrow.ListArray, pyarrow.LargeListArray or pyarrow.ChunkedArray
+            The documents
+
+        Returns
+        -------
+        lst
+            a list of documents, each of which is a numpy array of
+            vocabulary indices
+        """
+
+        pa = _arrow()
+
+        if isinstance( array, pa.ChunkedArray ):
+
+            return [ doc for chunk in array.chunks for doc in ArrowExport.corpusFromArrow( chunk ) ]
+
+        # the offsets of a sliced array still index its whole values
+        offsets = array.offsets.to_numpy()
+        values = array.values.to_numpy( zero_copy_only=True )
+
+        return ArrowExport.corpusFromArrays( values, offsets )
+
+    @staticmethod
+    def matrixToArrow( matrix ):
+        """Turns a matrix into an Arrow table, without copying it.
+
+        A sparse matrix becomes a table with one row per document
+        ( column of the matrix ) and list columns indices and counts,
+        holding the word indices and counts of each document.  A dense
+        matrix becomes a table with one row per word and a fixed size
+        list column counts, holding the counts of the word in every
+        document.  A dense matrix with no documents, which a fixed size
+        list can't hold, gets a list column of empty lists instead.  The
+        shape of the matrix is kept in the schema metadata.
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray or scipy.sparse matrix
+            A V x D frequency matrix
+
+        Returns
+        -------
+        pyarrow.Table
+            the matrix
+        """
+
+        pa = _arrow()
+
+        if sp.issparse( matrix ):
+
+            matrix = sp.csc_matrix( matrix )
+            offsets = pa.array( matrix.indptr.astype( np.int64, copy=False ) )
+
+            columns = {
+                'indices': pa.LargeListArray.from_arrays( offsets, pa.array( matrix.indices ) ),
+                'counts': pa.LargeListArray.from_arrays( offsets, pa.array( matrix.data ) ),
+            }
+            layout = b'sparse'
+
+        else:
+
+            matrix = np.ascontiguousarray( matrix )
+
+            if matrix.shape[ 1 ]:
+                columns = { 'counts': pa.FixedSizeListArray.from_arrays( pa.array( matrix.reshape( -1 ) ), matrix.shape[ 1 ] ) }
+            else:
+                columns = { 'counts': pa.ListArray.from_arrays( pa.array( np.zeros( matrix.shape[ 0 ] + 1, dtype=np.int32 ) ), pa.array( matrix.reshape( -1 ) ) ) }
+
+            layout = b'dense'
+
+        metadata = { b'layout': layout, b'shape': ( '%d,%d' % matrix.shape ).encode( 'ascii' ) }
+
+        return pa.table( columns ).replace_schema_metadata( metadata )
+
+    @staticmethod
+    def matrixFromArrow( table ):
+        """Rebuilds a matrix on an Arrow table returned by
+        matrixToArrow, without copying it when the table has a single
+        chunk.
+
+        Parameters
+        ----------
+        table : pyarrow.Table
+            The matrix
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csc_matrix
+            the V x D matrix
+        """
+
+        metadata = table.schema.metadata
+        shape = tuple( int( n ) for n in metadata[ b'shape' ].split( b',' ) )
+
+        table = table.combine_chunks()
+
+        if not table.column( 'counts' ).num_chunks or 0 in shape:
+
+            return np.zeros( shape, dtype=table.schema.field( 'counts' ).type.value_type.to_pandas_dtype() )
+
+        if metadata[ b'layout' ] == b'dense':
+
+            counts = table.column( 'counts' ).chunk( 0 )
+
+            return counts.flatten().to_numpy( zero_copy_only=True ).reshape( shape )
+
+        indices = table.column( 'indices' ).chunk( 0 )
+        counts = table.column( 'counts' ).chunk( 0 )
+
+        return sp.csc_matrix( ( counts.values.to_numpy( zero_copy_only=True ), indices.values.to_numpy( zero_copy_only=True ), indices.offsets.to_numpy() ), shape=shape, copy=False )
+
+    @staticmethod
+    def save( directory, vocab=None, idCorpus=None, matrix=None ):
+        """Writes a vocabulary, token-ID corpus and matrix to Arrow IPC
+        files in directory.  Those not passed aren't written.
+
+        Parameters
+        ----------
+        directory : str
+            The directory the files are written to
+        vocab : lst or SharedVocabulary, optional
+            A list of words
+        idCorpus : lst or tuple, optional
+            A token-ID corpus, or its ( values, offsets )
+        matrix : numpy.ndarray or scipy.sparse matrix, optional
+            A frequency matrix
+        """
+
+        pa = _arrow()
+
+        os.makedirs( directory, exist_ok=True )
+
+        tables = []
+
+        if vocab is not None:
+            tables.append( ( ArrowExport.VOCABULARY, pa.table( { 'words': ArrowExport.vocabularyToArrow( vocab ) } ) ) )
+
+        if idCorpus is not None:
+            tables.append( ( ArrowExport.CORPUS, pa.table( { 'tokens': ArrowExport.corpusToArrow( idCorpus ) } ) ) )
+
+        if matrix is not None:
+            tables.append( ( ArrowExport.MATRIX, ArrowExport.matrixToArrow( matrix ) ) )
+
+        for filename, table in tables:
+
+            with pa.OSFile( os.path.join( directory, filename ), 'wb' ) as sink:
+                with pa.ipc.new_file( sink, table.schema ) as writer:
+                    writer.write_table( table )
+
+    @staticmethod
+    def load( directory ):
+        """Memory-maps the Arrow IPC files written by save.  The corpus
+        and matrix are views of the mapped files.
+
+        Parameters
+        ----------
+        directory : str
+            The directory the files were written to
+
+        Returns
+        -------
+        lst
+            the vocabulary list, or None if it wasn't saved
+        lst
+            the token-ID corpus, or None if it wasn't saved
+        numpy.ndarray or scipy.sparse.csc_matrix
+            the matrix, or None if it wasn't saved
+        """
+
+        pa = _arrow()
+
+        def read( filename ):
+
+            path = os.path.join( directory, filename )
+
+            if not os.path.isfile( path ):
+
+                return None
+
+            return pa.ipc.open_file( pa.memory_map( path, 'r' ) ).read_all()
+
+        vocabTable = read( ArrowExport.VOCABULARY )
+        corpusTable = read( ArrowExport.CORPUS )
+        matrixTable = read( ArrowExport.MATRIX )
+
+        vocabList = ArrowExport.vocabularyFromArrow( vocabTable.column( 'words' ) ) if vocabTable is not None else None
+        idCorpus = ArrowExport.corpusFromArrow( corpusTable.column( 'tokens' ) ) if corpusTable is not None else None
+        matrix = ArrowExport.matrixFromArrow( matrixTable ) if matrixTable is not None else None
+
+        return vocabList, idCorpus, matrix
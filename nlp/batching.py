@@ -0,0 +1,326 @@
+import abc
+import queue
+import threading
+
+import numpy as np
+import scipy.sparse as sp
+
+class _PrefetchingBatches( abc.ABC ):
+    """
+    The background-thread prefetching shared by MatrixBatches and
+    CorpusBatches.  A producer thread assembles batches into a fixed
+    ring of preallocated buffers while the consumer works on the
+    previous ones.  A buffer is handed back to the producer when the
+    consumer asks for the next batch, so a yielded batch is only valid
+    until then; copy it to keep it.  Only one iteration may be in
+    progress at a time.
+
+    Subclasses implement _itemNumber, the number of items; _batches,
+    which splits an order of the items into batches of item indices;
+    _allocate, which returns an empty buffer; and _fill, which writes a
+    batch into a buffer and returns what is yielded.
+    """
+
+    def __init__( self, shuffle=False, seed=None, prefetch=2 ):
+
+        if prefetch < 1:
+
+            raise ValueError( 'At least one batch must be prefetched' )
+
+        self.shuffle = shuffle
+        self.prefetch = prefetch
+
+        self._rng = np.random.default_rng( seed )
+        self._buffers = None
+
+    @abc.abstractmethod
+    def _itemNumber( self ):
+
+        pass
+
+    @abc.abstractmethod
+    def _batches( self, order ):
+
+        pass
+
+    @abc.abstractmethod
+    def _allocate( self ):
+
+        pass
+
+    @abc.abstractmethod
+    def _fill( self, buffers, batch ):
+
+        pass
+
+    def _order( self, itemNumber ):
+
+        if self.shuffle:
+
+            return self._rng.permutation( itemNumber )
+
+        return np.arange( itemNumber )
+
+    def __iter__( self ):
+
+        if self._buffers is None:
+
+            self._buffers = [ self._allocate() for _ in range( self.prefetch + 1 ) ]
+
+        batches = self._batches( self._order( self._itemNumber() ) )
+
+        free = queue.Queue()
+        ready = queue.Queue()
+        stop = threading.Event()
+
+        for slot in range( len( self._buffers ) ):
+            free.put( slot )
+
+        def produce():
+
+            try:
+                for batch in batches:
+
+                    slot = free.get()
+
+                    if stop.is_set():
+                        return
+
+                    ready.put( ( slot, self._fill( self._buffers[ slot ], batch ) ) )
+
+            except BaseException as e:
+                ready.put( ( None, e ) )
+                return
+
+            ready.put( ( None, None ) )
+
+        producer = threading.Thread( target=produce, daemon=True )
+        producer.start()
+
+        try:
+            while True:
+
+                slot, batch = ready.get()
+
+                if slot is None:
+
+                    if batch is not None:
+                        raise batch
+
+                    return
+
+                yield batch
+
+                free.put( slot )
+
+        finally:
+            stop.set()
+
+            # unblock the producer if it is waiting for a free buffer
+            free.put( None )
+            producer.join()
+
+
+class MatrixBatches( _PrefetchingBatches ):
+    """
+    A class used to iterate over minibatches of the documents (columns)
+    of a frequency matrix, assembled in a background thread into
+    preallocated buffers.
+
+    Each batch is a tuple ( docIds, batch ), where docIds are the
+    indices of the documents in the batch and batch is a len( docIds ) x V
+    array whose rows are the columns of the matrix.  The arrays are
+    views of reused buffers, only valid until the next batch is
+    requested.
+
+    Attributes
+    ----------
+    matrix : numpy.ndarray, numpy.memmap or scipy.sparse matrix
+        A V x D frequency matrix
+    batchSize : int
+        The number of documents per batch
+    shuffle : bool
+        Whether documents are shuffled at every iteration
+    prefetch : int
+        The number of batches assembled ahead of the consumer
+    dtype : numpy.dtype
+        The dtype of the batches
+    """
+
+    def __init__( self, matrix, batchSize, shuffle=False, seed=None, prefetch=2, dtype=np.float32 ):
+
+        super().__init__( shuffle, seed, prefetch )
+
+        if batchSize < 1:
+
+            raise ValueError( 'A batch must hold at least one document' )
+
+        if sp.issparse( matrix ):
+
+            matrix = sp.csc_matrix( matrix )
+
+        self.matrix = matrix
+        self.batchSize = batchSize
+        self.dtype = np.dtype( dtype )
+
+    def _itemNumber( self ):
+
+        return self.matrix.shape[ 1 ]
+
+    def __len__( self ):
+
+        return -( -self._itemNumber() // self.batchSize )
+
+    def _batches( self, order ):
+
+        return ( order[ start:start + self.batchSize ] for start in range( 0, len( order ), self.batchSize ) )
+
+    def _allocate( self ):
+
+        return np.zeros( ( self.batchSize, self.matrix.shape[ 0 ] ), dtype=self.dtype )
+
+    def _fill( self, buffer, docIds ):
+
+        batch = buffer[ :len( docIds ) ]
+
+        if sp.issparse( self.matrix ):
+
+            indptr, indices, data = self.matrix.indptr, self.matrix.indices, self.matrix.data
+
+            batch[ : ] = 0
+
+            for row, doc in zip( batch, docIds ):
+                row[ indices[ indptr[ doc ]:indptr[ doc + 1 ] ] ] = data[ indptr[ doc ]:indptr[ doc + 1 ] ]
+
+        else:
+
+            for row, doc in zip( batch, docIds ):
+                row[ : ] = self.matrix[ :, doc ]
+
+        return docIds, batch
+
+
+class CorpusBatches( _PrefetchingBatches ):
+    """
+    A class used to iterate over minibatches of a token-ID corpus,
+    padded into preallocated buffers in a background thread.
+
+    Batches either hold a fixed number of documents (batchSize) or as
+    many documents as fit in a number of padded tokens (tokenBudget).
+    Each batch is a tuple ( docIds, tokens, lengths ), where tokens is a
+    len( docIds ) x L int32 array of the documents padded with padValue
+    to the length L of the longest one, and lengths holds the unpadded
+    length of each document.  The arrays are views of reused buffers,
+    only valid until the next batch is requested.
+
+    Attributes
+    ----------
+    idCorpus : lst
+        A list of documents, each of which is an array of vocabulary
+        indices
+    batchSize : int
+        The number of documents per batch, or None
+    tokenBudget : int
+        The maximum number of padded tokens per batch, or None.  Longer
+        documents are truncated to it, and empty ones count as one token
+    shuffle : bool
+        Whether documents are shuffled at every iteration
+    prefetch : int
+        The number of batches assembled ahead of the consumer
+    padValue : int
+        The value documents are padded with
+    """
+
+    def __init__( self, idCorpus, batchSize=None, tokenBudget=None, shuffle=False, seed=None, prefetch=2, padValue=0 ):
+
+        super().__init__( shuffle, seed, prefetch )
+
+        if ( batchSize is None ) == ( tokenBudget is None ):
+
+            raise ValueError( 'Exactly one of batchSize and tokenBudget must be passed' )
+
+        if ( batchSize if tokenBudget is None else tokenBudget ) < 1:
+
+            raise ValueError( 'A batch must hold at least one document or token' )
+
+        self.idCorpus = idCorpus
+        self.batchSize = batchSize
+        self.tokenBudget = tokenBudget
+        self.padValue = padValue
+
+        self._lengths = np.array( [ len( doc ) for doc in idCorpus ], dtype=np.int64 )
+
+        if tokenBudget is not None:
+
+            np.minimum( self._lengths, tokenBudget, out=self._lengths )
+
+    def _itemNumber( self ):
+
+        return len( self.idCorpus )
+
+    def __len__( self ):
+
+        # with a token budget, shuffled iterations may pack documents
+        # into a slightly different number of batches
+        return sum( 1 for _ in self._batches( np.arange( self._itemNumber() ) ) )
+
+    def _batches( self, order ):
+
+        if self.batchSize is not None:
+
+            for start in range( 0, len( order ), self.batchSize ):
+                yield order[ start:start + self.batchSize ]
+
+            return
+
+        # an empty document costs one token, so a batch never holds more
+        # documents than the tokenBudget rows of the length buffer
+        start = 0
+        longest = 1
+
+        for stop, doc in enumerate( order ):
+
+            longest = max( longest, self._lengths[ doc ] )
+
+            # close the batch before the document that overflows it
+            if ( stop - start + 1 ) * longest > self.tokenBudget and stop > start:
+
+                yield order[ start:stop ]
+
+                start = stop
+                longest = max( self._lengths[ doc ], 1 )
+
+        if start < len( order ):
+
+            yield order[ start: ]
+
+    def _allocate( self ):
+
+        if self.batchSize is not None:
+
+            capacity = self.batchSize * int( self._lengths.max( initial=0 ) )
+            rows = self.batchSize
+
+        else:
+
+            capacity = self.tokenBudget
+            rows = self.tokenBudget
+
+        return np.empty( max( capacity, 1 ), dtype=np.int32 ), np.empty( max( rows, 1 ), dtype=np.int32 )
+
+    def _fill( self, buffers, docIds ):
+
+        tokenBuffer, lengthBuffer = buffers
+
+        lengths = lengthBuffer[ :len( docIds ) ]
+        lengths[ : ] = self._lengths[ docIds ]
+
+        longest = int( lengths.max( initial=0 ) )
+
+        tokens = tokenBuffer[ :len( docIds ) * longest ].reshape( len( docIds ), longest )
+        tokens[ : ] = self.padValue
+
+        for row, doc, length in zip( tokens, docIds, lengths ):
+            row[ :length ] = self.idCorpus[ doc ][ :length ]
+
+        return docIds, tokens, lengths
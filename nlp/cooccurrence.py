@@ -0,0 +1,253 @@
+import numpy as np
+import scipy.sparse as sp
+
+class Cooccurrence( object ):
+    """
+    A class used to count how often pairs of words occur within a window
+    of each other in a corpus, as a sparse V x V matrix.
+
+    The corpus is a list of documents, each of which is an array of
+    vocabulary indices (see encode).  Pairs are found with vectorised
+    shifts of whole blocks of documents rather than per-token loops, and
+    each block becomes a scipy.sparse.csr_matrix, so memory grows with
+    the number of distinct pairs rather than with V x V.  Block matrices
+    are summed pairwise rather than into one running total, so each pair
+    is re-added O( log( blocks ) ) times rather than once per block.
+    Matrices built on different shards or processes can be summed with
+    merge.
+
+    Attributes
+    ----------
+    window : int
+        The maximum distance, in tokens, between two co-occurring words
+    weighting : str
+        None to count every pair once, or 'harmonic' to weight a pair
+        at distance d by 1 / d
+    symmetric : bool
+        If True, the [ i, j ] entry counts word j occurring within the
+        window before or after word i.  If False, it only counts word j
+        occurring after word i
+    minCount : float
+        Entries lower than this are pruned from the built matrix
+    blockSize : int
+        The approximate number of pairs accumulated per block
+
+    Methods
+    -------
+    encode( adjustedCorpus, vocabList )
+        Static method that turns a corpus of lists of words into a
+        corpus of arrays of vocabulary indices
+
+    build( idCorpus, wordNumber )
+        Builds the co-occurrence matrix of a corpus
+
+    merge( *matrices )
+        Static method that sums co-occurrence matrices built on
+        different parts of a corpus
+
+    prune( matrix, minCount )
+        Static method that removes entries lower than minCount
+    """
+
+    WEIGHTINGS = ( None, 'harmonic' )
+
+    def __init__( self, window=5, weighting=None, symmetric=True, minCount=0, blockSize=2 ** 22 ):
+
+        if window < 1:
+
+            raise ValueError( 'The window must be at least 1' )
+
+        if weighting not in Cooccurrence.WEIGHTINGS:
+
+            raise ValueError( 'The weighting must be one of %s' % ', '.join( map( str, Cooccurrence.WEIGHTINGS ) ) )
+
+        self.window = window
+        self.weighting = weighting
+        self.symmetric = symmetric
+        self.minCount = minCount
+        self.blockSize = blockSize
+
+    @staticmethod
+    def encode( adjustedCorpus, vocabList ):
+        """Turns a corpus of lists of words, such as the adjusted corpus
+        returned by Vocabularise.vocabularise, into a corpus of arrays of
+        vocabulary indices.  Words not in vocabList are skipped.
+
+        Parameters
+        ----------
+        adjustedCorpus : lst
+            A list of documents, each of which is a list of words
+        vocabList : lst
+            A list of words with no repetitions
+
+        Returns
+        -------
+        lst
+            a list of documents, each of which is an int32 array of
+            indices into vocabList
+        """
+
+        vidx = { w:idx for idx, w in enumerate( vocabList ) }
+
+        return [ np.array( [ idx for idx in map( vidx.get, doc ) if idx is not None ], dtype=np.int32 ) for doc in adjustedCorpus ]
+
+    def build( self, idCorpus, wordNumber ):
+        """Builds the co-occurrence matrix of a corpus.  Pairs never
+        cross document boundaries.
+
+        Parameters
+        ----------
+        idCorpus : lst
+            A list of documents, each of which is an array of vocabulary
+            indices
+        wordNumber : int
+            The number of words in the vocabulary
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            A V x V matrix, int32 if weighting is None and float32
+            otherwise.  The [ i, j ] entry is the (weighted) number of
+            times word j occurs within the window of word i
+        """
+
+        dtype = np.int32 if self.weighting is None else np.float32
+
+        # block matrices are summed pairwise, like a binary counter, so
+        # every pair is only re-added O( log( blocks ) ) times
+        partials = []
+
+        def add( matrix ):
+
+            level = 0
+
+            while partials and partials[ -1 ][ 0 ] == level:
+
+                matrix = partials.pop()[ 1 ] + matrix
+                level += 1
+
+            partials.append( ( level, matrix ) )
+
+        block = []
+        blockTokens = 0
+
+        for doc in idCorpus:
+
+            block.append( np.asarray( doc, dtype=np.int32 ) )
+            blockTokens += len( doc )
+
+            if blockTokens * self.window >= self.blockSize:
+
+                add( self._buildBlock( block, wordNumber, dtype ) )
+                block = []
+                blockTokens = 0
+
+        if block:
+
+            add( self._buildBlock( block, wordNumber, dtype ) )
+
+        result = sp.csr_matrix( ( wordNumber, wordNumber ), dtype=dtype )
+
+        for _, matrix in reversed( partials ):
+
+            result = result + matrix
+
+        result = sp.csr_matrix( result, dtype=dtype )
+
+        if self.minCount:
+
+            result = Cooccurrence.prune( result, self.minCount )
+
+        return result
+
+    def _buildBlock( self, block, wordNumber, dtype ):
+
+        tokens = np.concatenate( block )
+        docIdx = np.repeat( np.arange( len( block ), dtype=np.int32 ), [ len( doc ) for doc in block ] )
+
+        rows = []
+        cols = []
+        weights = []
+
+        for distance in range( 1, self.window + 1 ):
+
+            if distance >= len( tokens ):
+                break
+
+            sameDoc = docIdx[ :-distance ] == docIdx[ distance: ]
+            left = tokens[ :-distance ][ sameDoc ]
+            right = tokens[ distance: ][ sameDoc ]
+            weight = 1 if self.weighting is None else 1.0 / distance
+
+            rows.append( left )
+            cols.append( right )
+            weights.append( np.full( len( left ), weight, dtype=dtype ) )
+
+            if self.symmetric:
+
+                rows.append( right )
+                cols.append( left )
+                weights.append( weights[ -1 ] )
+
+        if not rows:
+
+            return sp.csr_matrix( ( wordNumber, wordNumber ), dtype=dtype )
+
+        # duplicate pairs are summed when converting to csr
+        return sp.coo_matrix( ( np.concatenate( weights ), ( np.concatenate( rows ), np.concatenate( cols ) ) ), shape=( wordNumber, wordNumber ) ).tocsr()
+
+    @staticmethod
+    def merge( *matrices ):
+        """Sums co-occurrence matrices built on different parts of a
+        corpus with the same vocabulary.
+
+        Parameters
+        ----------
+        matrices : an arbitrary number of co-occurrence matrices
+
+        Raises
+        ------
+        ValueError
+            If the matrices don't all have the same shape
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            the summed matrix
+        """
+
+        if len( { matrix.shape for matrix in matrices } ) > 1:
+
+            raise ValueError( 'All matrices must have the same shape' )
+
+        result = sp.csr_matrix( matrices[ 0 ] )
+
+        for matrix in matrices[ 1: ]:
+
+            result = result + matrix
+
+        return sp.csr_matrix( result )
+
+    @staticmethod
+    def prune( matrix, minCount ):
+        """Removes the entries of a co-occurrence matrix lower than
+        minCount.
+
+        Parameters
+        ----------
+        matrix : scipy.sparse matrix
+            A co-occurrence matrix
+        minCount : float
+            The lowest entry kept
+
+        Returns
+        -------
+        scipy.sparse.csr_matrix
+            the pruned matrix
+        """
+
+        matrix = sp.csr_matrix( matrix, copy=True )
+        matrix.data[ matrix.data < minCount ] = 0
+        matrix.eliminate_zeros()
+
+        return matrix
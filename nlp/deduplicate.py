@@ -0,0 +1,262 @@
+import zlib
+from multiprocessing import Pool
+
+import numpy as np
+
+# The Mersenne prime 2^31 - 1 keeps a * x + b within uint64 for every
+# shingle hash x and permutation coefficients a, b below it.
+_PRIME = np.uint64( 2 ** 31 - 1 )
+
+def _signatures( args ):
+
+    tokenDocs, shingleSize, a, b = args
+
+    signatures = np.full( ( len( tokenDocs ), len( a ) ), _PRIME, dtype=np.uint64 )
+
+    for i, tokens in enumerate( tokenDocs ):
+
+        shingles = Deduplicator.shingles( tokens, shingleSize )
+
+        if len( shingles ):
+
+            hashes = ( a[ None, : ] * ( shingles[ :, None ] % _PRIME ) + b[ None, : ] ) % _PRIME
+            signatures[ i ] = hashes.min( axis=0 )
+
+    return signatures.astype( np.uint32 )
+
+class Deduplicator( object ):
+    """
+    A class used to find near-duplicate documents in a tokenised corpus
+    before it is vocabularised and frequentised, with MinHash signatures
+    and locality sensitive hashing (LSH).
+
+    Documents are compared as sets of shingles (runs of shingleSize
+    consecutive tokens).  Every document gets a MinHash signature of
+    permutations values, computed for all permutations at once with
+    numpy.  Signatures are cut into bands; documents sharing a band are
+    candidates, and candidates whose signatures agree on at least
+    threshold of their values (the estimated Jaccard similarity of
+    their shingle sets) are duplicates.  Duplicates are grouped
+    transitively, and the first document of every group is kept.
+
+    Attributes
+    ----------
+    permutations : int
+        The length of the MinHash signatures
+    bands : int
+        The number of LSH bands the signatures are cut into
+    threshold : float
+        The lowest estimated Jaccard similarity of duplicates
+    shingleSize : int
+        The number of tokens per shingle
+
+    Methods
+    -------
+    shingles( tokens, shingleSize )
+        Static method that hashes the shingles of a document
+
+    signatures( tokenDocs, processes=None )
+        Computes the MinHash signatures of a corpus
+
+    duplicates( signatures )
+        Finds the groups of near-duplicate documents from their
+        signatures
+
+    deduplicate( tokenDocs, processes=None )
+        Returns the indices of the documents to keep, and the groups of
+        near-duplicates
+    """
+
+    def __init__( self, permutations=128, bands=32, threshold=0.8, shingleSize=3, seed=1 ):
+
+        if permutations % bands:
+
+            raise ValueError( 'The number of permutations must be a multiple of the number of bands' )
+
+        self.permutations = permutations
+        self.bands = bands
+        self.threshold = threshold
+        self.shingleSize = shingleSize
+
+        rng = np.random.default_rng( seed )
+        self._a = rng.integers( 1, int( _PRIME ), size=permutations, dtype=np.uint64 )
+        self._b = rng.integers( 0, int( _PRIME ), size=permutations, dtype=np.uint64 )
+
+    @staticmethod
+    def shingles( tokens, shingleSize ):
+        """Hashes the shingles of a document.  A document shorter than
+        shingleSize is a single shingle.
+
+        Parameters
+        ----------
+        tokens : lst
+            A tokenised document
+        shingleSize : int
+            The number of tokens per shingle
+
+        Returns
+        -------
+        numpy.ndarray
+            the distinct uint64 hashes of the shingles
+        """
+
+        if not tokens:
+
+            return np.zeros( 0, dtype=np.uint64 )
+
+        stop = max( len( tokens ) - shingleSize + 1, 1 )
+
+        hashes = [ zlib.crc32( '\x1f'.join( tokens[ i:i + shingleSize ] ).encode( 'utf-8' ) ) for i in range( stop ) ]
+
+        return np.unique( np.array( hashes, dtype=np.uint64 ) )
+
+    def signatures( self, tokenDocs, processes=None ):
+        """Computes the MinHash signatures of a corpus.  Empty documents
+        get a signature that matches no other document.
+
+        Parameters
+        ----------
+        tokenDocs : lst
+            A list of documents, each of which is a list of tokens
+        processes : int, optional
+            If more than 1, the corpus is split into this many shards
+            whose signatures are computed in a process pool
+
+        Returns
+        -------
+        numpy.ndarray
+            a D x permutations uint32 array of signatures
+        """
+
+        if not processes or processes < 2 or len( tokenDocs ) < 2:
+
+            return _signatures( ( tokenDocs, self.shingleSize, self._a, self._b ) )
+
+        bounds = np.linspace( 0, len( tokenDocs ), processes + 1 ).astype( int )
+        shards = [ ( tokenDocs[ start:stop ], self.shingleSize, self._a, self._b ) for start, stop in zip( bounds[ :-1 ], bounds[ 1: ] ) ]
+
+        with Pool( processes ) as pool:
+            return np.concatenate( pool.map( _signatures, shards ) )
+
+    def duplicates( self, signatures ):
+        """Finds the groups of near-duplicate documents from their
+        signatures.
+
+        Parameters
+        ----------
+        signatures : numpy.ndarray
+            The D x permutations signatures returned by signatures()
+
+        Returns
+        -------
+        lst
+            a list of sorted arrays of document indices, one per group
+            of two or more near-duplicates, ordered by first document
+        """
+
+        docNumber = len( signatures )
+        parents = np.arange( docNumber )
+
+        def root( doc ):
+
+            while parents[ doc ] != doc:
+
+                parents[ doc ] = parents[ parents[ doc ] ]
+                doc = parents[ doc ]
+
+            return doc
+
+        def union( first, second ):
+
+            first, second = root( first ), root( second )
+
+            if first != second:
+
+                parents[ max( first, second ) ] = min( first, second )
+
+        # empty documents have every value at the maximum, and never match
+        empty = ( signatures == int( _PRIME ) ).all( axis=1 )
+        rows = self.permutations // self.bands
+
+        for band in range( self.bands ):
+
+            keys = np.ascontiguousarray( signatures[ :, band * rows:( band + 1 ) * rows ] )
+            _, bucketOf, bucketSizes = np.unique( keys, axis=0, return_inverse=True, return_counts=True )
+
+            bucketOf = bucketOf.reshape( -1 )
+            shared = np.flatnonzero( ( bucketSizes[ bucketOf ] > 1 ) & ~empty )
+
+            if not len( shared ):
+                continue
+
+            order = shared[ np.argsort( bucketOf[ shared ], kind='stable' ) ]
+            buckets = np.split( order, np.flatnonzero( np.diff( bucketOf[ order ] ) ) + 1 )
+
+            for bucket in buckets:
+
+                # every member is checked against the bucket's
+                # representatives only: members matching none of them
+                # become representatives themselves
+                representatives = []
+
+                for doc in bucket:
+
+                    docRoot = root( doc )
+
+                    if any( root( other ) == docRoot for other in representatives ):
+                        continue
+
+                    if representatives:
+
+                        matches = ( signatures[ representatives ] == signatures[ doc ] ).mean( axis=1 ) >= self.threshold
+
+                        if matches.any():
+
+                            for other in np.asarray( representatives )[ matches ]:
+                                union( other, doc )
+
+                            continue
+
+                    representatives.append( doc )
+
+        roots = np.array( [ root( doc ) for doc in range( docNumber ) ], dtype=np.int64 )
+
+        _, groupOf, groupSizes = np.unique( roots, return_inverse=True, return_counts=True )
+
+        grouped = np.flatnonzero( groupSizes[ groupOf ] > 1 )
+        groups = {}
+
+        for doc in grouped:
+            groups.setdefault( roots[ doc ], [] ).append( doc )
+
+        return [ np.array( groups[ key ], dtype=np.int64 ) for key in sorted( groups ) ]
+
+    def deduplicate( self, tokenDocs, processes=None ):
+        """Finds the near-duplicate documents of a corpus, and returns
+        the indices of the documents to keep: every document that has
+        no near-duplicate, and the first document of every group of
+        near-duplicates.
+
+        Parameters
+        ----------
+        tokenDocs : lst
+            A list of documents, each of which is a list of tokens
+        processes : int, optional
+            The number of processes computing signatures
+
+        Returns
+        -------
+        numpy.ndarray
+            the sorted indices of the documents to keep
+        lst
+            the groups of near-duplicates, as returned by duplicates()
+        """
+
+        groups = self.duplicates( self.signatures( tokenDocs, processes ) )
+
+        dropped = np.zeros( len( tokenDocs ), dtype=bool )
+
+        for group in groups:
+            dropped[ group[ 1: ] ] = True
+
+        return np.flatnonzero( ~dropped ), groups
@@ -1,9 +1,11 @@
 import numpy as np
+import scipy.sparse as sp
 import pickle
 from datetime import datetime
 import time 
 
 from nlp.vocabularise import Vocabularise
+from nlp.sharedvocabulary import SharedVocabulary
 
 class Frequentise( object ):
     """
@@ -15,29 +17,39 @@ class Frequentise( object ):
 
     Methods
     -------
-    frequentise( corpus, tokeniser=None, cleanup=None, stem=False )
+    frequentise( corpus, V=None, tokeniser=None, cleanup=None, stem=False, plan=None, index=None )
         Turn a corpus of documents into a cleaned up vocabulary list, an
         appropriately adjusted corpus, and a frequency matrix
     
-    merge( vx, vy, mx, my )
+    merge( vx, vy, mx, my, plan=None )
         Merges two frequency matrices (and their appropriate vocabulary
         lists) into a single frequency matrix (and its appropriate vocabulary
         list)
+
+    collapse( vocabList, frequencyMatrix, groups=None, keepUnmapped=True )
+        Sums the rows of a frequency matrix into one row per stem, or
+        per group of any other word to group mapping
     
-    saveMergedFiles( vocabList, adjustedCorpus, frequencyMatrix, filename=None )
-        Saves the passed files to the local directory
+    saveMergedFiles( vocabList, adjustedCorpus, frequencyMatrix )
+        Saves the passed files to the local directory.  Use a MatrixStore
+        to store large frequency matrices in chunks instead
         
     loadFile( filename )
         Loads a pickled file from the local directory
     """
     
-    def frequentise( self, corpus, V=None, tokeniser=None, cleanup=None, stem=False ):
+    def frequentise( self, corpus, V=None, tokeniser=None, cleanup=None, stem=False, plan=None, index=None ):
         """Turn a corpus of documents into a cleaned up vocabulary list, an
         appropriately adjusted corpus, and a frequency matrix.
 
         This method creates the vocabulary from the corpus unless V is specified.
         
-        If V is specified, it is assumed that every token in the corpus exists in V.
+        If V is specified, the corpus is preprocessed with the same tokeniser,
+        cleanup and stem arguments, and tokens that don't exist in V are
+        skipped when counting.  V may also be a SharedVocabulary, in which
+        case its shared index is used for lookups instead of building a new
+        one.  To transform many corpora or documents with the same V, use a
+        fitted FrequencyTransformer instead, which keeps its index.
 
         If tokeniser is not passed, the nltk.tokenize tokenizer
         word_tokenize is used to tokenise instead.
@@ -46,11 +58,18 @@ class Frequentise( object ):
         
         If stem is not passed, no stemming is performed.        
 
+        If plan is passed, the frequency matrix is built with the layout it
+        chose, after checking its actual size against the plan's memory
+        budget.  Otherwise a dense matrix is built.
+
+        If index is passed, it is filled with the postings of every word
+        in the same counting pass.
+
         Parameters
         ----------
         corpus : lst
             A list of documents, each of which is a string.
-        V: lst
+        V: lst or SharedVocabulary
             A list of words constituting a pre-specifed vocabulary
         tokeniser : str
             The regular expression to tokenise with
@@ -59,6 +78,16 @@ class Frequentise( object ):
         stem : bool
             Stemming is performed if and only if this boolean
             is True
+        plan : OutputPlan, optional
+            The plan returned by OutputPlanner.plan for this corpus
+        index : InvertedIndex, optional
+            An empty inverted index, filled on vocabList
+
+        Raises
+        ------
+        MemoryError
+            If plan is passed and the frequency matrix doesn't fit its
+            memory budget
 
         Returns
         -------
@@ -68,7 +97,7 @@ class Frequentise( object ):
         lst
             A list of documents, each of which is a list of words found
             in vocabList
-        numpy.ndarray
+        numpy.ndarray or scipy.sparse.csc_matrix
             A V x D matrix, where V is the number of words in the new 
             vocabulary list and D is the number of documents in the corpus.
             The [ i, j ] entry of this matrix is the number of times the i'th
@@ -81,33 +110,70 @@ class Frequentise( object ):
         if not vocabList:
             vocabList, adjustedCorpus = vize.vocabularise( corpus, tokeniser, cleanup, stem )
         else:
-            adjustedCorpus = [ vize.tokensCleanup( vize.tokenise( doc ), regex=None ) for doc in corpus ]
+            adjustedCorpus = [ vize.preprocess( doc, tokeniser, cleanup, stem ) for doc in corpus ]
 
         wordNumber = len( vocabList )
         docNumber = len( adjustedCorpus )
-        frequencyMatrix = np.zeros( [ wordNumber, docNumber ], dtype=np.int16 )
+        layout = plan.check( wordNumber, docNumber ) if plan else 'dense'
+
+        if isinstance( vocabList, SharedVocabulary ):
+            vidx = vocabList
+        else:
+            vidx = { w:idx for idx, w in enumerate( vocabList) }
+
+        lookup = vidx.get
+
+        if index is not None:
+            index.setVocabulary( vocabList )
+
+        if layout == 'sparse':
+            columns = []
+
+            for j, doc in enumerate( adjustedCorpus ):
+                ids = [ idx for idx in map( lookup, doc ) if idx is not None ]
+                columns.append( np.unique( np.array( ids, dtype=np.int32 ), return_counts=True ) )
+
+                if index is not None:
+                    index.addDocument( j, *columns[ -1 ] )
+
+            indptr = np.zeros( docNumber + 1, dtype=np.int64 )
+            np.cumsum( [ len( indices ) for indices, _ in columns ], out=indptr[ 1: ] )
+
+            plan.check( wordNumber, docNumber, nonZeros=int( indptr[ -1 ] ) )
+
+            indices = np.concatenate( [ indices for indices, _ in columns ] ) if columns else np.zeros( 0, dtype=np.int32 )
+            counts = np.concatenate( [ counts for _, counts in columns ] ) if columns else np.zeros( 0, dtype=np.int64 )
 
-        vidx = { w:idx for idx, w in enumerate( vocabList) }
+            frequencyMatrix = sp.csc_matrix( ( counts.astype( np.int16 ), indices, indptr ), shape=( wordNumber, docNumber ) )
+
+            return vocabList, adjustedCorpus, frequencyMatrix
+
+        if plan:
+            frequencyMatrix = plan.allocate( [ wordNumber, docNumber ], dtype=np.int16 )
+        else:
+            frequencyMatrix = np.zeros( [ wordNumber, docNumber ], dtype=np.int16 )
 
         for j in range( docNumber ):
-            x = np.zeros( wordNumber, dtype=np.int16 )
+            ids = [ idx for idx in map( lookup, adjustedCorpus[ j ] ) if idx is not None ]
+            indices, counts = np.unique( np.array( ids, dtype=np.int32 ), return_counts=True )
 
-            for w in adjustedCorpus[ j ]:
-                try:
-                    idx = vidx[ w ]
-                    x[ idx ] += 1
-                except:
-                    continue
+            frequencyMatrix[ indices, j ] = counts
 
-            frequencyMatrix[ :,j ] += x
+            if index is not None:
+                index.addDocument( j, indices, counts )
 
         return vocabList, adjustedCorpus, frequencyMatrix
 
 
-    def merge( self, vx, vy, mx, my ):
+    def merge( self, vx, vy, mx, my, plan=None ):
         """Merges two frequency matrices (and their appropriate vocabulary
         lists) into a single frequency matrix (and its appropriate vocabulary
         list)
+
+        The merged matrix keeps the dtype of mx and my.  If plan is passed,
+        it is built with the layout the plan chose, after checking its actual
+        size against the plan's memory budget.  Otherwise a dense matrix is
+        built.
         
         Parameters
         ----------
@@ -115,10 +181,12 @@ class Frequentise( object ):
             The first list of words
         vy : lst
             The second list of words
-        mx : numpy.ndarray
+        mx : numpy.ndarray or scipy.sparse matrix
             A frequency matrix, whose rows are indexed by vx
-        my : numpy.ndarray
+        my : numpy.ndarray or scipy.sparse matrix
             A frequency matrix, whose rows are indexed by vy
+        plan : OutputPlan, optional
+            The plan for the merged matrix
 
         Raises
         ------
@@ -126,13 +194,16 @@ class Frequentise( object ):
             If either the number of rows in mx doesn't match the length of
             vx or the number of rows in my doesn't match the length of
             vy
+        MemoryError
+            If plan is passed and the merged matrix doesn't fit its
+            memory budget
 
         Returns
         -------
         lst
             a list of all words in vx and vy with no
             repetitions
-        numpy.ndarray
+        numpy.ndarray or scipy.sparse.csc_matrix
             A V x D matrix, where V is the number of words in the new 
             vocabulary list and D is the number of documents in the new
             combined corpus. The [ i, j ] entry of this matrix is the number
@@ -143,11 +214,8 @@ class Frequentise( object ):
         wordNumx, docNumx = mx.shape
         wordNumy, docNumy = my.shape
         
-        vxdict = { word:idx for idx, word in enumerate( vx ) }
-        vydict = { word:idx for idx, word in enumerate( vy ) }
-        
-        assert isinstance( mx, np.ndarray )
-        assert isinstance( my, np.ndarray )
+        assert isinstance( mx, np.ndarray ) or sp.issparse( mx )
+        assert isinstance( my, np.ndarray ) or sp.issparse( my )
 
         if len( vx ) != wordNumx:
             raise ValueError( 'The number of rows in mx must match the size of vx' )
@@ -157,20 +225,127 @@ class Frequentise( object ):
 
         combinedV = list( set( vx + vy ) )
 
-        mergedMatrix = np.zeros( [ len( combinedV ), docNumx + docNumy ] )
-        
-        for idx, word in enumerate( combinedV ):
-            
-            if word in vxdict:
-                
-                mergedMatrix[ idx, :docNumx ] += mx[ vxdict[ word ] ]
+        cidx = { word:idx for idx, word in enumerate( combinedV ) }
+        rowsx = np.array( [ cidx[ word ] for word in vx ], dtype=np.int64 )
+        rowsy = np.array( [ cidx[ word ] for word in vy ], dtype=np.int64 )
+
+        shape = ( len( combinedV ), docNumx + docNumy )
+        dtype = np.result_type( mx.dtype, my.dtype )
 
-            if word in vydict:
-                
-                mergedMatrix[ idx, docNumx: ] += my[ vydict[ word ] ]
+        layout = 'dense'
+
+        if plan:
+            nonZeros = ( mx.nnz if sp.issparse( mx ) else np.count_nonzero( mx ) ) + ( my.nnz if sp.issparse( my ) else np.count_nonzero( my ) )
+            layout = plan.check( shape[ 0 ], shape[ 1 ], nonZeros=nonZeros, dtype=dtype )
+
+        if layout == 'sparse':
+            cx = sp.coo_matrix( mx )
+            cy = sp.coo_matrix( my )
+
+            data = np.concatenate( [ cx.data, cy.data ] ).astype( dtype )
+            rows = np.concatenate( [ rowsx[ cx.row ], rowsy[ cy.row ] ] )
+            cols = np.concatenate( [ cx.col, cy.col + docNumx ] )
+
+            return combinedV, sp.csc_matrix( ( data, ( rows, cols ) ), shape=shape )
+
+        if plan:
+            mergedMatrix = plan.allocate( shape, dtype=dtype )
+        else:
+            mergedMatrix = np.zeros( shape, dtype=dtype )
+
+        mergedMatrix[ rowsx, :docNumx ] = mx.toarray() if sp.issparse( mx ) else mx
+        mergedMatrix[ rowsy, docNumx: ] = my.toarray() if sp.issparse( my ) else my
                         
         return combinedV, mergedMatrix
     
+    def collapse( self, vocabList, frequencyMatrix, groups=None, keepUnmapped=True ):
+        """Sums the rows of a frequency matrix into one row per group of
+        words, without going back to the corpus.
+
+        If groups isn't passed, the words are stemmed once each with
+        Vocabularise.stem and grouped by stem, which gives the matrix
+        frequentise( corpus, stem=True ) would with the same tokeniser
+        and cleanup, up to the order of its rows.  Any other mapping,
+        such as lemmas or synonym lists, can be passed as groups.
+
+        Parameters
+        ----------
+        vocabList : lst
+            A list of words with no repetitions
+        frequencyMatrix : numpy.ndarray or scipy.sparse matrix
+            A V x D frequency matrix whose rows are indexed by vocabList
+        groups : dict, optional
+            Either a map with groups as keys and lists of words as
+            values, like the stem map returned by Vocabularise.stem, or
+            a map with words as keys and their group as values.  A word
+            can belong to several groups
+        keepUnmapped : bool
+            If True, words that aren't in any group are kept as groups
+            of their own.  Otherwise their rows are dropped
+
+        Raises
+        ------
+        ValueError
+            If the number of rows in frequencyMatrix doesn't match the
+            length of vocabList
+
+        Returns
+        -------
+        lst
+            the list of groups, in order of first appearance
+        numpy.ndarray or scipy.sparse.csc_matrix
+            A G x D matrix with the dtype of frequencyMatrix, sparse if
+            frequencyMatrix is.  The [ i, j ] entry of this matrix is the
+            number of times the words of the i'th group appear in the
+            j'th document
+        """
+
+        if len( vocabList ) != frequencyMatrix.shape[ 0 ]:
+            raise ValueError( 'The number of rows in frequencyMatrix must match the size of vocabList' )
+
+        if groups is None:
+
+            _, groups = Vocabularise().stem( vocabList )
+
+        vidx = { word:idx for idx, word in enumerate( vocabList ) }
+        gidx = {}
+        pairs = set()
+
+        for key, value in groups.items():
+
+            if isinstance( value, str ):
+                group, words = value, [ key ]
+            else:
+                group, words = key, value
+
+            for word in words:
+
+                row = vidx.get( word )
+
+                if row is not None:
+                    pairs.add( ( gidx.setdefault( group, len( gidx ) ), row ) )
+
+        if keepUnmapped:
+
+            mapped = { row for _, row in pairs }
+
+            for row, word in enumerate( vocabList ):
+
+                if row not in mapped:
+                    pairs.add( ( gidx.setdefault( word, len( gidx ) ), row ) )
+
+        groupList = list( gidx )
+
+        # each group row of the indicator sums the rows of its words
+        groupRows, wordRows = np.array( sorted( pairs ), dtype=np.int64 ).reshape( -1, 2 ).T
+        indicator = sp.csr_matrix( ( np.ones( len( groupRows ), dtype=frequencyMatrix.dtype ), ( groupRows, wordRows ) ), shape=( len( groupList ), len( vocabList ) ) )
+
+        if sp.issparse( frequencyMatrix ):
+
+            return groupList, sp.csc_matrix( indicator @ sp.csc_matrix( frequencyMatrix ) )
+
+        return groupList, np.asarray( indicator @ frequencyMatrix ).astype( frequencyMatrix.dtype, copy=False )
+
     def saveMergedFiles( self, vocabList, adjustedCorpus, frequencyMatrix ):
         """Saves the vocab list, adjusted corpus, and frequency matrix
         to the local directory
@@ -195,8 +370,8 @@ class Frequentise( object ):
             
             filename = str( default_name + dateTimeObj.strftime( "%d-%b-%Y-%H-%M" ) + '.PKL' ) 
    
-        with open( filename, 'wb' ) as outfile:
-            pickle.dump( file, outfile )
+            with open( filename, 'wb' ) as outfile:
+                pickle.dump( file, outfile )
         
     def loadFile( self, filename ):
         """Loads a pickled file from the passed local directory location.
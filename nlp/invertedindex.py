@@ -0,0 +1,396 @@
+import numpy as np
+import scipy.sparse as sp
+
+class InvertedIndex( object ):
+    """
+    A class used to find the documents containing given words without
+    scanning a frequency matrix or an adjusted corpus.
+
+    Every word of the vocabulary has a postings list: the sorted indices
+    of the documents it appears in, delta-encoded, and the number of
+    times it appears in each of them.  All postings lists are stored in
+    three flat arrays (offsets, deltas and term frequencies).
+
+    An index can be filled in the same counting pass as a frequency
+    matrix by passing it to Frequentise.frequentise, or built from an
+    existing matrix with fromMatrix.
+
+    Attributes
+    ----------
+    vocabList : lst
+        The vocabulary the index is built on
+    docNumber : int
+        The number of documents indexed
+
+    Methods
+    -------
+    setVocabulary( vocabList )
+        Sets the vocabulary of an empty index
+
+    addDocument( docId, indices, counts )
+        Adds the words of a document to the index
+
+    fromMatrix( vocabList, matrix )
+        Static method that builds an index from a frequency matrix
+
+    postings( word )
+        Returns the documents a word appears in, and how often
+
+    queryAnd( words )
+        Returns the documents all of the words appear in
+
+    queryOr( words )
+        Returns the documents any of the words appear in
+
+    topDocuments( words, k )
+        Returns the k documents the words appear in most often
+
+    merge( other )
+        Merges two indices into a single index
+
+    save( filename )
+        Saves the index to the local directory
+
+    load( filename )
+        Static method that loads a saved index from the local
+        directory
+    """
+
+    def __init__( self, vocabList=None ):
+
+        self.vocabList = None
+        self.docNumber = 0
+
+        self._pending = []
+        self._offsets = None
+        self._deltas = None
+        self._tfs = None
+        self._vidx = None
+
+        if vocabList is not None:
+
+            self.setVocabulary( vocabList )
+
+    def setVocabulary( self, vocabList ):
+        """Sets the vocabulary of an empty index.
+
+        Parameters
+        ----------
+        vocabList : lst
+            A list of words with no repetitions
+
+        Raises
+        ------
+        ValueError
+            If documents have already been added to the index
+        """
+
+        if self.docNumber:
+
+            raise ValueError( 'The vocabulary of a non empty index cannot be changed' )
+
+        self.vocabList = list( vocabList )
+        self._vidx = { w:idx for idx, w in enumerate( self.vocabList ) }
+        self._offsets = np.zeros( len( self.vocabList ) + 1, dtype=np.int64 )
+        self._deltas = np.zeros( 0, dtype=np.uint32 )
+        self._tfs = np.zeros( 0, dtype=np.uint32 )
+
+    def addDocument( self, docId, indices, counts ):
+        """Adds the words of a document to the index.  Documents must be
+        added in increasing docId order.
+
+        Parameters
+        ----------
+        docId : int
+            The index of the document
+        indices : numpy.ndarray
+            The vocabulary indices of the words in the document, with no
+            repetitions
+        counts : numpy.ndarray
+            The number of times each of those words appears in the
+            document
+        """
+
+        if len( indices ):
+
+            self._pending.append( ( np.full( len( indices ), docId, dtype=np.int64 ), np.asarray( indices, dtype=np.int64 ), np.asarray( counts, dtype=np.uint32 ) ) )
+
+        self.docNumber = max( self.docNumber, docId + 1 )
+
+    @staticmethod
+    def fromMatrix( vocabList, matrix ):
+        """Builds an index from a frequency matrix.
+
+        Parameters
+        ----------
+        vocabList : lst
+            A list of words with no repetitions
+        matrix : numpy.ndarray or scipy.sparse matrix
+            A V x D frequency matrix whose rows are indexed by vocabList
+
+        Returns
+        -------
+        InvertedIndex
+            the index of the matrix
+        """
+
+        index = InvertedIndex( vocabList )
+
+        # a copy, so explicit zeros can be dropped without touching matrix
+        rows = sp.csr_matrix( matrix, copy=True )
+        rows.eliminate_zeros()
+        rows.sort_indices()
+
+        docIds = rows.indices.astype( np.int64 )
+
+        index._setPostings( rows.indptr.astype( np.int64 ), docIds, rows.data.astype( np.uint32 ) )
+        index.docNumber = matrix.shape[ 1 ]
+
+        return index
+
+    def _setPostings( self, offsets, docIds, tfs ):
+
+        deltas = docIds.copy()
+
+        # every postings list starts with an absolute document index
+        if len( deltas ) > 1:
+
+            deltas[ 1: ] -= docIds[ :-1 ]
+
+        starts = offsets[ :-1 ][ offsets[ :-1 ] < offsets[ 1: ] ]
+        deltas[ starts ] = docIds[ starts ]
+
+        self._offsets = offsets
+        self._deltas = deltas.astype( np.uint32 )
+        self._tfs = tfs
+
+    def _finalise( self ):
+
+        if not self._pending:
+
+            return
+
+        docIds, terms, tfs = ( np.concatenate( arrays ) for arrays in zip( *self._pending ) )
+        self._pending = []
+
+        # merge the pending postings with the existing ones
+        oldDocIds = self._docIds()
+        oldTerms = np.repeat( np.arange( len( self.vocabList ), dtype=np.int64 ), np.diff( self._offsets ) )
+
+        docIds = np.concatenate( [ oldDocIds, docIds ] )
+        terms = np.concatenate( [ oldTerms, terms ] )
+        tfs = np.concatenate( [ self._tfs, tfs ] )
+
+        order = np.lexsort( ( docIds, terms ) )
+
+        offsets = np.zeros( len( self.vocabList ) + 1, dtype=np.int64 )
+        np.cumsum( np.bincount( terms, minlength=len( self.vocabList ) ), out=offsets[ 1: ] )
+
+        self._setPostings( offsets, docIds[ order ], tfs[ order ] )
+
+    def _docIds( self ):
+
+        # a running sum over all lists, minus the sum reached before
+        # each list starts, undoes the delta encoding of every list
+        total = np.cumsum( self._deltas, dtype=np.int64 )
+        before = np.concatenate( [ [ 0 ], total ] )[ self._offsets[ :-1 ] ]
+
+        return total - np.repeat( before, np.diff( self._offsets ) )
+
+    def postings( self, word ):
+        """Returns the documents a word appears in, and how often.
+
+        Parameters
+        ----------
+        word : str
+            The word to look up
+
+        Returns
+        -------
+        numpy.ndarray
+            the sorted indices of the documents the word appears in.
+            Empty if the word isn't in the vocabulary
+        numpy.ndarray
+            the number of times the word appears in each of them
+        """
+
+        self._finalise()
+
+        idx = self._vidx.get( word ) if self._vidx is not None else None
+
+        if idx is None:
+
+            return np.zeros( 0, dtype=np.int64 ), np.zeros( 0, dtype=np.uint32 )
+
+        start, stop = self._offsets[ idx ], self._offsets[ idx + 1 ]
+
+        return np.cumsum( self._deltas[ start:stop ], dtype=np.int64 ), self._tfs[ start:stop ]
+
+    def queryAnd( self, words ):
+        """Returns the documents all of the words appear in.
+
+        Parameters
+        ----------
+        words : lst
+            The words to look up
+
+        Returns
+        -------
+        numpy.ndarray
+            the sorted indices of the documents
+        """
+
+        docLists = sorted( ( self.postings( word )[ 0 ] for word in words ), key=len )
+
+        if not docLists:
+
+            return np.zeros( 0, dtype=np.int64 )
+
+        # intersect the shortest lists first
+        result = docLists[ 0 ]
+
+        for docs in docLists[ 1: ]:
+
+            if not len( result ):
+                break
+
+            result = np.intersect1d( result, docs, assume_unique=True )
+
+        return result
+
+    def queryOr( self, words ):
+        """Returns the documents any of the words appear in.
+
+        Parameters
+        ----------
+        words : lst
+            The words to look up
+
+        Returns
+        -------
+        numpy.ndarray
+            the sorted indices of the documents
+        """
+
+        docLists = [ self.postings( word )[ 0 ] for word in words ]
+
+        if not docLists:
+
+            return np.zeros( 0, dtype=np.int64 )
+
+        return np.unique( np.concatenate( docLists ) )
+
+    def topDocuments( self, words, k ):
+        """Returns the k documents the words appear in most often,
+        scoring each document by the sum of the term frequencies of the
+        words in it.
+
+        Parameters
+        ----------
+        words : lst
+            The words to look up
+        k : int
+            The maximum number of documents returned
+
+        Returns
+        -------
+        numpy.ndarray
+            the indices of the documents, best first
+        numpy.ndarray
+            the score of each of them
+        """
+
+        postings = [ self.postings( word ) for word in words ]
+
+        if not postings:
+
+            return np.zeros( 0, dtype=np.int64 ), np.zeros( 0, dtype=np.int64 )
+
+        docs = np.concatenate( [ docIds for docIds, _ in postings ] )
+        tfs = np.concatenate( [ tfs for _, tfs in postings ] ).astype( np.int64 )
+
+        docs, inverse = np.unique( docs, return_inverse=True )
+        scores = np.bincount( inverse, weights=tfs, minlength=len( docs ) ).astype( np.int64 )
+
+        if k < len( docs ):
+
+            best = np.argpartition( -scores, k - 1 )[ :k ] if k > 0 else np.zeros( 0, dtype=np.int64 )
+            docs, scores = docs[ best ], scores[ best ]
+
+        order = np.lexsort( ( docs, -scores ) )
+
+        return docs[ order ], scores[ order ]
+
+    def merge( self, other ):
+        """Merges two indices into a single index, the way
+        Frequentise.merge merges frequency matrices: the vocabulary is
+        the union of both vocabularies, and the documents of other are
+        numbered after the documents of this index.
+
+        Parameters
+        ----------
+        other : InvertedIndex
+            The index to merge with this one
+
+        Returns
+        -------
+        InvertedIndex
+            the merged index
+        """
+
+        self._finalise()
+        other._finalise()
+
+        combinedV = list( set( self.vocabList + other.vocabList ) )
+        merged = InvertedIndex( combinedV )
+
+        for index, docOffset in ( ( self, 0 ), ( other, self.docNumber ) ):
+
+            terms = np.repeat( np.array( [ merged._vidx[ w ] for w in index.vocabList ], dtype=np.int64 ), np.diff( index._offsets ) )
+
+            merged._pending.append( ( index._docIds() + docOffset, terms, index._tfs ) )
+
+        merged.docNumber = self.docNumber + other.docNumber
+        merged._finalise()
+
+        return merged
+
+    def save( self, filename ):
+        """Saves the index to the local directory, as a compressed
+        numpy .npz file.
+
+        Parameters
+        ----------
+        filename : str
+            The name and location of where to save the file
+        """
+
+        self._finalise()
+
+        with open( filename, 'wb' ) as outfile:
+            np.savez_compressed( outfile, vocabList=np.array( self.vocabList, dtype=str ), docNumber=self.docNumber, offsets=self._offsets, deltas=self._deltas, tfs=self._tfs )
+
+    @staticmethod
+    def load( filename ):
+        """Loads a saved index from the passed local directory location.
+
+        Parameters
+        ----------
+        filename : str
+            The location of the file to be loaded
+
+        Returns
+        -------
+        InvertedIndex
+            the loaded index
+        """
+
+        with np.load( filename ) as infile:
+
+            index = InvertedIndex( infile[ 'vocabList' ].tolist() )
+            index.docNumber = int( infile[ 'docNumber' ] )
+            index._offsets = infile[ 'offsets' ]
+            index._deltas = infile[ 'deltas' ]
+            index._tfs = infile[ 'tfs' ]
+
+        return index
@@ -0,0 +1,355 @@
+import os
+import json
+import argparse
+from multiprocessing import Pool
+
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.vocabularise import Vocabularise
+from nlp.frequentise import Frequentise
+from nlp.planner import OutputPlanner
+from nlp.matrixstore import MatrixStore
+
+class MapReduce( object ):
+    """
+    A class used to vocabularise and frequentise a corpus too large for
+    one machine, as independent jobs that only share files.
+
+    The corpus is a list of utf-8 text files holding one document per
+    line.  writeManifests splits it into shards of consecutive documents
+    and writes a JSON manifest per shard, holding the line ranges of the
+    shard, the byte offsets they start at, and the pipeline
+    configuration.  mapShard runs on any node that can read the manifest
+    and its input files, seeks straight to its documents, and writes the
+    partial vocabulary and sparse counts of its shard next to the
+    manifest.  reduce merges the partials into a global vocabulary, with
+    the same IDs whatever order the shards finished in, and a global
+    frequency matrix whose columns follow the order of the corpus.
+
+    Jobs can be run from the command line:
+
+        python -m nlp.mapreduce map shard-00000.json
+        python -m nlp.mapreduce reduce output/ shard-*.json
+
+    or locally, with processes standing in for nodes, with runLocal.
+
+    Attributes
+    ----------
+    tokeniser : str
+        The regular expression to tokenise with
+    cleanup : str
+        The regular expression to cleanup with
+    stem : bool
+        Whether tokens are stemmed
+
+    Methods
+    -------
+    writeManifests( inputs, shardNumber, directory )
+        Splits a corpus into shards and writes their manifests
+
+    mapShard( manifest )
+        Static method that vocabularises and frequentises one shard
+        and writes its partial vocabulary and counts
+
+    reduce( manifests, directory=None )
+        Static method that merges the partials of all shards into a
+        global vocabulary and frequency matrix
+
+    runLocal( manifests, processes=None, directory=None )
+        Static method that maps all shards in a local process pool,
+        then reduces them
+    """
+
+    VOCABULARY = 'vocabulary.PKL'
+    COUNTS = 'counts.npz'
+
+    # the byte offset of every CHECKPOINT'th line is kept while counting
+    # lines, so a shard's start is found without re-reading the file
+    CHECKPOINT = 4096
+
+    def __init__( self, tokeniser=None, cleanup=None, stem=False ):
+
+        self.tokeniser = tokeniser
+        self.cleanup = cleanup
+        self.stem = stem
+
+    def writeManifests( self, inputs, shardNumber, directory ):
+        """Splits a corpus into shards of consecutive documents of
+        roughly equal size, and writes a manifest per shard.
+
+        Parameters
+        ----------
+        inputs : lst
+            The paths of the utf-8 text files holding the corpus, one
+            document per line
+        shardNumber : int
+            The number of shards
+        directory : str
+            The directory the manifests are written to.  Each shard
+            writes its partials to a sub-directory of it
+
+        Raises
+        ------
+        ValueError
+            If shardNumber isn't positive
+
+        Returns
+        -------
+        lst
+            the paths of the manifests, in corpus order
+        """
+
+        if shardNumber < 1:
+
+            raise ValueError( 'The number of shards must be positive' )
+
+        os.makedirs( directory, exist_ok=True )
+
+        lineNumbers = []
+        checkpoints = []
+
+        for path in inputs:
+
+            lineNumber = 0
+            position = 0
+            offsets = []
+
+            with open( path, 'rb' ) as infile:
+
+                for line in infile:
+
+                    if lineNumber % MapReduce.CHECKPOINT == 0:
+                        offsets.append( position )
+
+                    lineNumber += 1
+                    position += len( line )
+
+            lineNumbers.append( lineNumber )
+            checkpoints.append( offsets )
+
+        docNumber = sum( lineNumbers )
+        bounds = [ ( docNumber * shard ) // shardNumber for shard in range( shardNumber + 1 ) ]
+
+        ranges = [ [] for _ in range( shardNumber ) ]
+        fileStart = 0
+
+        for path, lineNumber, offsets in zip( inputs, lineNumbers, checkpoints ):
+
+            fileStop = fileStart + lineNumber
+
+            for shard in range( shardNumber ):
+
+                start = max( bounds[ shard ], fileStart )
+                stop = min( bounds[ shard + 1 ], fileStop )
+
+                if start < stop:
+
+                    offset = MapReduce._lineOffset( path, offsets, start - fileStart )
+
+                    ranges[ shard ].append( { 'path': os.path.abspath( path ), 'start': start - fileStart, 'stop': stop - fileStart, 'offset': offset } )
+
+            fileStart = fileStop
+
+        manifests = []
+
+        for shard in range( shardNumber ):
+
+            manifestPath = os.path.join( directory, 'shard-%05d.json' % shard )
+
+            manifest = {
+                'shard': shard,
+                'tokeniser': self.tokeniser,
+                'cleanup': self.cleanup,
+                'stem': self.stem,
+                'inputs': ranges[ shard ],
+                'output': os.path.abspath( os.path.join( directory, 'shard-%05d' % shard ) ),
+            }
+
+            with open( manifestPath, 'w' ) as outfile:
+                json.dump( manifest, outfile, indent=1 )
+
+            manifests.append( manifestPath )
+
+        return manifests
+
+    @staticmethod
+    def _lineOffset( path, checkpoints, line ):
+
+        # seek to the last checkpoint before the line, and skip the rest
+        with open( path, 'rb' ) as infile:
+
+            infile.seek( checkpoints[ line // MapReduce.CHECKPOINT ] )
+
+            for _ in range( line % MapReduce.CHECKPOINT ):
+                infile.readline()
+
+            return infile.tell()
+
+    @staticmethod
+    def _loadManifest( manifestPath ):
+
+        with open( manifestPath ) as infile:
+            return json.load( infile )
+
+    @staticmethod
+    def mapShard( manifest ):
+        """Vocabularises and frequentises the documents of one shard,
+        and writes its partial vocabulary and sparse counts to the
+        output directory of the manifest.
+
+        Parameters
+        ----------
+        manifest : str
+            The path of the manifest of the shard
+
+        Returns
+        -------
+        str
+            the output directory of the shard
+        """
+
+        manifest = MapReduce._loadManifest( manifest )
+
+        corpus = []
+
+        for entry in manifest[ 'inputs' ]:
+
+            with open( entry[ 'path' ], 'rb' ) as infile:
+
+                infile.seek( entry[ 'offset' ] )
+
+                for _ in range( entry[ 'stop' ] - entry[ 'start' ] ):
+                    corpus.append( infile.readline().rstrip( b'\n' ).rstrip( b'\r' ).decode( 'utf-8' ) )
+
+        tokeniser, cleanup, stem = manifest[ 'tokeniser' ], manifest[ 'cleanup' ], manifest[ 'stem' ]
+
+        output = manifest[ 'output' ]
+        os.makedirs( output, exist_ok=True )
+
+        # a shard too big for memory is counted in a file next to its partials
+        spill = os.path.join( output, 'counts.dat' )
+
+        plan = OutputPlanner( path=spill ).plan( corpus, tokeniser=tokeniser, cleanup=cleanup, stem=stem, seed=manifest[ 'shard' ] )
+
+        vocabList, _, frequencyMatrix = Frequentise().frequentise( corpus, tokeniser=tokeniser, cleanup=cleanup, stem=stem, plan=plan )
+
+        Vocabularise().saveVocabulary( vocabList, os.path.join( output, MapReduce.VOCABULARY ) )
+        sp.save_npz( os.path.join( output, MapReduce.COUNTS ), sp.csc_matrix( frequencyMatrix ) )
+
+        if plan.layout == 'disk':
+
+            del frequencyMatrix
+            os.remove( spill )
+
+        return output
+
+    @staticmethod
+    def reduce( manifests, directory=None ):
+        """Merges the partial vocabularies and counts of all shards into
+        a global vocabulary and frequency matrix.  The global vocabulary
+        is sorted, so word IDs don't depend on the order shards finished
+        in, and the columns of the matrix follow the order of manifests.
+
+        Parameters
+        ----------
+        manifests : lst
+            The paths of the manifests of all shards, in corpus order
+        directory : str, optional
+            If passed, the matrix is appended shard by shard to a
+            MatrixStore in this directory instead of being built in
+            memory, and the vocabulary is saved next to it
+
+        Returns
+        -------
+        lst
+            the global vocabulary
+        scipy.sparse.csc_matrix or MatrixStore
+            the global V x D frequency matrix
+        """
+
+        vize = Vocabularise()
+
+        outputs = [ MapReduce._loadManifest( manifest )[ 'output' ] for manifest in manifests ]
+        vocabs = [ vize.loadVocabulary( os.path.join( output, MapReduce.VOCABULARY ) ) for output in outputs ]
+
+        vocabList = sorted( vize.mergeVocabularies( *vocabs ) )
+        vidx = { w:idx for idx, w in enumerate( vocabList ) }
+
+        store = None
+
+        if directory is not None:
+
+            store = MatrixStore( directory )
+            vize.saveVocabulary( vocabList, os.path.join( directory, MapReduce.VOCABULARY ) )
+
+        parts = []
+
+        for output, vocab in zip( outputs, vocabs ):
+
+            counts = sp.load_npz( os.path.join( output, MapReduce.COUNTS ) ).tocoo()
+            rows = np.array( [ vidx[ w ] for w in vocab ], dtype=np.int64 )
+
+            part = sp.csc_matrix( ( counts.data, ( rows[ counts.row ], counts.col ) ), shape=( len( vocabList ), counts.shape[ 1 ] ) )
+
+            if store is not None:
+                store.append( part )
+            else:
+                parts.append( part )
+
+        if store is not None:
+
+            return vocabList, store
+
+        if not parts:
+
+            return vocabList, sp.csc_matrix( ( len( vocabList ), 0 ), dtype=np.int16 )
+
+        return vocabList, sp.hstack( parts, format='csc' )
+
+    @staticmethod
+    def runLocal( manifests, processes=None, directory=None ):
+        """Maps all shards in a local process pool, each process standing
+        in for a node, then reduces them.
+
+        Parameters
+        ----------
+        manifests : lst
+            The paths of the manifests of all shards, in corpus order
+        processes : int, optional
+            The number of processes.  Defaults to the number of CPUs
+        directory : str, optional
+            Passed on to reduce
+
+        Returns
+        -------
+        lst
+            the global vocabulary
+        scipy.sparse.csc_matrix or MatrixStore
+            the global V x D frequency matrix
+        """
+
+        with Pool( processes ) as pool:
+            pool.map( MapReduce.mapShard, manifests )
+
+        return MapReduce.reduce( manifests, directory )
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser( description='Run a map or reduce job of a sharded frequentise' )
+    subparsers = parser.add_subparsers( dest='job', required=True )
+
+    mapParser = subparsers.add_parser( 'map', help='vocabularise and frequentise one shard' )
+    mapParser.add_argument( 'manifest' )
+
+    reduceParser = subparsers.add_parser( 'reduce', help='merge the partials of all shards into a MatrixStore' )
+    reduceParser.add_argument( 'directory' )
+    reduceParser.add_argument( 'manifests', nargs='+' )
+
+    args = parser.parse_args()
+
+    if args.job == 'map':
+        MapReduce.mapShard( args.manifest )
+    else:
+        MapReduce.reduce( args.manifests, args.directory )
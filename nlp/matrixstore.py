@@ -0,0 +1,263 @@
+import os
+import json
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+class MatrixStore( object ):
+    """
+    A chunked, compressed on-disk store for V x D frequency matrices.
+
+    The documents (columns) of a matrix are split into chunks of
+    consecutive documents.  Every chunk is saved compressed in its own
+    .npz file, either dense or as the data, indices and indptr arrays of
+    a scipy.sparse.csc_matrix, and an index.json file records the range
+    of documents each chunk holds.  Reading a subset of documents only
+    decodes the chunks holding them, in parallel, and new chunks can be
+    appended without rewriting existing ones.
+
+    Chunks may have fewer rows than the store, e.g. when documents are
+    appended with a vocabulary that grew since.  Rows missing from a
+    chunk are read as zeros.
+
+    Attributes
+    ----------
+    directory : str
+        The directory holding the index and chunk files
+    wordNumber : int
+        The number of rows of the stored matrix
+    docNumber : int
+        The number of columns of the stored matrix
+    dtype : numpy.dtype
+        The dtype of the stored matrix, or None if it is empty
+
+    Methods
+    -------
+    append( matrix, chunkSize=1024 )
+        Appends the documents of a matrix to the store, in chunks
+
+    read( docs=None, terms=None, threads=None )
+        Reads a subset of documents and terms of the stored matrix
+    """
+
+    INDEX = 'index.json'
+
+    def __init__( self, directory ):
+
+        self.directory = directory
+
+        os.makedirs( directory, exist_ok=True )
+
+        indexPath = os.path.join( directory, MatrixStore.INDEX )
+
+        if os.path.isfile( indexPath ):
+
+            with open( indexPath ) as infile:
+                self._index = json.load( infile )
+
+        else:
+
+            self._index = { 'wordNumber': 0, 'docNumber': 0, 'dtype': None, 'chunks': [] }
+
+    @property
+    def wordNumber( self ):
+
+        return self._index[ 'wordNumber' ]
+
+    @property
+    def docNumber( self ):
+
+        return self._index[ 'docNumber' ]
+
+    @property
+    def shape( self ):
+
+        return ( self.wordNumber, self.docNumber )
+
+    @property
+    def dtype( self ):
+
+        dtype = self._index[ 'dtype' ]
+
+        return None if dtype is None else np.dtype( dtype )
+
+    def append( self, matrix, chunkSize=1024 ):
+        """Appends the documents of a matrix to the store, in chunks of
+        at most chunkSize documents.  Sparse matrices are stored sparse,
+        and dense ones dense.
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray or scipy.sparse matrix
+            A V x D frequency matrix.  Its rows must be indexed by the
+            same vocabulary as the stored matrix, possibly extended with
+            new words at the end
+        chunkSize : int
+            The maximum number of documents per chunk
+
+        Raises
+        ------
+        ValueError
+            If matrix has fewer rows than the stored matrix, or a
+            different dtype
+        """
+
+        wordNumber, docNumber = matrix.shape
+        dtype = np.dtype( matrix.dtype )
+
+        if wordNumber < self.wordNumber:
+
+            raise ValueError( 'The matrix must have at least as many rows as the stored matrix' )
+
+        if self.dtype is not None and dtype != self.dtype:
+
+            raise ValueError( 'The matrix must have the same dtype as the stored matrix' )
+
+        sparse = sp.issparse( matrix )
+
+        if sparse:
+
+            matrix = sp.csc_matrix( matrix )
+
+        for start in range( 0, docNumber, chunkSize ):
+
+            stop = min( start + chunkSize, docNumber )
+            chunk = matrix[ :, start:stop ]
+
+            filename = 'chunk-%06d.npz' % len( self._index[ 'chunks' ] )
+            path = os.path.join( self.directory, filename )
+
+            if sparse:
+                np.savez_compressed( path, data=chunk.data, indices=chunk.indices, indptr=chunk.indptr, shape=np.array( chunk.shape ) )
+            else:
+                np.savez_compressed( path, dense=np.ascontiguousarray( chunk ) )
+
+            self._index[ 'chunks' ].append( {
+                'file': filename,
+                'start': self.docNumber + start,
+                'stop': self.docNumber + stop,
+                'wordNumber': wordNumber,
+                'format': 'sparse' if sparse else 'dense',
+            } )
+
+        self._index[ 'wordNumber' ] = wordNumber
+        self._index[ 'docNumber' ] += docNumber
+        self._index[ 'dtype' ] = dtype.str
+
+        self._saveIndex()
+
+    def read( self, docs=None, terms=None, threads=None ):
+        """Reads a subset of documents and terms of the stored matrix.
+        Only the chunks holding the passed documents are decoded, in
+        parallel.
+
+        Parameters
+        ----------
+        docs : lst, optional
+            The indices of the documents (columns) to read, in the order
+            they should be returned.  If not passed, all documents are
+            read
+        terms : lst, optional
+            The indices of the terms (rows) to read, in the order they
+            should be returned.  If not passed, all terms are read
+        threads : int, optional
+            The number of threads decoding chunks.  Defaults to the
+            ThreadPoolExecutor default
+
+        Raises
+        ------
+        IndexError
+            If a document index is out of range
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csc_matrix
+            the len( terms ) x len( docs ) matrix, sparse if any of the
+            chunks read is sparse
+        """
+
+        docs = np.arange( self.docNumber ) if docs is None else np.asarray( docs, dtype=np.int64 ).reshape( -1 )
+
+        if len( docs ) and ( docs.min() < 0 or docs.max() >= self.docNumber ):
+
+            raise IndexError( 'Document index out of range' )
+
+        chunks = self._index[ 'chunks' ]
+        starts = np.array( [ chunk[ 'start' ] for chunk in chunks ], dtype=np.int64 )
+        chunkOf = np.searchsorted( starts, docs, side='right' ) - 1
+        needed = np.unique( chunkOf )
+
+        with ThreadPoolExecutor( threads ) as pool:
+            decoded = list( pool.map( self._readChunk, needed ) )
+
+        sparse = any( chunks[ c ][ 'format' ] == 'sparse' for c in needed )
+        parts = []
+        positions = []
+
+        for c, matrix in zip( needed, decoded ):
+
+            position = np.flatnonzero( chunkOf == c )
+            part = matrix[ :, docs[ position ] - chunks[ c ][ 'start' ] ]
+
+            if part.shape[ 0 ] < self.wordNumber:
+
+                part = self._pad( part )
+
+            if terms is not None:
+
+                part = part[ terms ]
+
+            parts.append( sp.csc_matrix( part ) if sparse else part )
+            positions.append( position )
+
+        rowNumber = self.wordNumber if terms is None else len( terms )
+
+        if not parts:
+
+            dtype = self.dtype or np.int16
+
+            return sp.csc_matrix( ( rowNumber, 0 ), dtype=dtype ) if sparse else np.zeros( ( rowNumber, 0 ), dtype=dtype )
+
+        order = np.argsort( np.concatenate( positions ), kind='stable' )
+
+        if sparse:
+
+            return sp.hstack( parts, format='csc' )[ :, order ]
+
+        return np.hstack( parts )[ :, order ]
+
+    def _readChunk( self, c ):
+
+        chunk = self._index[ 'chunks' ][ c ]
+
+        with np.load( os.path.join( self.directory, chunk[ 'file' ] ) ) as infile:
+
+            if chunk[ 'format' ] == 'dense':
+
+                return infile[ 'dense' ]
+
+            return sp.csc_matrix( ( infile[ 'data' ], infile[ 'indices' ], infile[ 'indptr' ] ), shape=tuple( infile[ 'shape' ] ) )
+
+    def _pad( self, part ):
+
+        if sp.issparse( part ):
+
+            part = sp.csc_matrix( part )
+            part.resize( ( self.wordNumber, part.shape[ 1 ] ) )
+
+            return part
+
+        padded = np.zeros( ( self.wordNumber, part.shape[ 1 ] ), dtype=part.dtype )
+        padded[ :part.shape[ 0 ] ] = part
+
+        return padded
+
+    def _saveIndex( self ):
+
+        indexPath = os.path.join( self.directory, MatrixStore.INDEX )
+
+        with open( indexPath + '.tmp', 'w' ) as outfile:
+            json.dump( self._index, outfile )
+
+        os.replace( indexPath + '.tmp', indexPath )
@@ -0,0 +1,360 @@
+import os
+import math
+import random
+import tempfile
+
+import numpy as np
+
+from nlp.vocabularise import Vocabularise
+
+class OutputPlan( object ):
+    """
+    The estimated size of a frequency matrix, and the layout chosen
+    for it against a memory budget.  A plan is returned by
+    OutputPlanner.plan for inspection, and can be passed to
+    Frequentise.frequentise and Frequentise.merge, which enforce it
+    before allocating their output.
+
+    Attributes
+    ----------
+    wordNumber : int
+        The estimated number of words in the vocabulary
+    docNumber : int
+        The number of documents in the corpus
+    nonZeros : int
+        The estimated number of non zero entries in the matrix
+    dtype : numpy.dtype
+        The dtype of the matrix entries
+    denseBytes : int
+        The estimated size of the matrix as a dense numpy.ndarray
+    sparseBytes : int
+        The estimated size of the matrix as a scipy.sparse.csc_matrix
+    memoryBudget : int
+        The number of bytes the matrix may take up in memory
+    layout : str
+        'dense', 'sparse' or 'disk'.  'disk' is a dense numpy.memmap
+        backed by the file at path
+    path : str
+        The file backing a 'disk' layout, or None to use an anonymous
+        temporary file, removed when the matrix is freed
+
+    Methods
+    -------
+    check( wordNumber, docNumber, nonZeros=None, dtype=None )
+        Checks the actual size of a matrix against the budget and
+        returns the layout to build it with
+
+    allocate( shape, dtype=None )
+        Allocates a zeroed dense matrix, in memory or on disk
+        depending on the layout
+    """
+
+    LAYOUTS = ( 'dense', 'sparse', 'disk' )
+
+    def __init__( self, wordNumber, docNumber, nonZeros, dtype, memoryBudget, layout=None, path=None ):
+
+        self.wordNumber = int( wordNumber )
+        self.docNumber = int( docNumber )
+        self.nonZeros = int( nonZeros )
+        self.dtype = np.dtype( dtype )
+        self.memoryBudget = int( memoryBudget )
+        self.path = path
+
+        self.denseBytes = OutputPlan.denseSize( self.wordNumber, self.docNumber, self.dtype )
+        self.sparseBytes = OutputPlan.sparseSize( self.docNumber, self.nonZeros, self.dtype )
+
+        if layout is None:
+
+            if min( self.denseBytes, self.sparseBytes ) > self.memoryBudget:
+                layout = 'disk'
+            elif self.denseBytes <= self.sparseBytes:
+                layout = 'dense'
+            else:
+                layout = 'sparse'
+
+        if layout not in OutputPlan.LAYOUTS:
+
+            raise ValueError( 'The layout must be one of %s' % ', '.join( OutputPlan.LAYOUTS ) )
+
+        self.layout = layout
+
+    @staticmethod
+    def denseSize( wordNumber, docNumber, dtype ):
+        """Returns the size in bytes of a dense wordNumber x docNumber
+        matrix of the passed dtype
+        """
+
+        return wordNumber * docNumber * np.dtype( dtype ).itemsize
+
+    @staticmethod
+    def sparseSize( docNumber, nonZeros, dtype ):
+        """Returns the size in bytes of a scipy.sparse.csc_matrix with
+        docNumber columns and nonZeros entries of the passed dtype
+        """
+
+        indexSize = 4 if nonZeros < 2 ** 31 else 8
+
+        return nonZeros * ( np.dtype( dtype ).itemsize + indexSize ) + ( docNumber + 1 ) * indexSize
+
+    def check( self, wordNumber, docNumber, nonZeros=None, dtype=None ):
+        """Checks the actual size of a matrix against the memory budget,
+        and returns the layout it should be built with.
+
+        If nonZeros isn't passed, it is extrapolated from the plan's
+        estimated number of non zero entries per document.
+
+        Parameters
+        ----------
+        wordNumber : int
+            The number of rows of the matrix
+        docNumber : int
+            The number of columns of the matrix
+        nonZeros : int, optional
+            The number of non zero entries of the matrix
+        dtype : numpy.dtype, optional
+            The dtype of the matrix.  Defaults to the plan's dtype
+
+        Raises
+        ------
+        MemoryError
+            If the matrix doesn't fit in the memory budget with the
+            planned layout
+
+        Returns
+        -------
+        str
+            the planned layout
+        """
+
+        if self.layout == 'disk':
+
+            return self.layout
+
+        dtype = self.dtype if dtype is None else dtype
+
+        if self.layout == 'dense':
+
+            size = OutputPlan.denseSize( wordNumber, docNumber, dtype )
+
+        else:
+
+            if nonZeros is None:
+
+                nonZeros = math.ceil( self.nonZeros * docNumber / max( self.docNumber, 1 ) )
+
+            size = OutputPlan.sparseSize( docNumber, nonZeros, dtype )
+
+        if size > self.memoryBudget:
+
+            raise MemoryError( 'A %s %d x %d matrix takes %d bytes, over the memory budget of %d bytes' % ( self.layout, wordNumber, docNumber, size, self.memoryBudget ) )
+
+        return self.layout
+
+    def allocate( self, shape, dtype=None ):
+        """Allocates a zeroed dense matrix, in memory for a 'dense'
+        layout or as a numpy.memmap for a 'disk' layout.  The memmap
+        is backed by the plan's path or, without one, by an anonymous
+        temporary file that leaves nothing behind once it is freed.
+
+        Parameters
+        ----------
+        shape : tuple
+            The shape of the matrix
+        dtype : numpy.dtype, optional
+            The dtype of the matrix.  Defaults to the plan's dtype
+
+        Returns
+        -------
+        numpy.ndarray
+            the zeroed matrix
+        """
+
+        dtype = self.dtype if dtype is None else dtype
+
+        if self.layout != 'disk':
+
+            return np.zeros( shape, dtype=dtype )
+
+        if self.path:
+
+            return np.memmap( self.path, dtype=dtype, mode='w+', shape=tuple( shape ) )
+
+        # an anonymous temporary file has no name left on disk, and is
+        # freed as soon as the memmap is
+        with tempfile.TemporaryFile( suffix='.dat' ) as handle:
+            return np.memmap( handle, dtype=dtype, mode='w+', shape=tuple( shape ) )
+
+    def __repr__( self ):
+
+        return 'OutputPlan(layout=%r, wordNumber=%d, docNumber=%d, nonZeros=%d, denseBytes=%d, sparseBytes=%d, memoryBudget=%d)' % (
+            self.layout, self.wordNumber, self.docNumber, self.nonZeros, self.denseBytes, self.sparseBytes, self.memoryBudget )
+
+
+class OutputPlanner( object ):
+    """
+    A class used to estimate, from a sample of a corpus, how big the
+    frequency matrix of the corpus will be, and to choose a dense,
+    sparse or on-disk layout for it that fits a memory budget.
+
+    The vocabulary size is extrapolated from the sample with Heaps'
+    law, V = K * N ** beta, fitted on the vocabulary growth over the
+    sample.  The number of non zero entries is extrapolated from the
+    mean number of distinct words per sampled document.
+
+    Attributes
+    ----------
+    memoryBudget : int
+        The number of bytes the output may take up in memory
+    margin : float
+        The factor estimates are inflated by before being checked
+        against the budget
+    path : str
+        The file backing an on-disk output, or None to use a
+        temporary file
+
+    Methods
+    -------
+    availableMemory()
+        Static method that returns the number of bytes of physical
+        memory currently available
+
+    plan( corpus, V=None, tokeniser=None, cleanup=None, stem=False, sampleSize=1000, dtype=numpy.int16, seed=None )
+        Estimates the size of the frequency matrix of corpus and
+        chooses its layout
+    """
+
+    def __init__( self, memoryBudget=None, margin=1.2, path=None ):
+
+        if memoryBudget is None:
+
+            memoryBudget = OutputPlanner.availableMemory() // 2
+
+        self.memoryBudget = memoryBudget
+        self.margin = margin
+        self.path = path
+
+    @staticmethod
+    def availableMemory():
+        """Returns the number of bytes of physical memory currently
+        available, or 1 GiB if the platform doesn't report it.
+
+        Returns
+        -------
+        int
+            the number of available bytes
+        """
+
+        try:
+            return os.sysconf( 'SC_AVPHYS_PAGES' ) * os.sysconf( 'SC_PAGE_SIZE' )
+        except ( AttributeError, ValueError, OSError ):
+            return 2 ** 30
+
+    def plan( self, corpus, V=None, tokeniser=None, cleanup=None, stem=False, sampleSize=1000, dtype=np.int16, seed=None ):
+        """Estimates the vocabulary size, the number of non zero entries
+        and the size of the frequency matrix Frequentise.frequentise
+        would build from corpus, and chooses the layout to build it
+        with.
+
+        Parameters
+        ----------
+        corpus : lst
+            A list of documents, each of which is a string.
+        V : lst, optional
+            A pre-specified vocabulary.  If passed, the vocabulary size
+            is known and only the number of non zero entries is estimated
+        tokeniser : str
+            The regular expression to tokenise with
+        cleanup : str
+            The regular expression to cleanup with
+        stem : bool
+            Stemming is performed if and only if this boolean
+            is True
+        sampleSize : int
+            The number of documents to sample
+        dtype : numpy.dtype
+            The dtype of the matrix entries
+        seed : int, optional
+            The seed of the document sample
+
+        Returns
+        -------
+        OutputPlan
+            the estimates and the chosen layout
+        """
+
+        vize = Vocabularise()
+        docNumber = len( corpus )
+        sampleSize = min( sampleSize, docNumber )
+
+        sample = sorted( random.Random( seed ).sample( range( docNumber ), sampleSize ) )
+
+        vidx = None if V is None else { w:idx for idx, w in enumerate( V ) }
+
+        seen = set()
+        growth = []
+        tokenNumber = 0
+        distinctNumber = 0
+
+        for j in sample:
+
+            tokens = vize.preprocess( corpus[ j ], tokeniser, cleanup, stem )
+
+            if vidx is not None:
+
+                tokens = [ token for token in tokens if token in vidx ]
+
+            tokenNumber += len( tokens )
+            distinctNumber += len( set( tokens ) )
+
+            seen.update( tokens )
+            growth.append( ( tokenNumber, len( seen ) ) )
+
+        if V is not None:
+
+            wordNumber = len( V )
+
+        elif sampleSize == docNumber or tokenNumber == 0:
+
+            wordNumber = len( seen )
+
+        else:
+
+            wordNumber = OutputPlanner._heaps( growth, tokenNumber * docNumber / sampleSize )
+
+        nonZeros = distinctNumber * docNumber / sampleSize if sampleSize else 0
+
+        # the margin only covers estimates; a passed V is exact
+        if sampleSize < docNumber:
+
+            if V is None:
+                wordNumber = math.ceil( wordNumber * self.margin )
+
+            nonZeros = math.ceil( nonZeros * self.margin )
+
+        return OutputPlan( wordNumber, docNumber, nonZeros, dtype, self.memoryBudget, path=self.path )
+
+    @staticmethod
+    def _heaps( growth, totalTokens ):
+
+        tokens, words = growth[ -1 ]
+
+        # fit the growth between the middle and the end of the sample
+        middle = next( ( point for point in growth if point[ 0 ] >= tokens / 2 ), growth[ -1 ] )
+
+        if middle[ 0 ] < tokens and 0 < middle[ 1 ] < words:
+
+            beta = math.log( words / middle[ 1 ] ) / math.log( tokens / middle[ 0 ] )
+
+        elif middle[ 1 ] == words and middle[ 0 ] < tokens:
+
+            # the vocabulary stopped growing over the second half
+            beta = 0.0
+
+        else:
+
+            # too little growth to fit; fall back to a typical exponent
+            beta = 0.5
+
+        beta = min( max( beta, 0.0 ), 1.0 )
+
+        return math.ceil( words * ( totalTokens / tokens ) ** beta )
@@ -0,0 +1,639 @@
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import struct
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from nlp.transformer import FrequencyTransformer
+
+# Every frame, in both directions, is a header followed by length bytes
+# of payload.  Requests carry an operation, responses a status.
+_HEADER = struct.Struct( '<BI' )
+
+TRANSFORM = 0
+STATS = 1
+
+OK = 0
+ERROR = 1
+
+def _receive( sock, size ):
+
+    buffer = bytearray( size )
+    view = memoryview( buffer )
+    received = 0
+
+    while received < size:
+
+        n = sock.recv_into( view[ received: ] )
+
+        if not n:
+
+            if received:
+                raise ConnectionError( 'The connection was closed in the middle of a frame' )
+
+            return None
+
+        received += n
+
+    return bytes( buffer )
+
+class _FrameTooLarge( ValueError ):
+
+    def __init__( self, length, maxFrame ):
+
+        super().__init__( 'A frame of %d bytes exceeds the limit of %d bytes' % ( length, maxFrame ) )
+
+def _receiveFrame( sock, maxFrame=None ):
+
+    header = _receive( sock, _HEADER.size )
+
+    if header is None:
+
+        return None, None
+
+    code, length = _HEADER.unpack( header )
+
+    # checked before the payload buffer is allocated
+    if maxFrame is not None and length > maxFrame:
+
+        raise _FrameTooLarge( length, maxFrame )
+
+    payload = _receive( sock, length ) if length else b''
+
+    if payload is None:
+
+        raise ConnectionError( 'The connection was closed in the middle of a frame' )
+
+    return code, payload
+
+def _sendFrame( sock, code, payload ):
+
+    sock.sendall( _HEADER.pack( code, len( payload ) ) + payload )
+
+def encodeVector( indices, counts ):
+    """Encodes a sparse frequency vector as the little endian int32
+    indices followed by the little endian int32 counts.
+
+    Parameters
+    ----------
+    indices : numpy.ndarray
+        The vocabulary indices of the words in a document
+    counts : numpy.ndarray
+        The number of times each of those words appears
+
+    Returns
+    -------
+    bytes
+        the encoded vector, 8 bytes per word
+    """
+
+    return np.asarray( indices, dtype='<i4' ).tobytes() + np.asarray( counts, dtype='<i4' ).tobytes()
+
+def decodeVector( payload ):
+    """Decodes a sparse frequency vector encoded with encodeVector.
+
+    Parameters
+    ----------
+    payload : bytes
+        The encoded vector
+
+    Returns
+    -------
+    numpy.ndarray
+        the int32 vocabulary indices of the words in the document
+    numpy.ndarray
+        the int32 number of times each of those words appears
+    """
+
+    values = np.frombuffer( payload, dtype='<i4' ).astype( np.int32 )
+    wordNumber = len( values ) // 2
+
+    return values[ :wordNumber ], values[ wordNumber: ]
+
+class _Request( object ):
+
+    __slots__ = ( 'doc', 'received', 'status', 'payload', 'done' )
+
+    def __init__( self, doc ):
+
+        self.doc = doc
+        self.received = time.perf_counter()
+        self.status = None
+        self.payload = None
+        self.done = threading.Event()
+
+class _Handler( socketserver.BaseRequestHandler ):
+
+    def handle( self ):
+
+        vectoriser = self.server.vectoriser
+
+        vectoriser._track( self.request )
+
+        try:
+            self._serve( vectoriser )
+        finally:
+            vectoriser._untrack( self.request )
+
+    def _serve( self, vectoriser ):
+
+        while True:
+
+            try:
+                operation, payload = _receiveFrame( self.request, vectoriser.maxFrame )
+            except _FrameTooLarge as error:
+
+                # the rest of the frame is never read, so the connection
+                # can't be resynchronised and is closed after the error
+                try:
+                    _sendFrame( self.request, ERROR, str( error ).encode( 'utf-8' ) )
+                except OSError:
+                    pass
+
+                return
+            except ( ConnectionError, OSError ):
+                return
+
+            if operation is None:
+                return
+
+            if operation == TRANSFORM:
+
+                request = vectoriser._submit( payload.decode( 'utf-8', errors='replace' ) )
+                request.done.wait()
+
+                status, payload = request.status, request.payload
+
+            elif operation == STATS:
+
+                status, payload = OK, json.dumps( vectoriser.stats() ).encode( 'utf-8' )
+
+            else:
+
+                status, payload = ERROR, ( 'Unknown operation %d' % operation ).encode( 'utf-8' )
+
+            try:
+                _sendFrame( self.request, status, payload )
+            except OSError:
+                return
+
+class _UnixServer( socketserver.ThreadingMixIn, socketserver.UnixStreamServer ):
+
+    daemon_threads = True
+
+class _TCPServer( socketserver.ThreadingMixIn, socketserver.TCPServer ):
+
+    daemon_threads = True
+    allow_reuse_address = True
+
+class VectorisationServer( object ):
+    """
+    A long-lived server that keeps a fitted FrequencyTransformer, with
+    its vocabulary index and compiled pipeline, in memory and turns
+    documents sent over a Unix socket or a localhost TCP port into
+    sparse frequency vectors.
+
+    Every connection is served by its own thread, but documents are
+    transformed by a single batching thread: it waits up to batchWindow
+    seconds after the first pending request for more to arrive, then
+    transforms up to maxBatch documents in one go.  The transformer's
+    caches are therefore never shared between threads, and a burst of
+    concurrent requests costs one wake-up instead of one per request.
+
+    Requests and responses are frames of a 5 byte header ( an operation
+    or status byte and a little endian uint32 payload length ) followed
+    by the payload.  A TRANSFORM request carries a utf-8 document, and
+    its response the vector encoded with encodeVector.  A STATS request
+    has no payload, and its response is the JSON of stats().  A request
+    longer than maxFrame bytes gets an ERROR response, and its
+    connection is closed.  Use
+    VectorisationClient to talk to the server.
+
+    Attributes
+    ----------
+    transformer : FrequencyTransformer
+        The fitted transformer
+    address : str or tuple
+        The path of the Unix socket, or the ( host, port ) the server
+        is bound to
+    batchWindow : float
+        The number of seconds a batch waits for more requests
+    maxBatch : int
+        The maximum number of documents per batch
+    maxFrame : int
+        The maximum payload length of a request, in bytes
+
+    Methods
+    -------
+    start()
+        Starts serving in background threads
+
+    serve()
+        Serves in the calling thread until stop() is called
+
+    stop()
+        Stops serving and closes the socket and open connections
+
+    stats()
+        Returns request counts, batch sizes and latency percentiles
+    """
+
+    def __init__( self, transformer, address, batchWindow=0.002, maxBatch=64, statsWindow=10000, maxFrame=64 * 1024 * 1024 ):
+
+        if transformer.vocabList is None:
+
+            raise ValueError( 'The transformer must be fitted before it can be served' )
+
+        if maxBatch < 1:
+
+            raise ValueError( 'A batch must hold at least one request' )
+
+        if maxFrame < 0:
+
+            raise ValueError( 'The frame limit can\'t be negative' )
+
+        self.transformer = transformer
+        self.batchWindow = batchWindow
+        self.maxBatch = maxBatch
+        self.maxFrame = maxFrame
+
+        if isinstance( address, str ):
+            self._server = _UnixServer( address, _Handler )
+        else:
+            self._server = _TCPServer( tuple( address ), _Handler )
+
+        self._server.vectoriser = self
+        self.address = self._server.server_address
+
+        self._queue = queue.Queue()
+        self._batcher = None
+        self._serverThread = None
+        self._serving = False
+        self._stopped = False
+        self._connections = set()
+
+        self._lock = threading.Lock()
+        self._latencies = deque( maxlen=statsWindow )
+        self._requests = 0
+        self._errors = 0
+        self._batches = 0
+        self._started = time.time()
+
+    def _submit( self, doc ):
+
+        request = _Request( doc )
+
+        # checked under the lock, so a request is either queued ahead of
+        # the batcher's stop sentinel or failed here
+        with self._lock:
+
+            if not self._stopped:
+
+                self._queue.put( request )
+
+                return request
+
+        request.status, request.payload = ERROR, b'The server is shutting down'
+        request.done.set()
+
+        return request
+
+    def _track( self, connection ):
+
+        with self._lock:
+
+            self._connections.add( connection )
+            stopped = self._stopped
+
+        if stopped:
+            self._disconnect( connection )
+
+    def _untrack( self, connection ):
+
+        with self._lock:
+            self._connections.discard( connection )
+
+    @staticmethod
+    def _disconnect( connection ):
+
+        # wakes up a handler blocked reading from the connection
+        try:
+            connection.shutdown( socket.SHUT_RDWR )
+        except OSError:
+            pass
+
+    def _startBatcher( self ):
+
+        if self._batcher is None:
+
+            self._batcher = threading.Thread( target=self._batch, daemon=True )
+            self._batcher.start()
+
+    def _batch( self ):
+
+        stopping = False
+
+        while not stopping:
+
+            request = self._queue.get()
+
+            if request is None:
+                break
+
+            batch = [ request ]
+            deadline = time.perf_counter() + self.batchWindow
+
+            while len( batch ) < self.maxBatch:
+
+                timeout = deadline - time.perf_counter()
+
+                try:
+                    request = self._queue.get( timeout=timeout ) if timeout > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+
+                if request is None:
+                    stopping = True
+                    break
+
+                batch.append( request )
+
+            self._process( batch )
+
+        # fail whatever arrived after the server was stopped
+        while True:
+
+            try:
+                request = self._queue.get_nowait()
+            except queue.Empty:
+                break
+
+            if request is not None:
+
+                request.status, request.payload = ERROR, b'The server is shutting down'
+                request.done.set()
+
+    def _process( self, batch ):
+
+        errors = 0
+
+        for request in batch:
+
+            try:
+                request.payload = encodeVector( *self.transformer.transform( request.doc ) )
+                request.status = OK
+            except Exception as e:
+                request.payload = str( e ).encode( 'utf-8' )
+                request.status = ERROR
+                errors += 1
+
+        finished = time.perf_counter()
+
+        with self._lock:
+
+            self._requests += len( batch )
+            self._errors += errors
+            self._batches += 1
+            self._latencies.extend( finished - request.received for request in batch )
+
+        for request in batch:
+            request.done.set()
+
+    def stats( self ):
+        """Returns request counts, batch sizes and latency percentiles.
+        Latencies are measured from the arrival of a request to its
+        response being ready, over the last statsWindow requests.
+
+        Returns
+        -------
+        dict
+            requests, errors, batches, meanBatchSize, uptime ( in
+            seconds ) and latency, a map with the p50, p90, p99 and max
+            latencies in milliseconds
+        """
+
+        with self._lock:
+
+            latencies = np.array( self._latencies, dtype=np.float64 ) * 1000
+            requests, errors, batches = self._requests, self._errors, self._batches
+
+        if len( latencies ):
+            p50, p90, p99 = np.percentile( latencies, [ 50, 90, 99 ] )
+            latency = { 'p50': p50, 'p90': p90, 'p99': p99, 'max': latencies.max() }
+        else:
+            latency = { 'p50': None, 'p90': None, 'p99': None, 'max': None }
+
+        return {
+            'requests': requests,
+            'errors': errors,
+            'batches': batches,
+            'meanBatchSize': requests / batches if batches else 0.0,
+            'uptime': time.time() - self._started,
+            'latency': { key: None if value is None else float( value ) for key, value in latency.items() },
+        }
+
+    def start( self ):
+        """Starts serving in background threads.
+
+        Returns
+        -------
+        VectorisationServer
+            this server
+        """
+
+        self._startBatcher()
+        self._serving = True
+
+        self._serverThread = threading.Thread( target=self._server.serve_forever, daemon=True )
+        self._serverThread.start()
+
+        return self
+
+    def serve( self ):
+        """Serves in the calling thread until stop() is called from
+        another thread.
+        """
+
+        self._startBatcher()
+        self._serving = True
+
+        self._server.serve_forever()
+
+    def stop( self ):
+        """Stops serving, fails the requests still pending and any sent
+        afterwards, and closes the socket and the open connections.
+        """
+
+        with self._lock:
+            self._stopped = True
+
+        if self._serving:
+
+            self._server.shutdown()
+            self._serving = False
+
+        self._server.server_close()
+
+        if self._serverThread is not None:
+
+            self._serverThread.join()
+            self._serverThread = None
+
+        if self._batcher is not None:
+
+            self._queue.put( None )
+            self._batcher.join()
+            self._batcher = None
+
+        with self._lock:
+            connections = list( self._connections )
+
+        for connection in connections:
+            self._disconnect( connection )
+
+        if isinstance( self.address, str ):
+
+            try:
+                os.unlink( self.address )
+            except FileNotFoundError:
+                pass
+
+    def __enter__( self ):
+
+        return self.start()
+
+    def __exit__( self, *exc ):
+
+        self.stop()
+
+
+class VectorisationClient( object ):
+    """
+    A client of a VectorisationServer, holding one connection.  A
+    client sends one request at a time; use one client per thread to
+    send concurrent requests.
+
+    Methods
+    -------
+    transform( doc )
+        Turns a document into a sparse frequency vector on the server
+
+    stats()
+        Returns the statistics of the server
+
+    close()
+        Closes the connection
+    """
+
+    def __init__( self, address, timeout=None ):
+
+        if isinstance( address, str ):
+            self._socket = socket.socket( socket.AF_UNIX, socket.SOCK_STREAM )
+        else:
+            self._socket = socket.socket( socket.AF_INET, socket.SOCK_STREAM )
+            self._socket.setsockopt( socket.IPPROTO_TCP, socket.TCP_NODELAY, 1 )
+
+        self._socket.settimeout( timeout )
+        self._socket.connect( address if isinstance( address, str ) else tuple( address ) )
+
+    def _call( self, operation, payload ):
+
+        _sendFrame( self._socket, operation, payload )
+
+        status, payload = _receiveFrame( self._socket )
+
+        if status is None:
+
+            raise ConnectionError( 'The server closed the connection' )
+
+        if status != OK:
+
+            raise ValueError( payload.decode( 'utf-8' ) )
+
+        return payload
+
+    def transform( self, doc ):
+        """Turns a document into a sparse frequency vector, exactly as
+        FrequencyTransformer.transform does on the server.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be transformed
+
+        Raises
+        ------
+        ValueError
+            If the server failed to transform the document
+
+        Returns
+        -------
+        numpy.ndarray
+            the sorted int32 vocabulary indices of the words in the
+            document
+        numpy.ndarray
+            the int32 number of times each of those words appears in
+            the document
+        """
+
+        return decodeVector( self._call( TRANSFORM, doc.encode( 'utf-8' ) ) )
+
+    def stats( self ):
+        """Returns the statistics of the server
+
+        Returns
+        -------
+        dict
+            the statistics returned by VectorisationServer.stats
+        """
+
+        return json.loads( self._call( STATS, b'' ).decode( 'utf-8' ) )
+
+    def close( self ):
+        """Closes the connection
+        """
+
+        self._socket.close()
+
+    def __enter__( self ):
+
+        return self
+
+    def __exit__( self, *exc ):
+
+        self.close()
+
+
+if __name__ == '__main__':
+
+    parser = argparse.ArgumentParser( description='Serve a fitted FrequencyTransformer over a Unix socket or localhost' )
+    parser.add_argument( 'transformer', help='a transformer saved with FrequencyTransformer.save' )
+    parser.add_argument( '--socket', help='the path of the Unix socket to listen on' )
+    parser.add_argument( '--port', type=int, help='the localhost port to listen on' )
+    parser.add_argument( '--batch-window', type=float, default=2.0, help='milliseconds a batch waits for more requests' )
+    parser.add_argument( '--max-batch', type=int, default=64, help='maximum number of documents per batch' )
+    parser.add_argument( '--max-frame', type=int, default=64 * 1024 * 1024, help='maximum request payload in bytes' )
+
+    args = parser.parse_args()
+
+    if ( args.socket is None ) == ( args.port is None ):
+        parser.error( 'exactly one of --socket and --port must be passed' )
+
+    address = args.socket if args.socket else ( '127.0.0.1', args.port )
+
+    server = VectorisationServer( FrequencyTransformer.load( args.transformer ), address, args.batch_window / 1000, args.max_batch, maxFrame=args.max_frame )
+
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        print( json.dumps( server.stats(), indent=2 ) )
@@ -0,0 +1,334 @@
+import sys
+import zlib
+import struct
+from multiprocessing import resource_tracker, shared_memory
+
+class SharedVocabulary( object ):
+    """
+    A read-only vocabulary index published once into a block of
+    multiprocessing.shared_memory, so that worker processes can map
+    tokens to vocabulary indices without each of them pickling,
+    unpickling and rebuilding a { word: idx } dict.
+
+    The block holds a small header, the byte offset of every word in
+    a utf-8 string blob, an open-addressing hash table (linear probing,
+    load factor at most 0.5) mapping slots to word indices, and the
+    string blob itself.  Workers attach to the block by name and read it
+    in place.
+
+    An instance behaves like a read-only { word: idx } dict, so it can
+    be passed as V to Frequentise.frequentise.  Pickling an instance only
+    pickles the name of the block, so it can be passed to pool workers
+    directly.
+
+    Attributes
+    ----------
+    name : str
+        The name of the shared memory block
+
+    Methods
+    -------
+    publish( vocab, name=None )
+        Class method that publishes a vocabulary list into a new
+        shared memory block and returns the owning instance
+
+    attach( name )
+        Class method that attaches read-only to a block published by
+        another process
+
+    get( word, default=None )
+        Returns the index of word, or default if it isn't in the
+        vocabulary
+
+    word( idx )
+        Returns the word stored at index idx
+
+    close()
+        Detaches from the shared memory block
+
+    unlink()
+        Destroys the shared memory block.  Only the publisher should
+        call this
+    """
+
+    _MAGIC = 0x564f4341424c5231
+    _HEADER = struct.Struct( '<4q' )
+
+    # the names of the blocks published by this process
+    _published = set()
+
+    def __init__( self, shm, owner=False ):
+
+        self._shm = shm
+        self._name = shm.name
+        self._owner = owner
+
+        magic, self._wordNumber, tableSize, blobBytes = SharedVocabulary._HEADER.unpack_from( shm.buf, 0 )
+
+        if magic != SharedVocabulary._MAGIC:
+
+            raise ValueError( 'Shared memory block %s does not hold a vocabulary' % shm.name )
+
+        self._mask = tableSize - 1
+
+        offsetsStart = SharedVocabulary._HEADER.size
+        tableStart = offsetsStart + 8 * ( self._wordNumber + 1 )
+        blobStart = tableStart + 4 * tableSize
+
+        buf = shm.buf
+        self._offsets = buf[ offsetsStart:tableStart ].cast( 'q' )
+        self._table = buf[ tableStart:blobStart ].cast( 'i' )
+        self._blob = buf[ blobStart:blobStart + blobBytes ]
+
+    @classmethod
+    def publish( cls, vocab, name=None ):
+        """Publishes a vocabulary list into a new shared memory block.
+        The index of each word is its position in vocab.
+
+        Parameters
+        ----------
+        vocab : lst
+            A list of words with no repetitions
+        name : str, optional
+            The name of the shared memory block.  If no name is passed,
+            a unique name is generated
+
+        Raises
+        ------
+        ValueError
+            If vocab contains repeated words
+
+        Returns
+        -------
+        SharedVocabulary
+            the instance owning the new block
+        """
+
+        encoded = [ word.encode( 'utf-8' ) for word in vocab ]
+        wordNumber = len( encoded )
+
+        if len( set( encoded ) ) != wordNumber:
+
+            raise ValueError( 'The vocabulary must not contain repeated words' )
+
+        tableSize = 2
+        while tableSize < 2 * wordNumber:
+            tableSize *= 2
+
+        mask = tableSize - 1
+
+        offsetsBytes = 8 * ( wordNumber + 1 )
+        blobBytes = sum( len( key ) for key in encoded )
+        size = SharedVocabulary._HEADER.size + offsetsBytes + 4 * tableSize + blobBytes
+
+        shm = shared_memory.SharedMemory( name=name, create=True, size=size )
+
+        buf = shm.buf
+        SharedVocabulary._HEADER.pack_into( buf, 0, SharedVocabulary._MAGIC, wordNumber, tableSize, blobBytes )
+
+        offsetsStart = SharedVocabulary._HEADER.size
+        tableStart = offsetsStart + offsetsBytes
+        blobStart = tableStart + 4 * tableSize
+
+        # every slot starts out empty, i.e. -1
+        buf[ tableStart:blobStart ] = b'\xff' * ( 4 * tableSize )
+
+        offsets = buf[ offsetsStart:tableStart ].cast( 'q' )
+        table = buf[ tableStart:blobStart ].cast( 'i' )
+
+        position = 0
+
+        for idx, key in enumerate( encoded ):
+
+            offsets[ idx ] = position
+            buf[ blobStart + position:blobStart + position + len( key ) ] = key
+            position += len( key )
+
+            slot = zlib.crc32( key ) & mask
+
+            while table[ slot ] != -1:
+                slot = ( slot + 1 ) & mask
+
+            table[ slot ] = idx
+
+        offsets[ wordNumber ] = position
+
+        offsets.release()
+        table.release()
+
+        SharedVocabulary._published.add( shm.name )
+
+        return cls( shm, owner=True )
+
+    @classmethod
+    def attach( cls, name ):
+        """Attaches read-only to a vocabulary published by another
+        process.
+
+        Parameters
+        ----------
+        name : str
+            The name of the shared memory block
+
+        Returns
+        -------
+        SharedVocabulary
+            an instance reading the block in place
+        """
+
+        if sys.version_info >= ( 3, 13 ):
+
+            shm = shared_memory.SharedMemory( name=name, track=False )
+
+        else:
+
+            shm = shared_memory.SharedMemory( name=name )
+
+            # before 3.13 attaching registers the block with this
+            # process' resource tracker, which would unlink it when the
+            # process exits.  Blocks published by this process (or the
+            # process it was forked from) stay registered for the
+            # publisher
+            if shm.name not in SharedVocabulary._published:
+                resource_tracker.unregister( shm._name, 'shared_memory' )
+
+        return cls( shm )
+
+    @property
+    def name( self ):
+
+        return self._name
+
+    def get( self, word, default=None ):
+        """Returns the index of word in the vocabulary.  Like dict.get,
+        out of vocabulary words return default, None unless passed, so
+        an instance can stand in for a { word: idx } dict.
+
+        Parameters
+        ----------
+        word : str
+            The word to look up
+        default : optional
+            The value returned if word isn't in the vocabulary
+
+        Returns
+        -------
+        int
+            the index of word, or default
+        """
+
+        key = word.encode( 'utf-8' )
+        slot = zlib.crc32( key ) & self._mask
+        table = self._table
+        offsets = self._offsets
+
+        while True:
+
+            idx = table[ slot ]
+
+            if idx == -1:
+
+                return default
+
+            if self._blob[ offsets[ idx ]:offsets[ idx + 1 ] ] == key:
+
+                return idx
+
+            slot = ( slot + 1 ) & self._mask
+
+    def word( self, idx ):
+        """Returns the word stored at index idx
+
+        Parameters
+        ----------
+        idx : int
+            The index of the word
+
+        Returns
+        -------
+        str
+            the word
+        """
+
+        if not -self._wordNumber <= idx < self._wordNumber:
+
+            raise IndexError( 'Vocabulary index out of range' )
+
+        idx %= self._wordNumber
+
+        return bytes( self._blob[ self._offsets[ idx ]:self._offsets[ idx + 1 ] ] ).decode( 'utf-8' )
+
+    def close( self ):
+        """Detaches from the shared memory block.  The instance can't be
+        used afterwards.
+        """
+
+        if self._shm is None:
+            return
+
+        self._offsets.release()
+        self._table.release()
+        self._blob.release()
+        self._shm.close()
+        self._shm = None
+
+    def unlink( self ):
+        """Destroys the shared memory block.  Only the publisher should
+        call this, once every worker is done with it.
+        """
+
+        if self._shm is None:
+
+            shared_memory.SharedMemory( name=self._name ).unlink()
+            SharedVocabulary._published.discard( self._name )
+
+            return
+
+        shm = self._shm
+
+        self.close()
+        shm.unlink()
+
+        SharedVocabulary._published.discard( self._name )
+
+    def __getitem__( self, word ):
+
+        idx = self.get( word )
+
+        if idx is None:
+
+            raise KeyError( word )
+
+        return idx
+
+    def __contains__( self, word ):
+
+        return self.get( word ) is not None
+
+    def __len__( self ):
+
+        return self._wordNumber
+
+    def __iter__( self ):
+
+        for idx in range( self._wordNumber ):
+
+            yield self.word( idx )
+
+    def __reduce__( self ):
+
+        return ( SharedVocabulary.attach, ( self.name, ) )
+
+    def __enter__( self ):
+
+        return self
+
+    def __exit__( self, *exc ):
+
+        if self._owner:
+
+            self.unlink()
+
+        else:
+
+            self.close()
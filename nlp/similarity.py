@@ -0,0 +1,222 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import scipy.sparse as sp
+
+class SimilaritySearch( object ):
+    """
+    A class used to find the k most similar documents (by cosine
+    similarity) of every document of a V x D frequency matrix, without
+    ever building the D x D similarity matrix.
+
+    The columns of the matrix are normalised to unit length once.  The
+    documents are then split into query blocks, each compared against
+    blocks of candidate documents with one sparse or dense product per
+    pair of blocks, so memory grows with blockSize x blockSize.  Only the
+    running top k of every query document is kept between candidate
+    blocks, selected with numpy.argpartition rather than a full sort.
+    Query blocks are processed in a thread pool (the products release
+    the GIL), and their results can be written straight to .npy files
+    on disk as they complete.
+
+    Attributes
+    ----------
+    k : int
+        The number of neighbours kept per document
+    blockSize : int
+        The number of documents per query and candidate block
+    threads : int
+        The number of threads processing query blocks, or None for the
+        ThreadPoolExecutor default
+    excludeSelf : bool
+        Whether a document is left out of its own neighbours
+
+    Methods
+    -------
+    normalise( matrix )
+        Static method that turns a frequency matrix into the unit
+        length document vectors compared by the search
+
+    search( matrix, directory=None )
+        Finds the k nearest neighbours of every document
+
+    load( directory )
+        Static method that memory-maps results saved by search
+    """
+
+    NEIGHBOURS = 'neighbours.npy'
+    SCORES = 'scores.npy'
+
+    def __init__( self, k=10, blockSize=1024, threads=None, excludeSelf=True ):
+
+        if k < 1:
+
+            raise ValueError( 'At least one neighbour must be kept' )
+
+        if blockSize < 1:
+
+            raise ValueError( 'A block must hold at least one document' )
+
+        self.k = k
+        self.blockSize = blockSize
+        self.threads = threads
+        self.excludeSelf = excludeSelf
+
+    @staticmethod
+    def normalise( matrix ):
+        """Turns a frequency matrix into unit length float32 document
+        vectors.  Documents with no words stay zero vectors.
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray or scipy.sparse matrix
+            A V x D frequency matrix
+
+        Returns
+        -------
+        numpy.ndarray or scipy.sparse.csr_matrix
+            A D x V matrix whose rows are the normalised documents,
+            sparse if matrix is
+        """
+
+        if sp.issparse( matrix ):
+
+            docs = sp.csr_matrix( matrix.T, dtype=np.float32 )
+            norms = np.sqrt( np.asarray( docs.multiply( docs ).sum( axis=1 ) ).ravel() )
+            norms[ norms == 0 ] = 1
+
+            return sp.csr_matrix( sp.diags( 1 / norms ) @ docs, dtype=np.float32 )
+
+        docs = np.array( matrix.T, dtype=np.float32 )
+        norms = np.linalg.norm( docs, axis=1, keepdims=True )
+        norms[ norms == 0 ] = 1
+
+        docs /= norms
+
+        return docs
+
+    def search( self, matrix, directory=None ):
+        """Finds the k nearest neighbours of every document of a
+        frequency matrix by cosine similarity.
+
+        Parameters
+        ----------
+        matrix : numpy.ndarray or scipy.sparse matrix
+            A V x D frequency matrix
+        directory : str, optional
+            If passed, the results are written block by block to
+            neighbours.npy and scores.npy in this directory, and
+            returned memory-mapped
+
+        Returns
+        -------
+        numpy.ndarray
+            A D x k' int64 array, where k' is k, or the number of other
+            documents if lower.  Row j holds the indices of the
+            neighbours of the j'th document, most similar first and
+            equally similar ones by index.  Which of several documents
+            tied at the k'th place are kept is unspecified
+        numpy.ndarray
+            The D x k' float32 cosine similarities of those neighbours
+        """
+
+        docs = SimilaritySearch.normalise( matrix )
+        docNumber = docs.shape[ 0 ]
+        k = max( min( self.k, docNumber - self.excludeSelf ), 0 )
+
+        if directory is not None:
+
+            os.makedirs( directory, exist_ok=True )
+
+            neighbours = np.lib.format.open_memmap( os.path.join( directory, SimilaritySearch.NEIGHBOURS ), mode='w+', dtype=np.int64, shape=( docNumber, k ) )
+            scores = np.lib.format.open_memmap( os.path.join( directory, SimilaritySearch.SCORES ), mode='w+', dtype=np.float32, shape=( docNumber, k ) )
+
+        else:
+
+            neighbours = np.zeros( ( docNumber, k ), dtype=np.int64 )
+            scores = np.zeros( ( docNumber, k ), dtype=np.float32 )
+
+        if k:
+
+            # the candidate blocks are transposed once, not per query block
+            candidates = [ docs[ start:start + self.blockSize ].T for start in range( 0, docNumber, self.blockSize ) ]
+
+            def searchBlock( start ):
+
+                stop = min( start + self.blockSize, docNumber )
+
+                neighbours[ start:stop ], scores[ start:stop ] = self._searchBlock( docs[ start:stop ], start, candidates, k )
+
+            with ThreadPoolExecutor( self.threads ) as pool:
+                list( pool.map( searchBlock, range( 0, docNumber, self.blockSize ) ) )
+
+        if directory is not None:
+
+            neighbours.flush()
+            scores.flush()
+
+        return neighbours, scores
+
+    def _searchBlock( self, queries, queryStart, candidates, k ):
+
+        queryNumber = queries.shape[ 0 ]
+        queryIds = np.arange( queryStart, queryStart + queryNumber )
+
+        bestIds = np.zeros( ( queryNumber, 0 ), dtype=np.int64 )
+        bestScores = np.zeros( ( queryNumber, 0 ), dtype=np.float32 )
+
+        for b, block in enumerate( candidates ):
+
+            blockStart = b * self.blockSize
+
+            blockScores = queries @ block
+            blockScores = blockScores.toarray() if sp.issparse( blockScores ) else np.asarray( blockScores )
+            blockScores = blockScores.astype( np.float32, copy=False )
+
+            blockIds = np.arange( blockStart, blockStart + blockScores.shape[ 1 ] )
+
+            if self.excludeSelf:
+
+                # a document sits in its own candidate block at column queryId - blockStart
+                own = ( queryIds >= blockStart ) & ( queryIds < blockStart + blockScores.shape[ 1 ] )
+                blockScores[ own, queryIds[ own ] - blockStart ] = -np.inf
+
+            ids = np.concatenate( [ bestIds, np.broadcast_to( blockIds, blockScores.shape ) ], axis=1 )
+            allScores = np.concatenate( [ bestScores, blockScores ], axis=1 )
+
+            if allScores.shape[ 1 ] > k:
+
+                keep = np.argpartition( -allScores, k - 1, axis=1 )[ :, :k ]
+
+                ids = np.take_along_axis( ids, keep, axis=1 )
+                allScores = np.take_along_axis( allScores, keep, axis=1 )
+
+            bestIds, bestScores = ids, allScores
+
+        # most similar first, ties broken by lower index
+        order = np.lexsort( ( bestIds, -bestScores ), axis=1 )
+
+        return np.take_along_axis( bestIds, order, axis=1 ), np.take_along_axis( bestScores, order, axis=1 )
+
+    @staticmethod
+    def load( directory ):
+        """Memory-maps the results saved by search.
+
+        Parameters
+        ----------
+        directory : str
+            The directory passed to search
+
+        Returns
+        -------
+        numpy.ndarray
+            the D x k neighbours
+        numpy.ndarray
+            the D x k scores
+        """
+
+        neighbours = np.load( os.path.join( directory, SimilaritySearch.NEIGHBOURS ), mmap_mode='r' )
+        scores = np.load( os.path.join( directory, SimilaritySearch.SCORES ), mmap_mode='r' )
+
+        return neighbours, scores
@@ -0,0 +1,454 @@
+import re
+import pickle
+import random
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from nltk.stem.porter import PorterStemmer
+
+from nltk.tokenize import word_tokenize, RegexpTokenizer
+
+from nlp.vocabularise import Vocabularise
+from nlp.sharedvocabulary import SharedVocabulary
+
+class FrequencyTransformer( object ):
+    """
+    A class used to fit a vocabulary on a corpus once, and then turn
+    single documents or micro-batches into frequency vectors with the
+    exact preprocessing pipeline used at fit time.
+
+    The tokeniser, cleanup regular expression and stemmer are compiled
+    once, stems are cached per word, and the vocabulary index is kept
+    between calls.  Out of vocabulary tokens are skipped.
+
+    Attributes
+    ----------
+    tokeniser : str
+        The regular expression to tokenise with, or None to use the
+        nltk.tokenize tokenizer word_tokenize
+    cleanup : str
+        The regular expression to cleanup with, or None
+    stem : bool
+        Whether tokens are stemmed
+    asciiFastPath : bool
+        Whether pure ASCII documents are lowercased, tokenised and
+        cleaned up as bytes (see Vocabularise.preprocess)
+    vocabList : lst or SharedVocabulary
+        The fitted vocabulary, or None before fitting
+    sampleReport : dict
+        The coverage estimates of the last fitSample, or None
+
+    Methods
+    -------
+    fit( corpus )
+        Builds the vocabulary from a corpus of documents
+
+    fitSample( corpus, sampleSize=10000, maxWords=None, holdout=0.1, seed=None )
+        Builds the vocabulary from a sample of documents drawn in one
+        streaming pass, and estimates its coverage
+
+    fitVocabulary( V )
+        Uses a pre-specified vocabulary instead of building one
+
+    preprocess( doc )
+        Lowercases, tokenises, cleans up and optionally stems a
+        single document
+
+    encode( doc )
+        Turns a document into the array of vocabulary indices of its
+        in-vocabulary tokens
+
+    transform( doc )
+        Turns a document into a sparse frequency vector
+
+    transformBatch( corpus )
+        Turns a list of documents into a V x D frequency matrix
+
+    save( filename=None )
+        Saves the fitted transformer to the local directory
+
+    load( filename )
+        Static method that loads a pickled transformer from the
+        local directory
+    """
+
+    def __init__( self, tokeniser=None, cleanup=None, stem=False, asciiFastPath=False ):
+
+        self.tokeniser = tokeniser
+        self.cleanup = cleanup
+        self.stem = stem
+        self.asciiFastPath = asciiFastPath
+        self.vocabList = None
+        self.sampleReport = None
+
+        self._vidx = None
+        self._compile()
+
+    def _compile( self ):
+
+        if self.tokeniser:
+            self._tokenise = RegexpTokenizer( self.tokeniser ).tokenize
+        else:
+            self._tokenise = word_tokenize
+
+        self._cleanup = re.compile( self.cleanup ).sub if self.cleanup else None
+        self._asciiPatterns = Vocabularise.asciiPatterns( self.tokeniser, self.cleanup ) if self.asciiFastPath else None
+        self._stemmer = PorterStemmer()
+        self._stems = {}
+
+    def _checkFitted( self ):
+
+        if self.vocabList is None:
+
+            raise ValueError( 'The transformer must be fitted before it can transform' )
+
+    def fit( self, corpus ):
+        """Builds the vocabulary from a corpus of documents with this
+        transformer's pipeline, exactly as Vocabularise.vocabularise
+        does.
+
+        Parameters
+        ----------
+        corpus : lst
+            A list of documents, each of which is a string.
+
+        Returns
+        -------
+        FrequencyTransformer
+            this transformer
+        """
+
+        vocabList, _ = Vocabularise().vocabularise( corpus, self.tokeniser, self.cleanup, self.stem, self.asciiFastPath )
+
+        return self.fitVocabulary( vocabList )
+
+    def fitSample( self, corpus, sampleSize=10000, maxWords=None, holdout=0.1, seed=None ):
+        """Builds the vocabulary from a uniform sample of documents,
+        drawn with reservoir sampling in a single pass over corpus, so
+        only the sampled documents are preprocessed.  The full corpus
+        can then be transformed against the fixed vocabulary with
+        transform or transformBatch.
+
+        A holdout fraction of the sample is kept out of the vocabulary
+        and used to estimate the share of the corpus' tokens the
+        vocabulary covers.  sampleReport then holds the number of
+        documents seen ( documents ), sampled ( sampled ) and held out
+        ( heldOut ), the number of distinct words in the fitted part of
+        the sample ( sampleWords ), and the estimated fractions of tokens
+        in ( coverage ) and out of ( oovRate ) the vocabulary.
+
+        Parameters
+        ----------
+        corpus : iterable
+            The documents, each of which is a string.  It is iterated
+            over once, and may be a generator
+        sampleSize : int
+            The number of documents to sample
+        maxWords : int, optional
+            If passed, only the maxWords most frequent words of the
+            sample are kept
+        holdout : float
+            The fraction of the sample used to estimate coverage
+        seed : int, optional
+            The seed of the sample
+
+        Raises
+        ------
+        ValueError
+            If holdout isn't in [ 0, 1 )
+
+        Returns
+        -------
+        FrequencyTransformer
+            this transformer
+        """
+
+        if not 0 <= holdout < 1:
+
+            raise ValueError( 'The holdout fraction must be at least 0 and less than 1' )
+
+        rng = random.Random( seed )
+        reservoir = []
+        docNumber = 0
+
+        for doc in corpus:
+
+            docNumber += 1
+
+            if len( reservoir ) < sampleSize:
+
+                reservoir.append( doc )
+
+            else:
+
+                j = rng.randrange( docNumber )
+
+                if j < sampleSize:
+                    reservoir[ j ] = doc
+
+        rng.shuffle( reservoir )
+
+        # keep at least one document to fit on
+        heldNumber = min( int( round( len( reservoir ) * holdout ) ), max( len( reservoir ) - 1, 0 ) )
+
+        heldOut = [ self.preprocess( doc ) for doc in reservoir[ :heldNumber ] ]
+        counts = Counter()
+
+        for doc in reservoir[ heldNumber: ]:
+            counts.update( self.preprocess( doc ) )
+
+        # most_common keeps ties in order of first appearance
+        if maxWords is not None:
+            vocabList = [ word for word, _ in counts.most_common( maxWords ) ]
+        else:
+            vocabList = list( counts )
+
+        self.fitVocabulary( vocabList )
+
+        # without a holdout, coverage is measured on the fitted sample
+        # itself, which only accounts for the words cut by maxWords
+        if heldOut:
+            tokenNumber = sum( len( doc ) for doc in heldOut )
+            coveredNumber = sum( 1 for doc in heldOut for word in doc if word in self._vidx )
+        else:
+            tokenNumber = sum( counts.values() )
+            coveredNumber = sum( counts[ word ] for word in vocabList )
+
+        coverage = coveredNumber / tokenNumber if tokenNumber else 1.0
+
+        self.sampleReport = {
+            'documents': docNumber,
+            'sampled': len( reservoir ),
+            'heldOut': heldNumber,
+            'sampleWords': len( counts ),
+            'coverage': coverage,
+            'oovRate': 1.0 - coverage,
+        }
+
+        return self
+
+    def fitVocabulary( self, V ):
+        """Uses a pre-specified vocabulary instead of building one.
+
+        Parameters
+        ----------
+        V : lst or SharedVocabulary
+            A list of words with no repetitions.  The index of each
+            word is its position in V
+
+        Returns
+        -------
+        FrequencyTransformer
+            this transformer
+        """
+
+        self.vocabList = V
+        self.sampleReport = None
+        self._index()
+
+        return self
+
+    def _index( self ):
+
+        if isinstance( self.vocabList, SharedVocabulary ):
+            self._vidx = self.vocabList
+        else:
+            self._vidx = { w:idx for idx, w in enumerate( self.vocabList ) }
+
+    def preprocess( self, doc ):
+        """Lowercases, tokenises, cleans up and optionally stems a
+        single document.  The result is the same as that of
+        Vocabularise.preprocess with this transformer's pipeline.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be preprocessed
+
+        Returns
+        -------
+        lst
+            the list of cleaned up (and possibly stemmed) words
+        """
+
+        tokens = Vocabularise.asciiTokenise( doc, self._asciiPatterns ) if self._asciiPatterns else None
+
+        if tokens is None:
+
+            tokens = self._tokenise( doc.lower() )
+
+            if self._cleanup:
+
+                cleanup = self._cleanup
+                tokens = [ cleanup( "", token ) for token in tokens ]
+
+            tokens = [ token for token in tokens if token ]
+
+        if self.stem:
+
+            stems = self._stems
+            stemmed = []
+
+            for token in tokens:
+
+                stem = stems.get( token )
+
+                if stem is None:
+
+                    stem = stems[ token ] = self._stemmer.stem( token )
+
+                stemmed.append( stem )
+
+            tokens = stemmed
+
+        return tokens
+
+    def encode( self, doc ):
+        """Turns a document into the array of vocabulary indices of its
+        tokens, in order.  Out of vocabulary tokens are skipped.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be encoded
+
+        Raises
+        ------
+        ValueError
+            If the transformer hasn't been fitted
+
+        Returns
+        -------
+        numpy.ndarray
+            a one dimensional int32 array of vocabulary indices
+        """
+
+        self._checkFitted()
+
+        ids = [ idx for idx in map( self._vidx.get, self.preprocess( doc ) ) if idx is not None ]
+
+        return np.array( ids, dtype=np.int32 )
+
+    def transform( self, doc ):
+        """Turns a document into a sparse frequency vector.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be transformed
+
+        Raises
+        ------
+        ValueError
+            If the transformer hasn't been fitted
+
+        Returns
+        -------
+        numpy.ndarray
+            the sorted int32 vocabulary indices of the words in the
+            document
+        numpy.ndarray
+            the int32 number of times each of those words appears in
+            the document
+        """
+
+        indices, counts = np.unique( self.encode( doc ), return_counts=True )
+
+        return indices, counts.astype( np.int32 )
+
+    def transformBatch( self, corpus ):
+        """Turns a list of documents into a frequency matrix, laid out
+        like the one Frequentise.frequentise returns.
+
+        Parameters
+        ----------
+        corpus : lst
+            A list of documents, each of which is a string.
+
+        Raises
+        ------
+        ValueError
+            If the transformer hasn't been fitted
+
+        Returns
+        -------
+        numpy.ndarray
+            A V x D matrix, where V is the number of words in the
+            vocabulary and D is the number of documents in corpus.  The
+            [ i, j ] entry of this matrix is the number of times the i'th
+            word of the vocabulary appears in the j'th document.
+        """
+
+        self._checkFitted()
+
+        wordNumber = len( self.vocabList )
+        frequencyMatrix = np.zeros( [ wordNumber, len( corpus ) ], dtype=np.int16 )
+
+        for j, doc in enumerate( corpus ):
+
+            indices, counts = self.transform( doc )
+
+            frequencyMatrix[ indices, j ] = counts
+
+        return frequencyMatrix
+
+    def save( self, filename=None ):
+        """Saves the fitted transformer to the local directory
+
+        Parameters
+        ----------
+        filename : str, optional
+            The name and location of where to save the
+            file.  If no filename is passed, the file
+            is saved to a default name based on the
+            current date.
+        """
+
+        if not filename:
+
+            dateTimeObj = datetime.now()
+
+            filename = str( 'transformer_' + dateTimeObj.strftime( "%d-%b-%Y-%H-%M" ) + '.PKL' )
+
+        with open( filename, 'wb' ) as outfile:
+            pickle.dump( self, outfile )
+
+    @staticmethod
+    def load( filename ):
+        """Loads a pickled transformer from the passed local directory
+        location.
+
+        Parameters
+        ----------
+        filename : str
+            The location of the file to be loaded
+
+        Returns
+        -------
+        FrequencyTransformer
+            the loaded transformer
+        """
+
+        with ( open( filename, "rb" ) ) as infile:
+            return pickle.load( infile )
+
+    def __getstate__( self ):
+
+        return { 'tokeniser': self.tokeniser, 'cleanup': self.cleanup, 'stem': self.stem, 'asciiFastPath': self.asciiFastPath, 'vocabList': self.vocabList, 'sampleReport': self.sampleReport }
+
+    def __setstate__( self, state ):
+
+        state.setdefault( 'asciiFastPath', False )
+        state.setdefault( 'sampleReport', None )
+
+        self.__dict__.update( state )
+        self._vidx = None
+        self._compile()
+
+        # the index is rebuilt without fitVocabulary, which would drop
+        # the sample report
+        if self.vocabList is not None:
+
+            self._index()
@@ -1,5 +1,7 @@
 import re
 import itertools
+
+import regex
 import pickle
 from datetime import datetime
 
@@ -26,6 +28,9 @@ class Vocabularise( object ):
         punctiation that isn't surronded by letters
     _stemmer : nltk.stem.porter.PorterStemmer
         The default Porter stemmer
+    _asciiPatterns : dict
+        The bytes versions of the tokeniser and cleanup
+        regular expressions used by the ASCII fast path
     
     Methods
     -------
@@ -64,7 +69,19 @@ class Vocabularise( object ):
         and filters the vocabulary of any words in any of the
         filters
     
-    vocabularise( corpus, tokeniser=None, cleanup=None, stem=False )
+    preprocess( doc, tokeniser=None, cleanup=None, stem=False, asciiFastPath=False )
+        Lowercases, tokenises, cleans up and optionally stems a
+        single document
+
+    asciiPatterns( tokeniser, cleanup )
+        Static method that compiles the bytes versions of a tokeniser
+        and cleanup regular expression
+
+    asciiTokenise( doc, patterns )
+        Static method that lowercases, tokenises and cleans up a pure
+        ASCII document as bytes
+
+    vocabularise( corpus, tokeniser=None, cleanup=None, stem=False, asciiFastPath=False )
         Takes a corpus of documents and returns the cleaned up
         vocabulary list, as well as the new corpus with all words 
         from the new voabulary
@@ -78,6 +95,15 @@ class Vocabularise( object ):
     
     # This regex removes all punctuation not surrounded by letters.
     PUNCTUATION_MID_WORD_ONLY = r"([\w]+(?:(?!\s)\W?[\w]+)*)"
+
+    # Characters that unicode, but not bytes, regular expressions treat
+    # as whitespace.  Documents containing them skip the ASCII fast path.
+    _UNICODE_ONLY_SPACE = re.compile( '[\x1c-\x1f]' )
+
+    # Pattern syntax that reads differently on bytes: grapheme clusters
+    # ( \X splits \r\n ) and inline flags changing the character classes,
+    # word boundaries or case folding.  Such patterns skip the fast path.
+    _UNICODE_ONLY_SYNTAX = re.compile( r'\\X|\(\?[a-zA-Z0-9\-]*[uwaLfV][a-zA-Z0-9\-]*[:)]' )
     
     @staticmethod
     def stopWordsFilter( word ):
@@ -102,6 +128,7 @@ class Vocabularise( object ):
     def __init__( self ):
 
         self._stemmer = PorterStemmer()
+        self._asciiPatterns = {}
 
     def tokenise( self, text, regex=None ):
         """Tokenises a piece of text using the passed regular
@@ -305,7 +332,145 @@ class Vocabularise( object ):
             
         return vocab
 
-    def vocabularise( self, corpus, tokeniser=None, cleanup=None, stem=False ):
+    def preprocess( self, doc, tokeniser=None, cleanup=None, stem=False, asciiFastPath=False ):
+        """Lowercases, tokenises, cleans up and optionally stems a
+        single document, exactly as vocabularise() does for each
+        document of a corpus.
+
+        If asciiFastPath is True, pure ASCII documents are lowercased,
+        tokenised and cleaned up as bytes, with bytes versions of the
+        regular expressions, which gives the same words faster.  Other
+        documents, and tokenisers or cleanups that have no equivalent
+        bytes regular expression (including the default word_tokenize),
+        fall back to the unicode path.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be preprocessed
+        tokeniser : str
+            The regular expression to tokenise with
+        cleanup : str
+            The regular expression to cleanup with
+        stem : bool
+            Stemming is performed if and only if this boolean
+            is True
+        asciiFastPath : bool
+            Whether ASCII documents are processed as bytes
+
+        Returns
+        -------
+        lst
+            the list of cleaned up (and possibly stemmed) words
+        """
+
+        cleanedDoc = self._asciiPreprocess( doc, tokeniser, cleanup ) if asciiFastPath else None
+
+        if cleanedDoc is None:
+
+            tokenedDoc = self.tokenise( doc.lower(), regex=tokeniser )
+
+            cleanedDoc = self.tokensCleanup( tokenedDoc, cleanup )
+
+        if stem:
+
+            cleanedDoc, _ = self.stem( cleanedDoc )
+
+        return cleanedDoc
+
+    def _asciiPreprocess( self, doc, tokeniser, cleanup ):
+
+        key = ( tokeniser, cleanup )
+
+        if key not in self._asciiPatterns:
+
+            self._asciiPatterns[ key ] = Vocabularise.asciiPatterns( tokeniser, cleanup )
+
+        return Vocabularise.asciiTokenise( doc, self._asciiPatterns[ key ] )
+
+    @staticmethod
+    def asciiTokenise( doc, patterns ):
+        """Lowercases, tokenises and cleans up a pure ASCII document as
+        bytes.
+
+        Parameters
+        ----------
+        doc : str
+            The document to be tokenised
+        patterns : tuple
+            The bytes tokeniser and cleanup returned by asciiPatterns
+
+        Returns
+        -------
+        lst
+            the list of cleaned up words, or None if the document
+            must go through the unicode path instead
+        """
+
+        if patterns is None or not doc.isascii() or Vocabularise._UNICODE_ONLY_SPACE.search( doc ):
+
+            return None
+
+        tokenPattern, cleanupPattern = patterns
+
+        tokens = tokenPattern.findall( doc.encode( 'ascii' ).lower() )
+
+        if cleanupPattern is not None:
+
+            tokens = [ cleanupPattern.sub( b"", token ) for token in tokens ]
+
+        return [ token.decode( 'ascii' ) for token in tokens if token ]
+
+    @staticmethod
+    def asciiPatterns( tokeniser, cleanup ):
+        """Compiles the bytes versions of a tokeniser and cleanup
+        regular expression for the ASCII fast path.
+
+        Parameters
+        ----------
+        tokeniser : str
+            The regular expression to tokenise with
+        cleanup : str
+            The regular expression to cleanup with
+
+        Returns
+        -------
+        tuple
+            the compiled bytes tokeniser and cleanup (None if cleanup
+            isn't passed), or None if they can't be run on bytes
+        """
+
+        # word_tokenize has no bytes equivalent, and non ASCII
+        # characters in a pattern change meaning once encoded
+        if not tokeniser or not tokeniser.isascii() or ( cleanup and not cleanup.isascii() ):
+
+            return None
+
+        if any( pattern and Vocabularise._UNICODE_ONLY_SYNTAX.search( pattern ) for pattern in ( tokeniser, cleanup ) ):
+
+            return None
+
+        # the tokeniser is compiled with the regex engine and flags
+        # RegexpTokenizer uses, and the cleanup with the re engine
+        # tokenCleanup uses, so both read the patterns the same way
+        try:
+            tokenPattern = regex.compile( tokeniser.encode( 'ascii' ), regex.MULTILINE | regex.DOTALL )
+        except ( regex.error, ValueError ):
+            return None
+
+        try:
+            cleanupPattern = re.compile( cleanup.encode( 'ascii' ) ) if cleanup else None
+        except ( re.error, ValueError ):
+            return None
+
+        # with several groups findall returns tuples instead of tokens
+        if tokenPattern.groups > 1:
+
+            return None
+
+        return tokenPattern, cleanupPattern
+
+    def vocabularise( self, corpus, tokeniser=None, cleanup=None, stem=False, asciiFastPath=False ):
         """Takes a corpus of documents and returns the cleaned up
         vocabulary list, as well as the new corpus with all words 
         from the new voabulary.  The tokenising and cleaning is 
@@ -318,6 +483,9 @@ class Vocabularise( object ):
         If cleanup is not passed, no cleanup is performed.
         
         If stem is not passed, no stemming is performed.
+
+        If asciiFastPath is True, pure ASCII documents are processed
+        as bytes (see preprocess), with the same result.
         
         Parameters
         ----------
@@ -330,6 +498,8 @@ class Vocabularise( object ):
         stem : bool
             Stemming is performed if and only if this boolean
             is True
+        asciiFastPath : bool
+            Whether ASCII documents are processed as bytes
 
         Returns
         -------
@@ -346,15 +516,7 @@ class Vocabularise( object ):
         
         for doc in tqdm( corpus ):
             
-            doc = doc.lower()
-            
-            tokenedDoc = self.tokenise( doc, regex=tokeniser )
-            
-            cleanedDoc = self.tokensCleanup( tokenedDoc, cleanup )
-            
-            if stem:
-                
-                cleanedDoc, _ = self.stem( cleanedDoc )
+            cleanedDoc = self.preprocess( doc, tokeniser, cleanup, stem, asciiFastPath )
             
             vocab += cleanedDoc
             
@@ -0,0 +1,372 @@
+import mmap
+import struct
+from collections import deque
+
+class VocabularyTrie( object ):
+    """
+    A compact, read-only trie over the utf-8 bytes of a vocabulary,
+    mapping every word to its index in the vocabulary list it was built
+    from, and answering existence, prefix and wildcard queries without
+    scanning the vocabulary.
+
+    Nodes are numbered breadth first, so the children of a node are
+    consecutive and the node an edge leads to is the edge's number plus
+    one.  The whole trie is then three flat arrays, serialised one after
+    the other after a small header:
+
+        firstEdge : int32 x ( N + 1 )   edges of node n are firstEdge[ n ]:firstEdge[ n + 1 ]
+        values    : int32 x N           the word index stored at node n, or -1
+        labels    : uint8 x ( N - 1 )   the byte labelling edge e, sorted per node
+
+    which take 9 bytes per node and can be memory-mapped from a file as
+    they are.  Arrays use the native byte order.
+
+    Methods
+    -------
+    get( word, default=None )
+        Returns the vocabulary index of word, or default
+
+    prefix( prefix )
+        Returns the words starting with prefix and their indices
+
+    match( pattern )
+        Returns the words matching a pattern with ? and * wildcards,
+        and their indices
+
+    toBytes()
+        Returns the flat serialised trie
+
+    save( filename )
+        Saves the serialised trie to the local directory
+
+    load( filename )
+        Static method that memory-maps a saved trie
+    """
+
+    _MAGIC = 0x45495254
+    _HEADER = struct.Struct( '=4i' )
+
+    def __init__( self, vocab=None, data=None ):
+
+        if ( vocab is None ) == ( data is None ):
+
+            raise ValueError( 'Exactly one of vocab and data must be passed' )
+
+        if data is None:
+
+            data = VocabularyTrie._build( vocab )
+
+        magic, nodeNumber, self._wordNumber, _ = VocabularyTrie._HEADER.unpack_from( data, 0 )
+
+        if magic != VocabularyTrie._MAGIC:
+
+            raise ValueError( 'The data does not hold a vocabulary trie' )
+
+        self._data = data
+        self._nodeNumber = nodeNumber
+
+        firstEdgeStart = VocabularyTrie._HEADER.size
+        valuesStart = firstEdgeStart + 4 * ( nodeNumber + 1 )
+        self._labelsStart = valuesStart + 4 * nodeNumber
+
+        view = memoryview( data )
+        self._firstEdge = view[ firstEdgeStart:valuesStart ].cast( 'i' )
+        self._values = view[ valuesStart:self._labelsStart ].cast( 'i' )
+        self._labels = view[ self._labelsStart:self._labelsStart + nodeNumber - 1 ]
+
+    @staticmethod
+    def _build( vocab ):
+
+        encoded = sorted( ( word.encode( 'utf-8' ), idx ) for idx, word in enumerate( vocab ) )
+
+        for ( previous, _ ), ( word, _ ) in zip( encoded, encoded[ 1: ] ):
+
+            if previous == word:
+
+                raise ValueError( 'The vocabulary must not contain repeated words' )
+
+        firstEdge = [ 0 ]
+        values = []
+        labels = bytearray()
+
+        # every node is the range of sorted words sharing its prefix
+        nodes = deque( [ ( 0, len( encoded ), 0 ) ] )
+
+        while nodes:
+
+            lo, hi, depth = nodes.popleft()
+            value = -1
+
+            if lo < hi and len( encoded[ lo ][ 0 ] ) == depth:
+
+                value = encoded[ lo ][ 1 ]
+                lo += 1
+
+            values.append( value )
+
+            while lo < hi:
+
+                label = encoded[ lo ][ 0 ][ depth ]
+                stop = lo + 1
+
+                while stop < hi and encoded[ stop ][ 0 ][ depth ] == label:
+                    stop += 1
+
+                labels.append( label )
+                nodes.append( ( lo, stop, depth + 1 ) )
+
+                lo = stop
+
+            firstEdge.append( len( labels ) )
+
+        nodeNumber = len( values )
+
+        data = bytearray( VocabularyTrie._HEADER.pack( VocabularyTrie._MAGIC, nodeNumber, len( encoded ), 0 ) )
+        data += struct.pack( '=%di' % len( firstEdge ), *firstEdge )
+        data += struct.pack( '=%di' % len( values ), *values )
+        data += labels
+
+        return bytes( data )
+
+    @staticmethod
+    def load( filename ):
+        """Memory-maps a trie saved with save().
+
+        Parameters
+        ----------
+        filename : str
+            The location of the file to be loaded
+
+        Returns
+        -------
+        VocabularyTrie
+            the trie, reading the file in place
+        """
+
+        with open( filename, 'rb' ) as infile:
+            data = mmap.mmap( infile.fileno(), 0, access=mmap.ACCESS_READ )
+
+        return VocabularyTrie( data=data )
+
+    def toBytes( self ):
+        """Returns the flat serialised trie
+
+        Returns
+        -------
+        bytes
+            the header and arrays of the trie
+        """
+
+        return bytes( self._data )
+
+    def save( self, filename ):
+        """Saves the serialised trie to the local directory
+
+        Parameters
+        ----------
+        filename : str
+            The name and location of where to save the file
+        """
+
+        with open( filename, 'wb' ) as outfile:
+            outfile.write( self._data )
+
+    def _child( self, node, label ):
+
+        start, stop = self._firstEdge[ node ], self._firstEdge[ node + 1 ]
+
+        if start == stop:
+
+            return -1
+
+        edge = self._data.find( bytes( ( label, ) ), self._labelsStart + start, self._labelsStart + stop )
+
+        return -1 if edge == -1 else edge - self._labelsStart + 1
+
+    def _walk( self, key ):
+
+        node = 0
+
+        for label in key:
+
+            node = self._child( node, label )
+
+            if node == -1:
+                break
+
+        return node
+
+    def _enumerate( self, node, key ):
+
+        # depth first, children in byte order, so words come out sorted
+        stack = [ ( node, key ) ]
+
+        while stack:
+
+            node, key = stack.pop()
+
+            if self._values[ node ] != -1:
+
+                yield key.decode( 'utf-8' ), self._values[ node ]
+
+            start, stop = self._firstEdge[ node ], self._firstEdge[ node + 1 ]
+
+            for edge in range( stop - 1, start - 1, -1 ):
+                stack.append( ( edge + 1, key + bytes( ( self._labels[ edge ], ) ) ) )
+
+    def get( self, word, default=None ):
+        """Returns the vocabulary index of word
+
+        Parameters
+        ----------
+        word : str
+            The word to look up
+        default : optional
+            The value returned if word isn't in the vocabulary
+
+        Returns
+        -------
+        int
+            the index of word in the vocabulary list, or default
+        """
+
+        node = self._walk( word.encode( 'utf-8' ) )
+
+        if node == -1 or self._values[ node ] == -1:
+
+            return default
+
+        return self._values[ node ]
+
+    def prefix( self, prefix ):
+        """Returns the words starting with prefix, in sorted order, and
+        their vocabulary indices.
+
+        Parameters
+        ----------
+        prefix : str
+            The prefix of the words
+
+        Returns
+        -------
+        lst
+            a list of ( word, index ) tuples
+        """
+
+        key = prefix.encode( 'utf-8' )
+        node = self._walk( key )
+
+        if node == -1:
+
+            return []
+
+        return list( self._enumerate( node, key ) )
+
+    def match( self, pattern ):
+        """Returns the words matching a pattern, in sorted order, and
+        their vocabulary indices.  In the pattern, ? matches any single
+        character and * matches any sequence of characters.
+
+        Parameters
+        ----------
+        pattern : str
+            The pattern to match
+
+        Returns
+        -------
+        lst
+            a list of ( word, index ) tuples
+        """
+
+        tokens = []
+
+        for char in pattern:
+
+            if char in '?*':
+                tokens.append( char )
+            else:
+                tokens.extend( char.encode( 'utf-8' ) )
+
+        matches = {}
+        seen = set()
+        stack = [ ( 0, 0, b'' ) ]
+
+        while stack:
+
+            node, position, key = stack.pop()
+
+            if ( node, position ) in seen:
+                continue
+
+            seen.add( ( node, position ) )
+
+            if position == len( tokens ):
+
+                if self._values[ node ] != -1:
+                    matches[ key ] = self._values[ node ]
+
+                continue
+
+            token = tokens[ position ]
+
+            if token == '*':
+
+                stack.append( ( node, position + 1, key ) )
+
+                for child, suffix in self._characters( node ):
+                    stack.append( ( child, position, key + suffix ) )
+
+            elif token == '?':
+
+                for child, suffix in self._characters( node ):
+                    stack.append( ( child, position + 1, key + suffix ) )
+
+            else:
+
+                child = self._child( node, token )
+
+                if child != -1:
+                    stack.append( ( child, position + 1, key + bytes( ( token, ) ) ) )
+
+        return [ ( key.decode( 'utf-8' ), matches[ key ] ) for key in sorted( matches ) ]
+
+    def _characters( self, node ):
+
+        # the nodes one whole utf-8 character below node
+        nodes = [ ( node, b'', 0 ) ]
+
+        while nodes:
+
+            node, suffix, remaining = nodes.pop()
+
+            for edge in range( self._firstEdge[ node ], self._firstEdge[ node + 1 ] ):
+
+                label = self._labels[ edge ]
+
+                if not suffix:
+                    left = 0 if label < 0x80 else 1 if label < 0xe0 else 2 if label < 0xf0 else 3
+                else:
+                    left = remaining - 1
+
+                if left == 0:
+                    yield edge + 1, suffix + bytes( ( label, ) )
+                else:
+                    nodes.append( ( edge + 1, suffix + bytes( ( label, ) ), left ) )
+
+    def __getitem__( self, word ):
+
+        idx = self.get( word )
+
+        if idx is None:
+
+            raise KeyError( word )
+
+        return idx
+
+    def __contains__( self, word ):
+
+        return self.get( word ) is not None
+
+    def __len__( self ):
+
+        return self._wordNumber
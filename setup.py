@@ -20,5 +20,6 @@ setup(
     author='moneyball@brightminded.com',
     author_email='moneyball@brightminded.com',
     install_requires=reqlist,
+    extras_require={ 'arrow': [ 'pyarrow' ] },
     keywords=['text','machine learning', 'AI']
 )
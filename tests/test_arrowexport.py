@@ -0,0 +1,152 @@
+import importlib.util
+import tempfile
+import unittest
+
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.arrowexport import ArrowExport
+
+from nlp.sharedvocabulary import SharedVocabulary
+
+from tests.base_test_case import BaseTestCase
+
+# the Arrow conversions need the optional pyarrow package
+requiresArrow = unittest.skipUnless( importlib.util.find_spec( 'pyarrow' ), 'pyarrow is not installed' )
+
+class TestArrowExport( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.vocab = [ 'tony', 'stark', 'is', 'ironman', 'thor', 'øen' ]
+
+        self.idCorpus = [ np.array( [ 0, 1, 2, 3 ], dtype=np.int32 ), np.array( [], dtype=np.int32 ), np.array( [ 4, 2, 4 ], dtype=np.int32 ) ]
+
+        self.matrix = np.array( [ [ 1, 0, 0 ], [ 1, 0, 0 ], [ 1, 0, 1 ], [ 1, 0, 0 ], [ 0, 0, 2 ], [ 0, 0, 0 ] ], dtype=np.int16 )
+
+    def assertCorpusEqual( self, actual, expected ):
+
+        self.assertEqual( len( actual ), len( expected ) )
+
+        for actualDoc, expectedDoc in zip( actual, expected ):
+            np.testing.assert_array_equal( actualDoc, expectedDoc )
+
+    def testArrays( self ):
+
+        values, offsets = ArrowExport.corpusToArrays( self.idCorpus )
+
+        np.testing.assert_array_equal( offsets, [ 0, 4, 4, 7 ] )
+
+        corpus = ArrowExport.corpusFromArrays( values, offsets )
+
+        self.assertCorpusEqual( corpus, self.idCorpus )
+
+        # documents are views, not copies
+        self.assertTrue( np.shares_memory( corpus[ 2 ], values ) )
+
+        for matrix in ( self.matrix, sp.csc_matrix( self.matrix ), sp.coo_matrix( self.matrix ) ):
+
+            arrays = ArrowExport.matrixToArrays( matrix )
+            rebuilt = ArrowExport.matrixFromArrays( arrays )
+
+            np.testing.assert_array_equal( rebuilt.toarray() if sp.issparse( rebuilt ) else rebuilt, self.matrix )
+
+        sparse = sp.csc_matrix( self.matrix )
+
+        self.assertTrue( np.shares_memory( ArrowExport.matrixFromArrays( ArrowExport.matrixToArrays( sparse ) ).data, sparse.data ) )
+
+        with self.assertRaises( ValueError ):
+            ArrowExport.matrixFromArrays( { 'format': 'coo' } )
+
+    @requiresArrow
+    def testArrow( self ):
+
+        array = ArrowExport.vocabularyToArrow( self.vocab )
+
+        self.assertListEqual( ArrowExport.vocabularyFromArrow( array ), self.vocab )
+
+        with SharedVocabulary.publish( self.vocab ) as shared:
+
+            array = ArrowExport.vocabularyToArrow( shared )
+
+            self.assertListEqual( ArrowExport.vocabularyFromArrow( array ), self.vocab )
+
+            del array
+
+        values, offsets = ArrowExport.corpusToArrays( self.idCorpus )
+
+        array = ArrowExport.corpusToArrow( ( values, offsets ) )
+
+        corpus = ArrowExport.corpusFromArrow( array )
+
+        self.assertCorpusEqual( corpus, self.idCorpus )
+
+        # neither direction copies the values
+        self.assertTrue( np.shares_memory( corpus[ 0 ], values ) )
+
+        self.assertCorpusEqual( ArrowExport.corpusFromArrow( array.slice( 1 ) ), self.idCorpus[ 1: ] )
+
+        for matrix in ( self.matrix, sp.csc_matrix( self.matrix ) ):
+
+            table = ArrowExport.matrixToArrow( matrix )
+            rebuilt = ArrowExport.matrixFromArrow( table )
+
+            np.testing.assert_array_equal( rebuilt.toarray() if sp.issparse( rebuilt ) else rebuilt, self.matrix )
+
+            self.assertEqual( rebuilt.dtype, np.int16 )
+
+        self.assertTrue( np.shares_memory( ArrowExport.matrixFromArrow( ArrowExport.matrixToArrow( self.matrix ) ), self.matrix ) )
+
+        # matrices with no documents or no words
+        for empty in ( np.zeros( ( 3, 0 ), dtype=np.int16 ), np.zeros( ( 0, 3 ), dtype=np.int16 ) ):
+
+            for matrix in ( empty, sp.csc_matrix( empty ) ):
+
+                rebuilt = ArrowExport.matrixFromArrow( ArrowExport.matrixToArrow( matrix ) )
+
+                self.assertEqual( rebuilt.shape, empty.shape )
+
+                self.assertEqual( rebuilt.dtype, np.int16 )
+
+    @requiresArrow
+    def testSaveLoad( self ):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            ArrowExport.save( directory, self.vocab, self.idCorpus, sp.csc_matrix( self.matrix ) )
+
+            vocab, corpus, matrix = ArrowExport.load( directory )
+
+            self.assertListEqual( vocab, self.vocab )
+
+            self.assertCorpusEqual( corpus, self.idCorpus )
+
+            np.testing.assert_array_equal( matrix.toarray(), self.matrix )
+
+            del corpus, matrix
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            ArrowExport.save( directory, matrix=self.matrix )
+
+            vocab, corpus, matrix = ArrowExport.load( directory )
+
+            self.assertIsNone( vocab )
+
+            self.assertIsNone( corpus )
+
+            np.testing.assert_array_equal( matrix, self.matrix )
+
+            del matrix
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            ArrowExport.save( directory, matrix=np.zeros( ( 3, 0 ), dtype=np.int16 ) )
+
+            _, _, matrix = ArrowExport.load( directory )
+
+            self.assertEqual( matrix.shape, ( 3, 0 ) )
+
+            self.assertEqual( matrix.dtype, np.int16 )
+
+            del matrix
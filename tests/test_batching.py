@@ -0,0 +1,142 @@
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.batching import MatrixBatches, CorpusBatches
+
+from tests.base_test_case import BaseTestCase
+
+class TestMatrixBatches( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.M = np.arange( 40, dtype=np.int16 ).reshape( 4, 10 ) % 3
+
+    def collect( self, batches ):
+
+        return [ ( docIds.copy(), batch.copy() ) for docIds, batch in batches ]
+
+    def testDense( self ):
+
+        batches = MatrixBatches( self.M, 4 )
+
+        self.assertEqual( len( batches ), 3 )
+
+        collected = self.collect( batches )
+
+        self.assertListEqual( [ len( docIds ) for docIds, _ in collected ], [ 4, 4, 2 ] )
+
+        for docIds, batch in collected:
+
+            self.assertEqual( batch.dtype, np.float32 )
+
+            np.testing.assert_array_equal( batch, self.M[ :, docIds ].T )
+
+    def testSparseShuffled( self ):
+
+        batches = MatrixBatches( sp.csr_matrix( self.M ), 3, shuffle=True, seed=1, prefetch=1 )
+
+        collected = self.collect( batches )
+
+        docIds = np.concatenate( [ docIds for docIds, _ in collected ] )
+
+        # every document is seen once per iteration
+        self.assertListEqual( sorted( docIds ), list( range( 10 ) ) )
+
+        for docIds, batch in collected:
+
+            np.testing.assert_array_equal( batch, self.M[ :, docIds ].T )
+
+        # the same seed gives the same order
+        again = self.collect( MatrixBatches( self.M, 3, shuffle=True, seed=1 ) )
+
+        np.testing.assert_array_equal( np.concatenate( [ docIds for docIds, _ in again ] ), np.concatenate( [ docIds for docIds, _ in collected ] ) )
+
+    def testBuffersAreReused( self ):
+
+        batches = MatrixBatches( self.M, 2, prefetch=1 )
+
+        bases = { batch.base.__array_interface__[ 'data' ][ 0 ] if batch.base is not None else batch.__array_interface__[ 'data' ][ 0 ] for _, batch in batches }
+
+        self.assertLessEqual( len( bases ), 2 )
+
+    def testEarlyExit( self ):
+
+        batches = MatrixBatches( self.M, 1, prefetch=1 )
+
+        for i, _ in enumerate( batches ):
+
+            if i == 2:
+                break
+
+        # a new iteration starts from the beginning
+        docIds, _ = next( iter( batches ) )
+
+        np.testing.assert_array_equal( docIds, [ 0 ] )
+
+        with self.assertRaises( ValueError ):
+            MatrixBatches( self.M, 1, prefetch=0 )
+
+        with self.assertRaises( ValueError ):
+            MatrixBatches( self.M, 0 )
+
+
+class TestCorpusBatches( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.idCorpus = [ np.array( doc, dtype=np.int32 ) for doc in ( [ 1, 2, 3 ], [ 4 ], [ 5, 6, 7, 8, 9 ], [ 2, 2 ], [] ) ]
+
+    def testFixedSize( self ):
+
+        batches = [ ( docIds.copy(), tokens.copy(), lengths.copy() ) for docIds, tokens, lengths in CorpusBatches( self.idCorpus, batchSize=2, padValue=-1 ) ]
+
+        self.assertEqual( len( batches ), 3 )
+
+        docIds, tokens, lengths = batches[ 0 ]
+
+        np.testing.assert_array_equal( tokens, [ [ 1, 2, 3 ], [ 4, -1, -1 ] ] )
+
+        np.testing.assert_array_equal( lengths, [ 3, 1 ] )
+
+        docIds, tokens, lengths = batches[ 2 ]
+
+        self.assertEqual( tokens.shape, ( 1, 0 ) )
+
+    def testTokenBudget( self ):
+
+        batches = CorpusBatches( self.idCorpus, tokenBudget=4 )
+
+        seen = []
+
+        for docIds, tokens, lengths in batches:
+
+            # padded batches never exceed the budget
+            self.assertLessEqual( tokens.size, 4 )
+
+            for row, doc, length in zip( tokens, docIds, lengths ):
+
+                np.testing.assert_array_equal( row[ :length ], self.idCorpus[ doc ][ :4 ] )
+
+                seen.append( doc )
+
+        self.assertListEqual( sorted( seen ), list( range( 5 ) ) )
+
+        self.assertEqual( len( batches ), 4 )
+
+        # empty documents still count towards the budget
+        idCorpus = [ np.array( [], dtype=np.int32 ) ] * 5 + [ np.array( [ 1, 2 ], dtype=np.int32 ) ]
+
+        batches = [ docIds.copy() for docIds, _, _ in CorpusBatches( idCorpus, tokenBudget=2 ) ]
+
+        self.assertTrue( all( len( docIds ) <= 2 for docIds in batches ) )
+
+        self.assertListEqual( sorted( np.concatenate( batches ).tolist() ), list( range( 6 ) ) )
+
+        with self.assertRaises( ValueError ):
+            CorpusBatches( self.idCorpus )
+
+        with self.assertRaises( ValueError ):
+            CorpusBatches( self.idCorpus, tokenBudget=0 )
+
+        with self.assertRaises( ValueError ):
+            CorpusBatches( self.idCorpus, batchSize=0 )
@@ -0,0 +1,98 @@
+import numpy as np
+
+from nlp.cooccurrence import Cooccurrence
+
+from tests.base_test_case import BaseTestCase
+
+class TestCooccurrence( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.vocabList = [ 'tony', 'stark', 'is', 'ironman' ]
+
+        self.adjustedCorpus = [ [ 'tony', 'stark', 'is', 'ironman' ], [ 'ironman', 'is', 'thor' ] ]
+
+        self.idCorpus = Cooccurrence.encode( self.adjustedCorpus, self.vocabList )
+
+    def naive( self, window, weighted, symmetric ):
+
+        expected = np.zeros( ( 4, 4 ) )
+
+        for doc in self.idCorpus:
+
+            for i in range( len( doc ) ):
+
+                for j in range( i + 1, min( i + window + 1, len( doc ) ) ):
+
+                    weight = 1.0 / ( j - i ) if weighted else 1
+
+                    expected[ doc[ i ], doc[ j ] ] += weight
+
+                    if symmetric:
+                        expected[ doc[ j ], doc[ i ] ] += weight
+
+        return expected
+
+    def testEncode( self ):
+
+        # out of vocabulary words are skipped
+        np.testing.assert_array_equal( self.idCorpus[ 0 ], [ 0, 1, 2, 3 ] )
+
+        np.testing.assert_array_equal( self.idCorpus[ 1 ], [ 3, 2 ] )
+
+    def testBuild( self ):
+
+        for window in ( 1, 2, 5 ):
+
+            for weighting in Cooccurrence.WEIGHTINGS:
+
+                for symmetric in ( True, False ):
+
+                    # tiny blocks exercise the block accumulation
+                    C = Cooccurrence( window=window, weighting=weighting, symmetric=symmetric, blockSize=4 )
+
+                    actual = C.build( self.idCorpus, len( self.vocabList ) )
+
+                    np.testing.assert_allclose( actual.toarray(), self.naive( window, weighting is not None, symmetric ) )
+
+        with self.assertRaises( ValueError ):
+            Cooccurrence( window=0 )
+
+        with self.assertRaises( ValueError ):
+            Cooccurrence( weighting='gaussian' )
+
+    def testBlockAccumulation( self ):
+
+        rng = np.random.default_rng( 0 )
+
+        idCorpus = [ rng.integers( 0, 20, size=rng.integers( 0, 12 ) ).astype( np.int32 ) for _ in range( 37 ) ]
+
+        for weighting in Cooccurrence.WEIGHTINGS:
+
+            # one block per document sums an uneven number of partials
+            single = Cooccurrence( window=3, weighting=weighting, blockSize=2 ** 30 ).build( idCorpus, 20 )
+            blocked = Cooccurrence( window=3, weighting=weighting, blockSize=1 ).build( idCorpus, 20 )
+
+            self.assertEqual( blocked.dtype, single.dtype )
+
+            np.testing.assert_allclose( blocked.toarray(), single.toarray(), rtol=1e-6 )
+
+    def testMergeAndPrune( self ):
+
+        C = Cooccurrence( window=2 )
+
+        full = C.build( self.idCorpus, 4 )
+
+        # matrices built on shards sum to the matrix of the whole corpus
+        merged = Cooccurrence.merge( C.build( self.idCorpus[ :1 ], 4 ), C.build( self.idCorpus[ 1: ], 4 ) )
+
+        np.testing.assert_array_equal( merged.toarray(), full.toarray() )
+
+        pruned = Cooccurrence.prune( full, 2 )
+
+        np.testing.assert_array_equal( pruned.toarray(), np.where( full.toarray() >= 2, full.toarray(), 0 ) )
+
+        self.assertEqual( pruned.nnz, 2 )
+
+        with self.assertRaises( ValueError ):
+            Cooccurrence.merge( full, C.build( self.idCorpus, 5 ) )
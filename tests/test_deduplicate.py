@@ -0,0 +1,91 @@
+import numpy as np
+
+from nlp.deduplicate import Deduplicator
+
+from tests.base_test_case import BaseTestCase
+
+class TestDeduplicator( BaseTestCase ):
+
+    def setUp( self ):
+
+        base = "when the world pushes you to your knees you are in the perfect position to pray".split()
+
+        self.tokenDocs = [
+            base,
+            "it is not so much the major events as the small day to day decisions that map the course of our living".split(),
+            base[ :-1 ] + [ 'pray', 'again' ],
+            [],
+            "criticism however valid or intellectually engaging tends to get in the way of a writer".split(),
+            list( base ),
+            [],
+        ]
+
+        self.D = Deduplicator( permutations=128, bands=32, threshold=0.7 )
+
+    def testShingles( self ):
+
+        self.assertEqual( len( Deduplicator.shingles( [ 'a', 'b', 'c', 'a', 'b', 'c' ], 3 ) ), 3 )
+
+        self.assertEqual( len( Deduplicator.shingles( [ 'a' ], 3 ) ), 1 )
+
+        self.assertEqual( len( Deduplicator.shingles( [], 3 ) ), 0 )
+
+    def testSignatures( self ):
+
+        signatures = self.D.signatures( self.tokenDocs )
+
+        self.assertEqual( signatures.shape, ( 7, 128 ) )
+
+        # identical documents have identical signatures
+        np.testing.assert_array_equal( signatures[ 0 ], signatures[ 5 ] )
+
+        # and computing them over shards in parallel gives the same result
+        np.testing.assert_array_equal( self.D.signatures( self.tokenDocs, processes=2 ), signatures )
+
+        with self.assertRaises( ValueError ):
+            Deduplicator( permutations=100, bands=32 )
+
+    def testDeduplicate( self ):
+
+        kept, groups = self.D.deduplicate( self.tokenDocs )
+
+        self.assertEqual( len( groups ), 1 )
+
+        np.testing.assert_array_equal( groups[ 0 ], [ 0, 2, 5 ] )
+
+        # the first document of a group is kept; empty documents are
+        # never duplicates
+        np.testing.assert_array_equal( kept, [ 0, 1, 3, 4, 6 ] )
+
+        # a stricter threshold only groups exact duplicates
+        kept, groups = Deduplicator( threshold=1.0 ).deduplicate( self.tokenDocs )
+
+        np.testing.assert_array_equal( kept, [ 0, 1, 2, 3, 4, 6 ] )
+
+    def testDuplicateClusters( self ):
+
+        # a large cluster of exact duplicates is grouped from its
+        # representative, next to a bucket-mate that matches nothing
+        signatures = np.zeros( ( 3002, 128 ), dtype=np.uint32 )
+        signatures[ 3000 ] = 1
+        signatures[ 3000, :4 ] = 0
+        signatures[ 3001, 64: ] = 2
+
+        groups = self.D.duplicates( signatures )
+
+        self.assertEqual( len( groups ), 1 )
+
+        np.testing.assert_array_equal( groups[ 0 ], np.arange( 3000 ) )
+
+        # a member matching a later representative, but not the first
+        # member of its bucket, is still grouped with it
+        signatures = np.zeros( ( 3, 128 ), dtype=np.uint32 )
+        signatures[ 1, 4: ] = 1
+        signatures[ 2, 4: ] = 1
+        signatures[ 2, 127 ] = 3
+
+        groups = self.D.duplicates( signatures )
+
+        self.assertEqual( len( groups ), 1 )
+
+        np.testing.assert_array_equal( groups[ 0 ], [ 1, 2 ] )
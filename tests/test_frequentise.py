@@ -1,7 +1,13 @@
+import os
+import tempfile
+
 import numpy as np
+import scipy.sparse as sp
 
 from nlp.frequentise import Frequentise
 
+from nlp.planner import OutputPlan
+
 from nlp.vocabularise import Vocabularise
 
 from tests.base_test_case import BaseTestCase
@@ -128,9 +134,132 @@ class TestFrequentise( BaseTestCase ):
             except AssertionError as e:
     		
                 self.fail( e )
-        
-        
-        
-        
 
 
+    def testFrequentisePlan( self ):
+
+        corpus = [ "tony stark is ironman", "thor is thor" ]
+
+        tokeniser = Vocabularise.PUNCTUATION_MID_WORD_ONLY
+
+        vocab, _, expectedMatrix = self.F.frequentise( corpus, tokeniser=tokeniser )
+
+        # a sparse plan builds the same matrix in sparse form
+        plan = OutputPlan( 5, 2, 6, np.int16, 2 ** 20, layout='sparse' )
+
+        actualVocab, _, actualMatrix = self.F.frequentise( corpus, V=vocab, tokeniser=tokeniser, plan=plan )
+
+        self.assertTrue( sp.issparse( actualMatrix ) )
+
+        np.testing.assert_array_equal( actualMatrix.toarray(), expectedMatrix )
+
+        # the plan is enforced before the matrix is allocated
+        plan = OutputPlan( 5, 2, 6, np.int16, 4, layout='dense' )
+
+        with self.assertRaises( MemoryError ):
+            self.F.frequentise( corpus, V=vocab, tokeniser=tokeniser, plan=plan )
+
+    def testMergePlan( self ):
+
+        V_x = [ 'ironman', 'thor' ]
+        V_y = [ 'thor', 'hulk', 'loki' ]
+
+        M_x = np.array( [ [ 1, 0 ], [ 0, 3 ] ], dtype=np.int16 )
+        M_y = np.array( [ [ 2 ], [ 0 ], [ 1 ] ], dtype=np.int16 )
+
+        # the merged matrix keeps the dtype of its inputs
+        V, M = self.F.merge( V_x, V_y, M_x, M_y )
+
+        self.assertEqual( M.dtype, np.int16 )
+
+        # and a sparse plan merges sparse or dense matrices into a sparse one
+        plan = OutputPlan( 4, 3, 5, np.int16, 2 ** 20, layout='sparse' )
+
+        sparseV, sparseM = self.F.merge( V_x, V_y, sp.csc_matrix( M_x ), M_y, plan=plan )
+
+        self.assertTrue( sp.issparse( sparseM ) )
+
+        self.assertListEqual( sparseV, V )
+
+        np.testing.assert_array_equal( sparseM.toarray(), M )
+
+        # the budget is checked at the size of the merged dtype, not the plan's
+        plan = OutputPlan( 100, 100, 5000, np.int16, 30000, layout='dense' )
+
+        self.F.merge( V_x, V_y, M_x, M_y, plan=plan )
+
+        with self.assertRaises( MemoryError ):
+            self.F.merge( [ 'w%d' % i for i in range( 100 ) ], [], np.zeros( ( 100, 100 ) ), np.zeros( ( 0, 0 ) ), plan=plan )
+
+    def testCollapse( self ):
+
+        corpus = [ "The cats chased a cat", "flies fly, and the fly flies", "thor is thor" ]
+
+        tokeniser = Vocabularise.PUNCTUATION_MID_WORD_ONLY
+
+        vocab, _, matrix = self.F.frequentise( corpus, tokeniser=tokeniser )
+
+        stemVocab, _, stemMatrix = self.F.frequentise( corpus, tokeniser=tokeniser, stem=True )
+
+        # stemming the vocabulary gives the matrix of the stemmed corpus
+        groupList, collapsed = self.F.collapse( vocab, matrix )
+
+        self.assertUnsortedListEqual( groupList, stemVocab )
+
+        self.assertEqual( collapsed.dtype, matrix.dtype )
+
+        order = [ groupList.index( stem ) for stem in stemVocab ]
+
+        np.testing.assert_array_equal( collapsed[ order ], stemMatrix )
+
+        # sparse matrices stay sparse
+        _, sparseCollapsed = self.F.collapse( vocab, sp.csc_matrix( matrix ) )
+
+        self.assertTrue( sp.issparse( sparseCollapsed ) )
+
+        np.testing.assert_array_equal( sparseCollapsed.toarray(), collapsed )
+
+        # any word to group mapping can be used, in either direction
+        V = [ 'ironman', 'thor', 'hulk', 'loki' ]
+
+        M = np.array( [ [ 1, 0 ], [ 0, 3 ], [ 2, 0 ], [ 0, 1 ] ], dtype=np.int16 )
+
+        groupList, collapsed = self.F.collapse( V, M, { 'avenger': [ 'ironman', 'thor', 'hulk' ], 'asgardian': [ 'thor', 'loki' ] } )
+
+        self.assertListEqual( groupList, [ 'avenger', 'asgardian' ] )
+
+        np.testing.assert_array_equal( collapsed, [ [ 3, 3 ], [ 0, 4 ] ] )
+
+        groupList, collapsed = self.F.collapse( V, M, { 'ironman': 'human', 'hulk': 'human' } )
+
+        self.assertListEqual( groupList, [ 'human', 'thor', 'loki' ] )
+
+        np.testing.assert_array_equal( collapsed, [ [ 3, 0 ], [ 0, 3 ], [ 0, 1 ] ] )
+
+        groupList, collapsed = self.F.collapse( V, M, { 'ironman': 'human', 'hulk': 'human' }, keepUnmapped=False )
+
+        self.assertListEqual( groupList, [ 'human' ] )
+
+        with self.assertRaises( ValueError ):
+            self.F.collapse( V[ 1: ], M )
+
+    def testSaveMergedFiles( self ):
+
+        cwd = os.getcwd()
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            os.chdir( directory )
+
+            try:
+                self.F.saveMergedFiles( [ 'thor' ], [ [ 'thor' ] ], np.ones( ( 1, 1 ) ) )
+
+                filenames = sorted( os.listdir( directory ) )
+
+                # every file is saved, not only the last one
+                self.assertEqual( len( filenames ), 3 )
+
+                np.testing.assert_array_equal( self.F.loadFile( filenames[ 1 ] ), np.ones( ( 1, 1 ) ) )
+
+            finally:
+                os.chdir( cwd )
@@ -0,0 +1,129 @@
+import os
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.frequentise import Frequentise
+
+from nlp.invertedindex import InvertedIndex
+
+from nlp.vocabularise import Vocabularise
+
+from tests.base_test_case import BaseTestCase
+
+class TestInvertedIndex( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.corpus = [
+            "tony stark is ironman",
+            "thor is thor",
+            "ironman and thor and hulk",
+            "",
+            "thor thor thor",
+        ]
+
+        self.index = InvertedIndex()
+
+        self.vocab, _, self.matrix = Frequentise().frequentise( self.corpus, tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY, index=self.index )
+
+    def testPostings( self ):
+
+        self.assertEqual( self.index.docNumber, 5 )
+
+        docs, tfs = self.index.postings( 'thor' )
+
+        np.testing.assert_array_equal( docs, [ 1, 2, 4 ] )
+
+        np.testing.assert_array_equal( tfs, [ 2, 1, 3 ] )
+
+        # unknown words have empty postings
+        docs, tfs = self.index.postings( 'loki' )
+
+        self.assertEqual( len( docs ), 0 )
+
+        # every postings list matches its row of the frequency matrix
+        for i, word in enumerate( self.vocab ):
+
+            docs, tfs = self.index.postings( word )
+
+            np.testing.assert_array_equal( docs, np.flatnonzero( self.matrix[ i ] ) )
+
+            np.testing.assert_array_equal( tfs, self.matrix[ i, docs ] )
+
+    def testFromMatrix( self ):
+
+        index = InvertedIndex.fromMatrix( self.vocab, self.matrix )
+
+        for word in self.vocab:
+
+            for actual, expected in zip( index.postings( word ), self.index.postings( word ) ):
+
+                np.testing.assert_array_equal( actual, expected )
+
+        # explicitly stored zeros aren't postings
+        matrix = sp.csc_matrix( self.matrix )
+        matrix.data[ matrix.indices == self.vocab.index( 'thor' ) ] = 0
+        storedNumber = matrix.nnz
+
+        index = InvertedIndex.fromMatrix( self.vocab, matrix )
+
+        self.assertEqual( len( index.postings( 'thor' )[ 0 ] ), 0 )
+
+        self.assertEqual( len( index.queryAnd( [ 'thor', 'is' ] ) ), 0 )
+
+        self.assertEqual( matrix.nnz, storedNumber )
+
+    def testQueries( self ):
+
+        np.testing.assert_array_equal( self.index.queryAnd( [ 'ironman', 'thor' ] ), [ 2 ] )
+
+        np.testing.assert_array_equal( self.index.queryAnd( [ 'ironman', 'loki' ] ), [] )
+
+        np.testing.assert_array_equal( self.index.queryOr( [ 'ironman', 'thor' ] ), [ 0, 1, 2, 4 ] )
+
+        docs, scores = self.index.topDocuments( [ 'thor', 'ironman' ], 2 )
+
+        np.testing.assert_array_equal( docs, [ 4, 1 ] )
+
+        np.testing.assert_array_equal( scores, [ 3, 2 ] )
+
+    def testMerge( self ):
+
+        other = InvertedIndex()
+
+        otherVocab, _, otherMatrix = Frequentise().frequentise( [ "hulk smash", "loki and thor" ], tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY, index=other )
+
+        merged = self.index.merge( other )
+
+        # documents are merged the way Frequentise.merge merges matrices
+        mergedVocab, mergedMatrix = Frequentise().merge( self.vocab, otherVocab, self.matrix, otherMatrix )
+
+        self.assertUnsortedListEqual( merged.vocabList, mergedVocab )
+
+        self.assertEqual( merged.docNumber, 7 )
+
+        for i, word in enumerate( mergedVocab ):
+
+            docs, tfs = merged.postings( word )
+
+            np.testing.assert_array_equal( docs, np.flatnonzero( mergedMatrix[ i ] ) )
+
+            np.testing.assert_array_equal( tfs, mergedMatrix[ i, docs ] )
+
+    def testSaveLoad( self ):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filename = os.path.join( directory, 'index.npz' )
+
+            self.index.save( filename )
+
+            loaded = InvertedIndex.load( filename )
+
+        self.assertListEqual( loaded.vocabList, self.vocab )
+
+        self.assertEqual( loaded.docNumber, 5 )
+
+        np.testing.assert_array_equal( loaded.queryOr( [ 'hulk', 'stark' ] ), [ 0, 2 ] )
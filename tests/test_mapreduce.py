@@ -0,0 +1,114 @@
+import os
+import tempfile
+
+import numpy as np
+
+from nlp.frequentise import Frequentise
+
+from nlp.mapreduce import MapReduce
+
+from nlp.vocabularise import Vocabularise
+
+from tests.base_test_case import BaseTestCase
+
+class TestMapReduce( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        self.corpus = [
+            "tony stark is ironman",
+            "nat romanoff is blackwidow",
+            "thor is thor",
+            "peter parker is spiderman",
+            "bruce banner is hulk",
+        ]
+
+        self.inputs = []
+
+        for i, docs in enumerate( [ self.corpus[ :2 ], self.corpus[ 2: ] ] ):
+
+            path = os.path.join( self.directory.name, 'corpus-%d.txt' % i )
+
+            with open( path, 'w', encoding='utf-8' ) as outfile:
+                outfile.write( '\n'.join( docs ) + '\n' )
+
+            self.inputs.append( path )
+
+        self.MR = MapReduce( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY )
+
+    def tearDown( self ):
+
+        self.directory.cleanup()
+
+    def testWriteManifests( self ):
+
+        manifests = self.MR.writeManifests( self.inputs, 3, os.path.join( self.directory.name, 'shards' ) )
+
+        self.assertEqual( len( manifests ), 3 )
+
+        ranges = [ MapReduce._loadManifest( manifest )[ 'inputs' ] for manifest in manifests ]
+
+        # shards split the corpus into consecutive documents, across files
+        self.assertEqual( [ sum( entry[ 'stop' ] - entry[ 'start' ] for entry in entries ) for entries in ranges ], [ 1, 2, 2 ] )
+
+        self.assertEqual( len( ranges[ 1 ] ), 2 )
+
+        with self.assertRaises( ValueError ):
+            self.MR.writeManifests( self.inputs, 0, self.directory.name )
+
+    def testShardOffsets( self ):
+
+        # multi-byte documents, and shards starting between checkpoints
+        corpus = [ 'café %d is open' % i for i in range( 10 ) ]
+        path = os.path.join( self.directory.name, 'cafes.txt' )
+
+        with open( path, 'w', encoding='utf-8' ) as outfile:
+            outfile.write( '\n'.join( corpus ) + '\n' )
+
+        checkpoint = MapReduce.CHECKPOINT
+        MapReduce.CHECKPOINT = 4
+
+        try:
+            manifests = self.MR.writeManifests( [ path ], 3, os.path.join( self.directory.name, 'cafes' ) )
+        finally:
+            MapReduce.CHECKPOINT = checkpoint
+
+        with open( path, 'rb' ) as infile:
+            lines = infile.readlines()
+
+        for manifest in manifests:
+
+            for entry in MapReduce._loadManifest( manifest )[ 'inputs' ]:
+                self.assertEqual( entry[ 'offset' ], sum( len( line ) for line in lines[ :entry[ 'start' ] ] ) )
+
+        vocabList, matrix = MapReduce.runLocal( manifests, processes=2 )
+
+        expectedVocab, _, expectedMatrix = Frequentise().frequentise( corpus, tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY )
+
+        rows = [ expectedVocab.index( w ) for w in vocabList ]
+
+        np.testing.assert_array_equal( matrix.toarray(), expectedMatrix[ rows ] )
+
+    def testRunLocal( self ):
+
+        manifests = self.MR.writeManifests( self.inputs, 3, os.path.join( self.directory.name, 'shards' ) )
+
+        vocabList, matrix = MapReduce.runLocal( manifests, processes=2 )
+
+        expectedVocab, _, expectedMatrix = Frequentise().frequentise( self.corpus, tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY )
+
+        # the global vocabulary is sorted, so IDs are consistent across runs
+        self.assertListEqual( vocabList, sorted( expectedVocab ) )
+
+        rows = [ expectedVocab.index( w ) for w in vocabList ]
+
+        np.testing.assert_array_equal( matrix.toarray(), expectedMatrix[ rows ] )
+
+        # reducing into a MatrixStore gives the same matrix
+        storeVocab, store = MapReduce.reduce( manifests, os.path.join( self.directory.name, 'store' ) )
+
+        self.assertListEqual( storeVocab, vocabList )
+
+        np.testing.assert_array_equal( store.read().toarray(), matrix.toarray() )
@@ -0,0 +1,81 @@
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.matrixstore import MatrixStore
+
+from tests.base_test_case import BaseTestCase
+
+class TestMatrixStore( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.directory = tempfile.TemporaryDirectory()
+
+        self.M = np.arange( 35, dtype=np.int16 ).reshape( 5, 7 ) % 4
+
+    def tearDown( self ):
+
+        self.directory.cleanup()
+
+    def testDense( self ):
+
+        store = MatrixStore( self.directory.name )
+
+        store.append( self.M, chunkSize=3 )
+
+        self.assertEqual( store.shape, ( 5, 7 ) )
+
+        np.testing.assert_array_equal( store.read(), self.M )
+
+        # a subset of documents and terms is returned in the requested order
+        np.testing.assert_array_equal( store.read( docs=[ 6, 0, 4 ], terms=[ 3, 1 ], threads=2 ), self.M[ [ 3, 1 ] ][ :, [ 6, 0, 4 ] ] )
+
+        with self.assertRaises( IndexError ):
+            store.read( docs=[ 7 ] )
+
+        # the store can be reopened from its directory
+        reopened = MatrixStore( self.directory.name )
+
+        self.assertEqual( reopened.dtype, np.int16 )
+
+        np.testing.assert_array_equal( reopened.read( docs=[ 5 ] ), self.M[ :, [ 5 ] ] )
+
+    def testSparse( self ):
+
+        store = MatrixStore( self.directory.name )
+
+        store.append( sp.csc_matrix( self.M ), chunkSize=2 )
+
+        actual = store.read( docs=[ 1, 2, 3 ] )
+
+        self.assertTrue( sp.issparse( actual ) )
+
+        np.testing.assert_array_equal( actual.toarray(), self.M[ :, 1:4 ] )
+
+    def testAppend( self ):
+
+        store = MatrixStore( self.directory.name )
+
+        store.append( self.M, chunkSize=4 )
+
+        # appended documents may have a grown vocabulary; older
+        # documents read zeros for the new words
+        grown = np.ones( ( 6, 2 ), dtype=np.int16 )
+
+        store.append( grown )
+
+        self.assertEqual( store.shape, ( 6, 9 ) )
+
+        expected = np.zeros( ( 6, 9 ), dtype=np.int16 )
+        expected[ :5, :7 ] = self.M
+        expected[ :, 7: ] = grown
+
+        np.testing.assert_array_equal( store.read(), expected )
+
+        with self.assertRaises( ValueError ):
+            store.append( np.ones( ( 4, 2 ), dtype=np.int16 ) )
+
+        with self.assertRaises( ValueError ):
+            store.append( np.ones( ( 6, 2 ), dtype=np.float64 ) )
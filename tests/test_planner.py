@@ -0,0 +1,128 @@
+import os
+import tempfile
+
+import numpy as np
+
+from nlp.planner import OutputPlan, OutputPlanner
+
+from nlp.vocabularise import Vocabularise
+
+from tests.base_test_case import BaseTestCase
+
+class TestOutputPlanner( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.corpus = [ "tony stark is ironman", "nat romanoff is blackwidow", "thor is thor", "peter parker is spiderman" ] * 5
+
+        self.tokeniser = Vocabularise.PUNCTUATION_MID_WORD_ONLY
+
+    def testExactPlan( self ):
+
+        # sampling the whole corpus gives exact estimates
+        plan = OutputPlanner( memoryBudget=2 ** 20 ).plan( self.corpus, tokeniser=self.tokeniser, sampleSize=len( self.corpus ) )
+
+        self.assertEqual( plan.wordNumber, 11 )
+
+        self.assertEqual( plan.docNumber, 20 )
+
+        self.assertEqual( plan.nonZeros, 70 )
+
+        self.assertEqual( plan.denseBytes, 11 * 20 * 2 )
+
+        self.assertEqual( plan.layout, 'dense' )
+
+        # a pre-specified vocabulary fixes the number of rows
+        plan = OutputPlanner( memoryBudget=2 ** 20 ).plan( self.corpus, V=[ 'is', 'thor' ], tokeniser=self.tokeniser, sampleSize=len( self.corpus ) )
+
+        self.assertEqual( plan.wordNumber, 2 )
+
+        self.assertEqual( plan.nonZeros, 25 )
+
+    def testSampledPlan( self ):
+
+        plan = OutputPlanner( memoryBudget=2 ** 20 ).plan( self.corpus, tokeniser=self.tokeniser, sampleSize=4, seed=0 )
+
+        self.assertEqual( plan.docNumber, 20 )
+
+        self.assertGreaterEqual( plan.wordNumber, 4 )
+
+        self.assertGreater( plan.nonZeros, 0 )
+
+        # a pre-specified vocabulary stays exact when sampling
+        plan = OutputPlanner( memoryBudget=2 ** 20 ).plan( self.corpus, V=[ 'tony', 'thor', 'is' ], tokeniser=self.tokeniser, sampleSize=10, seed=0 )
+
+        self.assertEqual( plan.wordNumber, 3 )
+
+    def testLayout( self ):
+
+        # the smaller representation is chosen if it fits the budget
+        self.assertEqual( OutputPlan( 100000, 1000, 50000, np.int16, 2 ** 30 ).layout, 'sparse' )
+
+        self.assertEqual( OutputPlan( 100, 1000, 50000, np.int16, 2 ** 30 ).layout, 'dense' )
+
+        # and the output goes to disk if neither fits
+        self.assertEqual( OutputPlan( 100000, 1000, 50000, np.int16, 2 ** 10 ).layout, 'disk' )
+
+        with self.assertRaises( ValueError ):
+            OutputPlan( 10, 10, 10, np.int16, 2 ** 10, layout='tape' )
+
+    def testCheck( self ):
+
+        plan = OutputPlan( 100, 100, 5000, np.int16, 20000 )
+
+        self.assertEqual( plan.check( 100, 100 ), 'dense' )
+
+        # the actual size is checked against the budget
+        with self.assertRaises( MemoryError ):
+            plan.check( 1000, 100 )
+
+        plan = OutputPlan( 100000, 100, 1000, np.int16, 20000 )
+
+        self.assertEqual( plan.check( 100000, 100, nonZeros=1000 ), 'sparse' )
+
+        with self.assertRaises( MemoryError ):
+            plan.check( 100000, 100, nonZeros=10000 )
+
+        # a matrix of another dtype is checked at its own size
+        plan = OutputPlan( 100, 100, 5000, np.int16, 30000 )
+
+        with self.assertRaises( MemoryError ):
+            plan.check( 100, 100, dtype=np.float64 )
+
+    def testAllocate( self ):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            path = os.path.join( directory, 'matrix.dat' )
+
+            plan = OutputPlan( 100000, 1000, 50000, np.int16, 2 ** 10, path=path )
+
+            matrix = plan.allocate( ( 3, 4 ) )
+
+            self.assertIsInstance( matrix, np.memmap )
+
+            self.assertEqual( matrix.shape, ( 3, 4 ) )
+
+            self.assertFalse( matrix.any() )
+
+            del matrix
+
+        # without a path, no temporary file is left behind
+        with tempfile.TemporaryDirectory() as directory:
+
+            previous = tempfile.tempdir
+            tempfile.tempdir = directory
+
+            try:
+                matrix = OutputPlan( 100000, 1000, 50000, np.int16, 2 ** 10 ).allocate( ( 3, 4 ) )
+            finally:
+                tempfile.tempdir = previous
+
+            matrix[ 1, 2 ] = 5
+
+            self.assertEqual( matrix.sum(), 5 )
+
+            self.assertListEqual( os.listdir( directory ), [] )
+
+            del matrix
@@ -0,0 +1,168 @@
+import os
+import socket
+import tempfile
+import threading
+
+import numpy as np
+
+from nlp.server import VectorisationServer, VectorisationClient, encodeVector, decodeVector, _HEADER, _receiveFrame, TRANSFORM, ERROR
+
+from nlp.transformer import FrequencyTransformer
+
+from nlp.vocabularise import Vocabularise
+
+from tests.base_test_case import BaseTestCase
+
+class TestVectorisationServer( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.corpus = [
+            "tony stark is ironman",
+            "nat romanoff is blackwidow",
+            "thor is thor",
+            "peter parker is spiderman",
+        ]
+
+        self.T = FrequencyTransformer( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY ).fit( self.corpus )
+
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown( self ):
+
+        self.directory.cleanup()
+
+    def testEncodeVector( self ):
+
+        indices, counts = self.T.transform( "thor is thor" )
+
+        actualIndices, actualCounts = decodeVector( encodeVector( indices, counts ) )
+
+        np.testing.assert_array_equal( actualIndices, indices )
+
+        np.testing.assert_array_equal( actualCounts, counts )
+
+        self.assertEqual( actualIndices.dtype, np.int32 )
+
+    def testUnfitted( self ):
+
+        with self.assertRaises( ValueError ):
+            VectorisationServer( FrequencyTransformer(), os.path.join( self.directory.name, 'server.sock' ) )
+
+    def testUnixSocket( self ):
+
+        address = os.path.join( self.directory.name, 'server.sock' )
+
+        with VectorisationServer( self.T, address ) as server:
+
+            with VectorisationClient( address ) as client:
+
+                for doc in self.corpus + [ "", "loki is not here" ]:
+
+                    indices, counts = client.transform( doc )
+                    expectedIndices, expectedCounts = self.T.transform( doc )
+
+                    np.testing.assert_array_equal( indices, expectedIndices )
+
+                    np.testing.assert_array_equal( counts, expectedCounts )
+
+                stats = client.stats()
+
+        self.assertEqual( stats[ 'requests' ], len( self.corpus ) + 2 )
+
+        self.assertEqual( stats[ 'errors' ], 0 )
+
+        self.assertLessEqual( stats[ 'latency' ][ 'p50' ], stats[ 'latency' ][ 'max' ] )
+
+        # the socket file is removed on stop
+        self.assertFalse( os.path.exists( address ) )
+
+    def testRequestAfterStop( self ):
+
+        address = os.path.join( self.directory.name, 'server.sock' )
+
+        server = VectorisationServer( self.T, address ).start()
+
+        client = VectorisationClient( address, timeout=5 )
+
+        client.transform( "thor is thor" )
+
+        server.stop()
+
+        # the open connection is closed instead of waiting on the batcher
+        with self.assertRaises( ConnectionError ):
+            client.transform( "thor is thor" )
+
+        client.close()
+
+        request = server._submit( "thor is thor" )
+
+        self.assertTrue( request.done.is_set() )
+
+        self.assertEqual( request.status, ERROR )
+
+    def testFrameLimit( self ):
+
+        address = os.path.join( self.directory.name, 'server.sock' )
+
+        with VectorisationServer( self.T, address, maxFrame=16 ) as server:
+
+            with VectorisationClient( address ) as client:
+
+                indices, _ = client.transform( "thor is thor" )
+
+                self.assertEqual( len( indices ), 2 )
+
+            with socket.socket( socket.AF_UNIX, socket.SOCK_STREAM ) as sock:
+
+                sock.settimeout( 5 )
+                sock.connect( address )
+
+                # only the header is sent: the payload is never read
+                sock.sendall( _HEADER.pack( TRANSFORM, 1 << 31 ) )
+
+                status, payload = _receiveFrame( sock )
+
+                self.assertEqual( status, ERROR )
+
+                self.assertIn( b'exceeds the limit of 16 bytes', payload )
+
+                # then the connection is closed
+                self.assertEqual( _receiveFrame( sock ), ( None, None ) )
+
+        with self.assertRaises( ValueError ):
+            VectorisationServer( self.T, address, maxFrame=-1 )
+
+    def testConcurrentBatching( self ):
+
+        # a long window lets concurrent requests share batches
+        with VectorisationServer( self.T, ( '127.0.0.1', 0 ), batchWindow=0.05, maxBatch=8 ) as server:
+
+            results = {}
+
+            def send( i ):
+
+                with VectorisationClient( server.address ) as client:
+                    results[ i ] = client.transform( self.corpus[ i % len( self.corpus ) ] )
+
+            threads = [ threading.Thread( target=send, args=( i, ) ) for i in range( 8 ) ]
+
+            for thread in threads:
+                thread.start()
+
+            for thread in threads:
+                thread.join()
+
+            stats = server.stats()
+
+        for i, ( indices, counts ) in results.items():
+
+            expectedIndices, expectedCounts = self.T.transform( self.corpus[ i % len( self.corpus ) ] )
+
+            np.testing.assert_array_equal( indices, expectedIndices )
+
+            np.testing.assert_array_equal( counts, expectedCounts )
+
+        self.assertEqual( stats[ 'requests' ], 8 )
+
+        self.assertLess( stats[ 'batches' ], 8 )
@@ -0,0 +1,103 @@
+import os
+import pickle
+import subprocess
+import sys
+from multiprocessing import Pool
+
+from nlp.sharedvocabulary import SharedVocabulary
+
+from tests.base_test_case import BaseTestCase
+
+def lookupWords( args ):
+
+    vocab, words = args
+
+    return [ vocab.get( word ) for word in words ]
+
+class TestSharedVocabulary( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.vocabList = [ 'tony', 'stark', 'is', 'ironman', 'øen', '' ]
+
+        self.S = SharedVocabulary.publish( self.vocabList )
+
+    def tearDown( self ):
+
+        self.S.unlink()
+
+    def testLookup( self ):
+
+        # every word maps to its position in the published list
+        for idx, word in enumerate( self.vocabList ):
+
+            self.assertEqual( self.S[ word ], idx )
+
+            self.assertEqual( self.S.word( idx ), word )
+
+        self.assertEqual( len( self.S ), len( self.vocabList ) )
+
+        self.assertListEqual( list( self.S ), self.vocabList )
+
+        # out of vocabulary words are reported without raising,
+        # unless looked up as a dict item
+        self.assertIsNone( self.S.get( 'thor' ) )
+
+        self.assertEqual( self.S.get( 'thor', -1 ), -1 )
+
+        # lookups behave exactly like those of a { word: idx } dict
+        vidx = { word:idx for idx, word in enumerate( self.vocabList ) }
+
+        for word in self.vocabList + [ 'thor', 'Tony' ]:
+
+            self.assertEqual( self.S.get( word ), vidx.get( word ) )
+
+            self.assertEqual( word in self.S, word in vidx )
+
+        self.assertNotIn( 'thor', self.S )
+
+        with self.assertRaises( KeyError ):
+            self.S[ 'thor' ]
+
+    def testRepeatedWords( self ):
+
+        with self.assertRaises( ValueError ):
+            SharedVocabulary.publish( [ 'tony', 'stark', 'tony' ] )
+
+    def testAttach( self ):
+
+        # a pickled instance attaches to the same block by name
+        attached = pickle.loads( pickle.dumps( self.S ) )
+
+        self.assertEqual( attached.name, self.S.name )
+
+        self.assertEqual( attached[ 'ironman' ], 3 )
+
+        attached.close()
+
+        # workers in a pool see the same index
+        with Pool( 2 ) as pool:
+
+            results = pool.map( lookupWords, [ ( self.S, [ 'tony', 'thor' ] ), ( self.S, [ 'øen', 'is' ] ) ] )
+
+        self.assertListEqual( results, [ [ 0, None ], [ 4, 2 ] ] )
+
+    def testAttachFromIndependentProcess( self ):
+
+        # a process that isn't forked from the publisher attaches, looks
+        # up a word and exits without destroying the block
+        script = 'from nlp.sharedvocabulary import SharedVocabulary; S = SharedVocabulary.attach( %r ); print( S[ "ironman" ] ); S.close()' % self.S.name
+
+        root = os.path.dirname( os.path.dirname( os.path.abspath( __file__ ) ) )
+
+        result = subprocess.run( [ sys.executable, '-c', script ], cwd=root, capture_output=True, text=True, check=True )
+
+        self.assertEqual( result.stdout.strip(), '3' )
+
+        self.assertNotIn( 'leaked', result.stderr )
+
+        attached = SharedVocabulary.attach( self.S.name )
+
+        self.assertEqual( attached[ 'ironman' ], 3 )
+
+        attached.close()
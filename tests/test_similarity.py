@@ -0,0 +1,84 @@
+import tempfile
+
+import numpy as np
+import scipy.sparse as sp
+
+from nlp.similarity import SimilaritySearch
+
+from tests.base_test_case import BaseTestCase
+
+class TestSimilaritySearch( BaseTestCase ):
+
+    def setUp( self ):
+
+        rng = np.random.default_rng( 0 )
+
+        self.matrix = ( rng.random( ( 30, 50 ) ) < 0.2 ) * rng.integers( 1, 5, size=( 30, 50 ) )
+        self.matrix = self.matrix.astype( np.int16 )
+
+        # an empty document
+        self.matrix[ :, 7 ] = 0
+
+        docs = self.matrix.T.astype( np.float64 )
+        norms = np.linalg.norm( docs, axis=1, keepdims=True )
+        norms[ norms == 0 ] = 1
+        docs /= norms
+
+        self.similarity = docs @ docs.T
+        np.fill_diagonal( self.similarity, -np.inf )
+
+    def assertNeighbours( self, neighbours, scores, k ):
+
+        self.assertEqual( neighbours.shape, ( 50, k ) )
+
+        for j in range( 50 ):
+
+            expected = np.sort( self.similarity[ j ] )[ ::-1 ][ :k ]
+
+            np.testing.assert_allclose( scores[ j ], expected, rtol=1e-5, atol=1e-6 )
+
+            np.testing.assert_allclose( self.similarity[ j, neighbours[ j ] ], expected, rtol=1e-5, atol=1e-6 )
+
+            self.assertNotIn( j, neighbours[ j ] )
+
+    def testSearch( self ):
+
+        # blocks that don't divide the number of documents, dense and sparse
+        S = SimilaritySearch( k=5, blockSize=8, threads=3 )
+
+        neighbours, scores = S.search( self.matrix )
+
+        self.assertNeighbours( neighbours, scores, 5 )
+
+        sparseNeighbours, sparseScores = S.search( sp.csc_matrix( self.matrix ) )
+
+        self.assertNeighbours( sparseNeighbours, sparseScores, 5 )
+
+        # k is capped by the number of other documents
+        neighbours, scores = SimilaritySearch( k=100, blockSize=16 ).search( self.matrix )
+
+        self.assertNeighbours( neighbours, scores, 49 )
+
+        # a document can be its own neighbour
+        neighbours, _ = SimilaritySearch( k=1, excludeSelf=False ).search( np.eye( 3 ) )
+
+        np.testing.assert_array_equal( neighbours[ :, 0 ], [ 0, 1, 2 ] )
+
+        with self.assertRaises( ValueError ):
+            SimilaritySearch( k=0 )
+
+    def testSearchToDisk( self ):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            neighbours, scores = SimilaritySearch( k=4, blockSize=7 ).search( sp.csr_matrix( self.matrix ), directory )
+
+            loadedNeighbours, loadedScores = SimilaritySearch.load( directory )
+
+            np.testing.assert_array_equal( loadedNeighbours, neighbours )
+
+            np.testing.assert_array_equal( loadedScores, scores )
+
+            self.assertNeighbours( loadedNeighbours, loadedScores, 4 )
+
+            del neighbours, scores, loadedNeighbours, loadedScores
@@ -0,0 +1,180 @@
+import os
+import tempfile
+
+import numpy as np
+
+from nlp.frequentise import Frequentise
+
+from nlp.transformer import FrequencyTransformer
+
+from nlp.vocabularise import Vocabularise
+
+from tests.base_test_case import BaseTestCase
+
+class TestFrequencyTransformer( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.corpus = [
+            "Maybe 'Okay' will be our- 'always'...",
+            "When the world pushes you to your-knees, you're in the perfect position to pray",
+        ]
+
+        self.T = FrequencyTransformer( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY )
+
+    def testUnfitted( self ):
+
+        with self.assertRaises( ValueError ):
+            self.T.transform( "the world" )
+
+    def testFit( self ):
+
+        # fitting builds the same vocabulary and preprocessing as vocabularise
+        expectedVocab, expectedCorpus = Vocabularise().vocabularise( self.corpus, tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY )
+
+        self.T.fit( self.corpus )
+
+        self.assertUnsortedListEqual( self.T.vocabList, expectedVocab )
+
+        for doc, expectedDoc in zip( self.corpus, expectedCorpus ):
+
+            self.assertListEqual( self.T.preprocess( doc ), expectedDoc )
+
+        # batches match the matrix frequentise builds
+        vocabList, _, expectedMatrix = Frequentise().frequentise( self.corpus, V=self.T.vocabList, tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY )
+
+        np.testing.assert_array_equal( self.T.transformBatch( self.corpus ), expectedMatrix )
+
+    def testTransform( self ):
+
+        self.T.fitVocabulary( [ 'the', 'world', 'to', 'pray' ] )
+
+        # out of vocabulary tokens are skipped
+        np.testing.assert_array_equal( self.T.encode( self.corpus[ 1 ] ), [ 0, 1, 2, 0, 2, 3 ] )
+
+        indices, counts = self.T.transform( self.corpus[ 1 ] )
+
+        np.testing.assert_array_equal( indices, [ 0, 1, 2, 3 ] )
+
+        np.testing.assert_array_equal( counts, [ 2, 1, 2, 1 ] )
+
+        indices, counts = self.T.transform( self.corpus[ 0 ] )
+
+        self.assertEqual( len( indices ), 0 )
+
+        self.assertEqual( len( counts ), 0 )
+
+    def testStemAndCleanup( self ):
+
+        T = FrequencyTransformer( tokeniser=r'\S+', cleanup=r'[^a-z]+', stem=True )
+
+        T.fit( [ "Caresses22 flies, dies!" ] )
+
+        self.assertUnsortedListEqual( T.vocabList, [ 'caress', 'fli', 'die' ] )
+
+        self.assertListEqual( T.preprocess( "FLIES 33caresses" ), [ 'fli', 'caress' ] )
+
+    def testPreprocessMatchesVocabularise( self ):
+
+        # empty tokens are dropped with or without a cleanup, as in
+        # Vocabularise.preprocess
+        for cleanup in ( None, r'[0-9]' ):
+
+            T = FrequencyTransformer( tokeniser=r'\w*', cleanup=cleanup )
+
+            self.assertListEqual( T.preprocess( "ab cd 22" ), Vocabularise().preprocess( "ab cd 22", r'\w*', cleanup ) )
+
+        self.assertListEqual( FrequencyTransformer( tokeniser=r'\w*' ).preprocess( "ab cd" ), [ 'ab', 'cd' ] )
+
+    def testAsciiFastPath( self ):
+
+        corpus = self.corpus + [ "Øen Carlsen is a Norwegian chess grandmaster", "the world" ]
+
+        T = FrequencyTransformer( tokeniser=r'\S+', cleanup=r'[^a-zø]+', asciiFastPath=True )
+
+        # a cleanup with non ASCII characters has no bytes equivalent
+        self.assertIsNone( T._asciiPatterns )
+
+        T = FrequencyTransformer( tokeniser=r'\S+', cleanup=r'[^a-z]+', stem=True, asciiFastPath=True ).fit( corpus )
+
+        expected = FrequencyTransformer( tokeniser=r'\S+', cleanup=r'[^a-z]+', stem=True ).fit( corpus )
+
+        self.assertIsNotNone( T._asciiPatterns )
+
+        self.assertListEqual( T.vocabList, expected.vocabList )
+
+        np.testing.assert_array_equal( T.transformBatch( corpus ), expected.transformBatch( corpus ) )
+
+    def testFitSample( self ):
+
+        corpus = [ "thor is thor", "loki is thor's brother", "the hulk is angry" ] * 20
+
+        # a sample of the whole corpus gives the full vocabulary
+        T = FrequencyTransformer( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY ).fitSample( iter( corpus ), sampleSize=100, holdout=0 )
+
+        expected = FrequencyTransformer( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY ).fit( corpus )
+
+        self.assertUnsortedListEqual( T.vocabList, expected.vocabList )
+
+        self.assertEqual( T.sampleReport[ 'documents' ], 60 )
+
+        self.assertEqual( T.sampleReport[ 'coverage' ], 1.0 )
+
+        # maxWords keeps the most frequent words, and the cut words
+        # count towards the out of vocabulary rate
+        T.fitSample( corpus, sampleSize=30, maxWords=2, holdout=0.2, seed=3 )
+
+        self.assertListEqual( sorted( T.vocabList ), [ 'is', 'thor' ] )
+
+        self.assertEqual( T.sampleReport[ 'sampled' ], 30 )
+
+        self.assertEqual( T.sampleReport[ 'heldOut' ], 6 )
+
+        self.assertGreater( T.sampleReport[ 'oovRate' ], 0 )
+
+        self.assertAlmostEqual( T.sampleReport[ 'coverage' ] + T.sampleReport[ 'oovRate' ], 1.0 )
+
+        # the same seed draws the same sample
+        other = FrequencyTransformer( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY ).fitSample( corpus, sampleSize=30, maxWords=2, holdout=0.2, seed=3 )
+
+        self.assertDictEqual( other.sampleReport, T.sampleReport )
+
+        with self.assertRaises( ValueError ):
+            T.fitSample( corpus, holdout=1 )
+
+    def testSaveLoad( self ):
+
+        self.T.fit( self.corpus )
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filename = os.path.join( directory, 'transformer.PKL' )
+
+            self.T.save( filename )
+
+            loaded = FrequencyTransformer.load( filename )
+
+        self.assertEqual( loaded.tokeniser, self.T.tokeniser )
+
+        self.assertListEqual( loaded.vocabList, self.T.vocabList )
+
+        np.testing.assert_array_equal( loaded.transformBatch( self.corpus ), self.T.transformBatch( self.corpus ) )
+
+        # the report of a sample fit survives saving and loading
+        T = FrequencyTransformer( tokeniser=Vocabularise.PUNCTUATION_MID_WORD_ONLY ).fitSample( self.corpus * 10, sampleSize=30, maxWords=2, holdout=0.2, seed=3 )
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filename = os.path.join( directory, 'transformer.PKL' )
+
+            T.save( filename )
+
+            loaded = FrequencyTransformer.load( filename )
+
+        self.assertIsNotNone( T.sampleReport )
+
+        self.assertDictEqual( loaded.sampleReport, T.sampleReport )
+
+        self.assertListEqual( loaded.vocabList, T.vocabList )
+
+        np.testing.assert_array_equal( loaded.transformBatch( self.corpus ), T.transformBatch( self.corpus ) )
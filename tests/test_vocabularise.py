@@ -239,3 +239,65 @@ class TestVocabularise( BaseTestCase ):
         
         for doc in actualNewCorpus:
             self.assertListEqual( doc, expectedDoc )
+
+    def testAsciiFastPath( self ):
+
+        # The ASCII fast path must give exactly the vocabulary and
+        # adjusted corpus of the unicode path, falling back to it for
+        # documents that aren't pure ASCII.
+
+        corpus = [
+
+            "Every time I thought I was being rejected from something good, I was actually being re-directed to something better.",
+            "Sven Magnus Øen Carlsen[a] (born 30 November 1990)[1][2] is a Norwegian[5] chess grandmaster",
+            "Maybe 'Okay' will be our 'always'...\tUNIT\x1fSEPARATED   words\n\nThanks.",
+            "",
+            "Naïve café CAFÉ",
+            "Carriage\r\nreturns",
+            "%A'aKx"
+
+        ]
+
+        for tokeniser, cleanup, stem in [ ( Vocabularise.PUNCTUATION_MID_WORD_ONLY, None, False ), ( r'\S+', r'[^a-z]+', True ), ( r'[\d\w]+', r'\d', False ), ( r'[[:alpha:]]+', None, False ), ( r'\w++', r'[0-9]', False ), ( r'(?u)\w+', None, False ), ( r'\X', None, False ), ( r'(?w)\b\w+\b', None, False ), ( r'(?i:[a-z])+', None, False ) ]:
+
+            expected = self.V.vocabularise( corpus, tokeniser, cleanup, stem )
+
+            actual = Vocabularise().vocabularise( corpus, tokeniser, cleanup, stem, asciiFastPath=True )
+
+            self.assertListEqual( actual[ 0 ], expected[ 0 ] )
+
+            self.assertListEqual( actual[ 1 ], expected[ 1 ] )
+
+        # ASCII documents are processed as bytes, others are not
+
+        patterns = Vocabularise.asciiPatterns( r'\w+', None )
+
+        self.assertListEqual( Vocabularise.asciiTokenise( "Hello, World", patterns ), [ 'hello', 'world' ] )
+
+        self.assertIsNone( Vocabularise.asciiTokenise( "Héllo", patterns ) )
+
+        # POSIX classes are read by the same engine as RegexpTokenizer
+
+        patterns = Vocabularise.asciiPatterns( r'[[:alpha:]]+', None )
+
+        self.assertListEqual( Vocabularise.asciiTokenise( "Hello world", patterns ), [ 'hello', 'world' ] )
+
+        self.assertListEqual( self.V.preprocess( "Hello world", r'[[:alpha:]]+', asciiFastPath=True ), self.V.preprocess( "Hello world", r'[[:alpha:]]+' ) )
+
+        # tokenisers without a bytes equivalent always use the unicode path
+
+        self.assertIsNone( Vocabularise.asciiPatterns( None, None ) )
+
+        self.assertIsNone( Vocabularise.asciiPatterns( r'[a-zø]+', None ) )
+
+        # nor do patterns with grapheme clusters or unicode-only flags
+
+        for tokeniser in ( r'(?u)\w+', r'\X', r'(?w)\b\w+\b', r'(?a)\w+', r'(?L)\w+', r'(?-u:\w)+' ):
+
+            self.assertIsNone( Vocabularise.asciiPatterns( tokeniser, None ) )
+
+        self.assertIsNotNone( Vocabularise.asciiPatterns( r'(?i)[a-z]+', None ) )
+
+        # regex-only syntax is read as RegexpTokenizer reads it
+
+        self.assertListEqual( self.V.preprocess( "Hello World", r'\p{Lu}\p{Ll}*', asciiFastPath=True ), self.V.preprocess( "Hello World", r'\p{Lu}\p{Ll}*' ) )
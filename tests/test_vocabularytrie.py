@@ -0,0 +1,82 @@
+import os
+import tempfile
+
+from nlp.vocabularytrie import VocabularyTrie
+
+from tests.base_test_case import BaseTestCase
+
+class TestVocabularyTrie( BaseTestCase ):
+
+    def setUp( self ):
+
+        self.vocab = [ 'thor', 'tony', 'to', 'stark', 'thorough', 'øen', 'øre', '' ]
+
+        self.T = VocabularyTrie( self.vocab )
+
+    def testGet( self ):
+
+        # every word maps to its index in the vocabulary list
+        for idx, word in enumerate( self.vocab ):
+
+            self.assertEqual( self.T[ word ], idx )
+
+            self.assertIn( word, self.T )
+
+        self.assertEqual( len( self.T ), len( self.vocab ) )
+
+        for word in [ 't', 'thorn', 'tonys', 'ø' ]:
+
+            self.assertNotIn( word, self.T )
+
+            self.assertIsNone( self.T.get( word ) )
+
+        with self.assertRaises( KeyError ):
+            self.T[ 'hulk' ]
+
+        with self.assertRaises( ValueError ):
+            VocabularyTrie( [ 'thor', 'thor' ] )
+
+    def testPrefix( self ):
+
+        self.assertListEqual( self.T.prefix( 'th' ), [ ( 'thor', 0 ), ( 'thorough', 4 ) ] )
+
+        self.assertListEqual( self.T.prefix( 'to' ), [ ( 'to', 2 ), ( 'tony', 1 ) ] )
+
+        self.assertListEqual( self.T.prefix( 'ø' ), [ ( 'øen', 5 ), ( 'øre', 6 ) ] )
+
+        self.assertListEqual( self.T.prefix( 'x' ), [] )
+
+        self.assertEqual( len( self.T.prefix( '' ) ), len( self.vocab ) )
+
+    def testMatch( self ):
+
+        self.assertListEqual( self.T.match( 't?' ), [ ( 'to', 2 ) ] )
+
+        self.assertListEqual( self.T.match( 't*' ), [ ( 'thor', 0 ), ( 'thorough', 4 ), ( 'to', 2 ), ( 'tony', 1 ) ] )
+
+        self.assertListEqual( self.T.match( '*r*' ), [ ( 'stark', 3 ), ( 'thor', 0 ), ( 'thorough', 4 ), ( 'øre', 6 ) ] )
+
+        self.assertListEqual( self.T.match( '?re' ), [ ( 'øre', 6 ) ] )
+
+        self.assertListEqual( self.T.match( 'th?r' ), [ ( 'thor', 0 ) ] )
+
+    def testSaveLoad( self ):
+
+        with tempfile.TemporaryDirectory() as directory:
+
+            filename = os.path.join( directory, 'vocabulary.trie' )
+
+            self.T.save( filename )
+
+            loaded = VocabularyTrie.load( filename )
+
+            self.assertEqual( loaded[ 'thorough' ], 4 )
+
+            self.assertListEqual( loaded.prefix( 'th' ), self.T.prefix( 'th' ) )
+
+            self.assertEqual( loaded.toBytes(), self.T.toBytes() )
+
+        self.assertEqual( VocabularyTrie( data=self.T.toBytes() )[ 'øen' ], 5 )
+
+        with self.assertRaises( ValueError ):
+            VocabularyTrie( data=bytes( 16 ) )